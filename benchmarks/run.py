@@ -0,0 +1,293 @@
+"""
+Benchmarks for the repo tool's hot paths against a synthetic repository.
+
+    python -m benchmarks --files 10000 --out bench.json
+    python -m benchmarks --save-baseline          # record benchmarks/baseline.json
+
+Each benchmark is timed `--repeat` times; the fastest run is compared with the stored
+baseline for the same configuration and a slowdown beyond `--threshold` is a
+regression (exit status 1).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from .synth import NEEDLE, Manifest, SynthConfig, ensure_repo, parse_mix
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+
+BASELINE = HERE / "baseline.json"
+
+# name -> factory(manifest) returning the zero-argument callable to time; setup work
+# (imports, prebuilt indexes, bundle files) happens in the factory, outside the timing.
+BENCHES: dict[str, Callable[[Manifest], Callable[[], Any]]] = {}
+
+
+def bench(name: str):
+    def register(factory):
+        BENCHES[name] = factory
+        return factory
+
+    return register
+
+
+def _index_once(**kwargs: Any) -> dict:
+    from codex_repo_tool.semantic import IncrementalIndex
+
+    idx = IncrementalIndex(".", **kwargs)
+    try:
+        idx.refresh()
+    finally:
+        idx.close()
+    return idx.to_dict()
+
+
+@bench("build_index")
+def _build_index(m: Manifest):
+    return lambda: _index_once(cache=False)  # everything parsed
+
+
+@bench("build_index_cached")
+def _build_index_cached(m: Manifest):
+    # a new process/worktree/branch with the same content: every parse is a cache hit
+    from codex_repo_tool.semantic import ParseCache
+
+    cache = ParseCache(Path(os.environ.get("CODEX_TMP", ".codexrt")) / "bench-parse.sqlite")
+    _index_once(cache=cache)
+    return lambda: _index_once(cache=cache)
+
+
+@bench("find_symbol")
+def _find_symbol(m: Manifest):
+    from codex_repo_tool.semantic import build_index, find_symbol
+
+    index = build_index(".")
+    names = m.symbols or ["missing"]
+    return lambda: [find_symbol(n, index) for n in names]
+
+
+@bench("parse_js")
+def _parse_js(m: Manifest):
+    from codex_repo_tool.semantic import _parse_js_like
+
+    paths = [p for p in Path(".").rglob("*") if p.suffix in (".js", ".ts")]
+    if not paths:
+        return None
+
+    def run():
+        for p in paths:
+            _parse_js_like(p)
+
+    run.bytes = sum(p.stat().st_size for p in paths)  # reported as throughput
+    return run
+
+
+@bench("search_code")
+def _search_code(m: Manifest):
+    from codex_repo_tool.search import search_code
+
+    return lambda: search_code(NEEDLE, ".")
+
+
+@bench("list_files")
+def _list_files(m: Manifest):
+    from codex_repo_tool.fs_utils import list_files
+
+    return lambda: list_files(".")
+
+
+@bench("read_file")
+def _read_file(m: Manifest):
+    from codex_repo_tool.fs_utils import read_file
+
+    paths = m.python_files
+
+    def run():
+        for p in paths:
+            read_file(p)
+            read_file(p, (3, 12))
+
+    return run
+
+
+@bench("apply_bundle")
+def _apply_bundle(m: Manifest):
+    if not m.config.get("commits") or not m.python_files:
+        return None
+    from codex_repo_tool.patch import apply_bundle, propose_bundle
+
+    # time the apply path itself (pre-screen, worktree, git apply), not the QA tools
+    policy = Path(".codexrt") / "policy.yaml"
+    policy.parent.mkdir(exist_ok=True)
+    policy.write_text("require_checks: {lint: false, tests: false}\n", encoding="utf-8")
+    target = m.python_files[0]
+    head = Path(target).read_text(encoding="utf-8").splitlines()[:3]
+    body = f" {head[0]}\n+# benchmark edit\n" + "".join(f" {ln}\n" for ln in head[1:])
+    diff = f"--- a/{target}\n+++ b/{target}\n@@ -1,3 +1,4 @@\n{body}"
+    bid = propose_bundle([{"file": target, "diff": diff, "description": "bench"}])
+
+    def run():
+        res = apply_bundle(bid)
+        if not res.get("applied"):
+            raise RuntimeError(f"apply_bundle failed: {res}")
+
+    return run
+
+
+@contextmanager
+def _chdir(path: str):
+    prev = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(prev)
+
+
+def time_call(fn: Callable[[], Any], repeat: int) -> dict[str, Any]:
+    fn()  # warm-up: page cache, imports, lazily built state
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "repeat": repeat,
+    }
+
+
+def run_benchmarks(
+    cfg: SynthConfig, workdir: str | Path, only: list[str] | None = None, repeat: int = 5
+) -> dict[str, Any]:
+    """Generate (or reuse) the repo for `cfg`, run the benchmarks and return a report."""
+    manifest = ensure_repo(cfg, workdir)
+    results: dict[str, Any] = {}
+    with _chdir(manifest.root):
+        for name, factory in BENCHES.items():
+            if only and name not in only:
+                continue
+            fn = factory(manifest)
+            if fn is None:
+                continue  # not applicable to this configuration (e.g. no git history)
+            results[name] = time_call(fn, repeat)
+            nbytes = getattr(fn, "bytes", None)
+            if nbytes and results[name]["min"]:
+                results[name]["mb_per_s"] = nbytes / results[name]["min"] / 1e6
+    return {
+        "meta": {
+            "config": cfg.label(),
+            "key": cfg.key(),
+            "files": manifest.files,
+            "by_lang": manifest.by_lang,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[dict]:
+    """
+    Compare with the baseline entry for the same configuration. Uses the fastest run:
+    it is far less sensitive to scheduler noise than the median.
+    """
+    base = baseline.get("configs", {}).get(report["meta"]["config"], {}).get("results", {})
+    rows = []
+    for name, cur in report["results"].items():
+        ref = base.get(name)
+        row = {"name": name, "current": cur["min"], "baseline": None, "ratio": None}
+        if ref is None:
+            row["status"] = "new"
+        else:
+            ratio = cur["min"] / ref["min"] if ref["min"] else 1.0
+            row.update(baseline=ref["min"], ratio=ratio)
+            if ratio > 1 + threshold:
+                row["status"] = "regression"
+            elif ratio < 1 / (1 + threshold):
+                row["status"] = "improvement"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def save_baseline(report: dict[str, Any], path: str | Path = BASELINE) -> None:
+    """Store `report` as the baseline of its configuration; benchmarks not run are kept."""
+    p = Path(path)
+    data = json.loads(p.read_text(encoding="utf-8")) if p.exists() else {}
+    configs = data.setdefault("configs", {})
+    old = configs.get(report["meta"]["config"], {}).get("results", {})
+    configs[report["meta"]["config"]] = {**report, "results": {**old, **report["results"]}}
+    p.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def _print_rows(rows: list[dict]) -> None:
+    print(f"{'benchmark':<16}{'best':>13}{'baseline':>13}{'ratio':>8}", file=sys.stderr)
+    for r in rows:
+        cur = f"{r['current'] * 1000:10.2f} ms"
+        base = f"{r['baseline'] * 1000:10.2f} ms" if r["baseline"] is not None else ""
+        ratio = f"{r['ratio']:7.2f}x" if r["ratio"] is not None else ""
+        print(f"{r['name']:<16}{cur:>13}{base:>13}{ratio:>8}  {r['status']}", file=sys.stderr)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser("benchmarks", description="Codex Repo Tool benchmarks")
+    ap.add_argument("--files", type=int, default=1000, help="Files in the synthetic repo")
+    ap.add_argument("--mix", default="py=0.6,js=0.15,ts=0.15,md=0.1", help="Language weights")
+    ap.add_argument("--imports", type=int, default=3, help="Mean imports per source file")
+    ap.add_argument("--commits", type=int, default=3, help="Git history length (0: no git)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--only", default=None, help="Comma-separated benchmark names")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--workdir", default=str(Path(".codexrt") / "bench"))
+    ap.add_argument("--out", default=None, help="Write the JSON report here (default stdout)")
+    ap.add_argument("--baseline", default=str(BASELINE))
+    ap.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown (0.25=25%%)")
+    ap.add_argument("--save-baseline", action="store_true", help="Store results as baseline")
+    args = ap.parse_args(argv)
+
+    cfg = SynthConfig(
+        files=args.files,
+        mix=parse_mix(args.mix),
+        imports=args.imports,
+        commits=args.commits,
+        seed=args.seed,
+    )
+    only = args.only.split(",") if args.only else None
+    report = run_benchmarks(cfg, Path(args.workdir).resolve(), only, args.repeat)
+
+    baseline = Path(args.baseline)
+    data = json.loads(baseline.read_text(encoding="utf-8")) if baseline.exists() else {}
+    rows = compare(report, data, args.threshold)
+    report["comparison"] = rows
+    _print_rows(rows)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.save_baseline:
+        save_baseline({k: v for k, v in report.items() if k != "comparison"}, baseline)
+        return 0
+    return 1 if any(r["status"] == "regression" for r in rows) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,231 @@
+"""Deterministic synthetic repositories for the benchmarks."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import subprocess
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+# Bump when the generated content changes, so cached repos are regenerated.
+GENERATOR_VERSION = 1
+
+NEEDLE = "TODO(bench)"
+_WORDS = (
+    "alpha beta gamma delta parse render load store fetch build index token graph node edge "
+    "cache queue worker session record buffer stream filter merge split route config user "
+    "order invoice report event metric span trace patch bundle policy watch"
+).split()
+_EXT = {"py": ".py", "js": ".js", "ts": ".ts", "md": ".md"}
+
+
+@dataclass(frozen=True)
+class SynthConfig:
+    files: int = 1000
+    # language -> weight; keys from _EXT
+    mix: tuple[tuple[str, float], ...] = (("py", 0.6), ("js", 0.15), ("ts", 0.15), ("md", 0.1))
+    imports: int = 3  # mean imports of other generated modules per source file
+    commits: int = 3  # 0: plain directory, no git repository
+    churn: float = 0.02  # fraction of files touched by each commit after the first
+    per_dir: int = 40
+    fanout: int = 16
+    seed: int = 0
+
+    def key(self) -> str:
+        raw = json.dumps([GENERATOR_VERSION, asdict(self)], sort_keys=True)
+        return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+    def label(self) -> str:
+        mix = ",".join(f"{k}={v:g}" for k, v in self.mix)
+        return f"files={self.files} mix={mix} imports={self.imports} commits={self.commits}"
+
+
+def parse_mix(spec: str) -> tuple[tuple[str, float], ...]:
+    """'py=0.6,js=0.2' -> (('py', 0.6), ('js', 0.2))"""
+    out = []
+    for part in spec.split(","):
+        lang, _, weight = part.partition("=")
+        if lang.strip() not in _EXT:
+            raise ValueError(f"unknown language {lang!r}; expected one of {sorted(_EXT)}")
+        out.append((lang.strip(), float(weight or 1)))
+    return tuple(out)
+
+
+@dataclass
+class Manifest:
+    root: str
+    config: dict
+    files: int
+    by_lang: dict[str, int] = field(default_factory=dict)
+    symbols: list[str] = field(default_factory=list)  # a sample of defined names
+    python_files: list[str] = field(default_factory=list)  # a sample of .py paths
+
+
+def _dir_for(i: int, cfg: SynthConfig) -> str:
+    n = i // cfg.per_dir
+    parts = []
+    while True:
+        parts.append(f"d{n % cfg.fanout}")
+        n //= cfg.fanout
+        if not n:
+            break
+    return "src/" + "/".join(reversed(parts))
+
+
+def _name(rng: random.Random, prefix: str = "") -> str:
+    return prefix + "_".join(rng.sample(_WORDS, 2)) + str(rng.randrange(1000))
+
+
+def _py(rng: random.Random, deps: list[str], symbols: list[str]) -> str:
+    out = ["from __future__ import annotations", "", "import os", "import json", ""]
+    out += [f"from {d} import {rng.choice(_WORDS)}" for d in deps]
+    for _ in range(rng.randint(1, 3)):
+        cls = _name(rng).title().replace("_", "")
+        symbols.append(cls)
+        out += ["", "", f"class {cls}:", f'    """{" ".join(rng.sample(_WORDS, 6))}."""', ""]
+        for _ in range(rng.randint(2, 5)):
+            meth = _name(rng)
+            kw = "async def" if rng.random() < 0.1 else "def"
+            out += [
+                f"    {kw} {meth}(self, value):",
+                "        result = value",
+                "        return result",
+                "",
+            ]
+    for _ in range(rng.randint(2, 6)):
+        fn = _name(rng)
+        symbols.append(fn)
+        body = [f"    # {NEEDLE}: tighten this"] if rng.random() < 0.05 else []
+        out += ["", "", f"def {fn}(items, limit=10):"] + body
+        out += [
+            "    total = 0",
+            "    for item in items[:limit]:",
+            "        total += len(str(item))",
+            "    return total",
+        ]
+    return "\n".join(out) + "\n"
+
+
+def _js(rng: random.Random, deps: list[str], symbols: list[str], ts: bool) -> str:
+    out = []
+    for d in deps:
+        if rng.random() < 0.5:
+            out.append(f"import {{ {rng.choice(_WORDS)} }} from './{d}';")
+        else:
+            out.append(f"const {rng.choice(_WORDS)}Mod = require('./{d}');")
+    ann = ": number" if ts else ""
+    for _ in range(rng.randint(2, 6)):
+        fn = _name(rng)
+        symbols.append(fn)
+        if rng.random() < 0.5:
+            out += ["", f"export function {fn}(items{': any[]' if ts else ''}){ann} {{"]
+            out += ["  let total = 0;", "  for (const it of items) total += String(it).length;"]
+            out += ["  return total;", "}"]
+        else:
+            out += ["", f"export const {fn} = (x{ann}) => x * 2;"]
+    cls = _name(rng).title().replace("_", "")
+    symbols.append(cls)
+    out += ["", f"export class {cls} {{", "  constructor() { this.items = []; }", "}"]
+    return "\n".join(out) + "\n"
+
+
+def _md(rng: random.Random) -> str:
+    paras = []
+    for _ in range(rng.randint(2, 6)):
+        paras.append(" ".join(rng.choice(_WORDS) for _ in range(rng.randint(20, 60))) + ".")
+    if rng.random() < 0.2:
+        paras.append(f"{NEEDLE}: document this module.")
+    return f"# {_name(rng)}\n\n" + "\n\n".join(paras) + "\n"
+
+
+def _git(root: Path, *args: str, env: dict[str, str]) -> None:
+    subprocess.run(["git", *args], cwd=root, env=env, check=True, capture_output=True)
+
+
+def _git_env(seq: int) -> dict[str, str]:
+    # fixed identities and timestamps keep commit ids identical across runs
+    date = f"{1_700_000_000 + seq * 3600} +0000"
+    return {
+        **os.environ,
+        "GIT_AUTHOR_NAME": "Bench",
+        "GIT_AUTHOR_EMAIL": "bench@example.com",
+        "GIT_COMMITTER_NAME": "Bench",
+        "GIT_COMMITTER_EMAIL": "bench@example.com",
+        "GIT_AUTHOR_DATE": date,
+        "GIT_COMMITTER_DATE": date,
+    }
+
+
+def generate(root: str | Path, cfg: SynthConfig = SynthConfig()) -> Manifest:
+    """Write the repository described by `cfg` into (empty or missing) `root`."""
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(cfg.seed)
+    langs = [k for k, _ in cfg.mix]
+    weights = [w for _, w in cfg.mix]
+    manifest = Manifest(str(root), asdict(cfg), cfg.files)
+    modules: list[str] = []  # dotted python modules generated so far
+    scripts: list[str] = []  # js/ts paths (without extension) generated so far
+    paths: list[Path] = []
+    made: set[str] = set()
+    for i in range(cfg.files):
+        lang = rng.choices(langs, weights)[0]
+        d = _dir_for(i, cfg)
+        if d not in made:
+            (root / d).mkdir(parents=True, exist_ok=True)
+            made.add(d)
+        stem = f"m{i}"
+        rel = f"{d}/{stem}{_EXT[lang]}"
+        n_deps = min(int(rng.expovariate(1 / cfg.imports)) if cfg.imports else 0, 20)
+        symbols: list[str] = []
+        if lang == "py":
+            deps = rng.sample(modules, min(n_deps, len(modules)))
+            text = _py(rng, deps, symbols)
+            modules.append(rel[:-3].replace("/", "."))
+            if len(manifest.python_files) < 200:
+                manifest.python_files.append(rel)
+        elif lang in ("js", "ts"):
+            deps = rng.sample(scripts, min(n_deps, len(scripts)))
+            rels = [os.path.relpath(x, d) for x in deps]
+            text = _js(rng, rels, symbols, lang == "ts")
+            scripts.append(f"{d}/{stem}")
+        else:
+            text = _md(rng)
+        if symbols and len(manifest.symbols) < 200 and rng.random() < 0.2:
+            manifest.symbols.append(symbols[0])
+        (root / rel).write_text(text, encoding="utf-8")
+        manifest.by_lang[lang] = manifest.by_lang.get(lang, 0) + 1
+        paths.append(root / rel)
+
+    (root / ".gitignore").write_text(".codexrt/\n", encoding="utf-8")
+    if cfg.commits:
+        _git(root, "init", "-q", env=_git_env(0))
+        _git(root, "add", "-A", env=_git_env(0))
+        _git(root, "commit", "-qm", "initial", env=_git_env(0))
+        for c in range(1, cfg.commits):
+            for p in rng.sample(paths, max(1, int(len(paths) * cfg.churn))):
+                comment = {".py": "# ", ".md": ""}.get(p.suffix, "// ")
+                with p.open("a", encoding="utf-8") as fh:
+                    fh.write(f"\n{comment}revision {c}\n")
+            _git(root, "add", "-A", env=_git_env(c))
+            _git(root, "commit", "-qm", f"revision {c}", env=_git_env(c))
+    return manifest
+
+
+def ensure_repo(cfg: SynthConfig, workdir: str | Path) -> Manifest:
+    """Generate the repo for `cfg` under `workdir` once and reuse it afterwards."""
+    root = Path(workdir) / cfg.key()
+    marker = root / ".codexrt" / "bench-manifest.json"
+    if marker.exists():
+        return Manifest(**json.loads(marker.read_text(encoding="utf-8")))
+    if root.exists():
+        import shutil
+
+        shutil.rmtree(root)  # a previous generation was interrupted
+    manifest = generate(root, cfg)
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    marker.write_text(json.dumps(asdict(manifest)), encoding="utf-8")
+    return manifest
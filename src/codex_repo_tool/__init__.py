@@ -1,11 +1,31 @@
 """CodexRepoTool package"""
 
-from .fs_utils import list_files, read_file
-from .github_api import comment_pr, link_to_issue, list_issues, open_pull_request
-from .patch import apply_patch, discard_patch, propose_patch
-from .qa import lint_code, run_tests
-from .search import search_code
-from .task import run as run_task
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+# Public name -> (submodule, attribute). Submodules are imported on first access so
+# `import codex_repo_tool` stays cheap (no requests/yaml until they are needed).
+_LAZY: dict[str, tuple[str, str]] = {
+    "list_files": ("fs_utils", "list_files"),
+    "read_file": ("fs_utils", "read_file"),
+    "search_code": ("search", "search_code"),
+    "propose_patch": ("patch", "propose_patch"),
+    "apply_patch": ("patch", "apply_patch"),
+    "discard_patch": ("patch", "discard_patch"),
+    "run_tests": ("qa", "run_tests"),
+    "lint_code": ("qa", "lint_code"),
+    "open_pull_request": ("github_api", "open_pull_request"),
+    "comment_pr": ("github_api", "comment_pr"),
+    "list_issues": ("github_api", "list_issues"),
+    "iter_issues": ("github_api", "iter_issues"),
+    "sync_issues": ("github_api", "sync_issues"),
+    "PROperation": ("github_api", "PROperation"),
+    "batch_pull_requests": ("github_api", "batch_pull_requests"),
+    "link_to_issue": ("github_api", "link_to_issue"),
+    "run_task": ("task", "run"),
+}
 
 __all__ = [
     "list_files",
@@ -19,6 +39,41 @@ __all__ = [
     "open_pull_request",
     "comment_pr",
     "list_issues",
+    "iter_issues",
+    "sync_issues",
+    "PROperation",
+    "batch_pull_requests",
     "link_to_issue",
     "run_task",
 ]
+
+if TYPE_CHECKING:
+    from .fs_utils import list_files, read_file
+    from .github_api import (
+        PROperation,
+        batch_pull_requests,
+        comment_pr,
+        iter_issues,
+        link_to_issue,
+        list_issues,
+        open_pull_request,
+        sync_issues,
+    )
+    from .patch import apply_patch, discard_patch, propose_patch
+    from .qa import lint_code, run_tests
+    from .search import search_code
+    from .task import run as run_task
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module, attr = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(f".{module}", __name__), attr)
+    globals()[name] = value  # cache: later lookups skip __getattr__
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import json
+import re
+import sys
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Any
+
+from .sandbox import WorktreePool
+from .semantic import build_index
+from .task import run as run_task
+
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+
+def load_goals(path: str | Path) -> list[dict[str, Any]]:
+    """
+    Read goals from JSONL. Each line is either a JSON string (the goal) or an object
+    with "goal" and optional "id", "auto_pr", "model", "candidates". Missing ids
+    default to "goal-<line number>". A line that is not a valid goal becomes an entry
+    with an "error" naming the line; run_batch records it as failed and moves on.
+    """
+    goals: list[dict[str, Any]] = []
+    for n, line in enumerate(Path(path).read_text(encoding="utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            entry = {"error": f"line {n}: invalid JSON: {e}"}
+        if isinstance(entry, str):
+            entry = {"goal": entry}
+        elif not isinstance(entry, dict):
+            entry = {"error": f"line {n}: expected a string or an object"}
+        elif "error" not in entry and not isinstance(entry.get("goal"), str):
+            entry = {**entry, "error": f'line {n}: no "goal" string'}
+        entry.setdefault("id", f"goal-{n}")
+        goals.append(entry)
+    return goals
+
+
+def _load_checkpoint(path: Path) -> set[str]:
+    done: set[str] = set()
+    if not path.exists():
+        return done
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            done.add(json.loads(line)["id"])
+        except (ValueError, KeyError, TypeError):
+            continue  # a torn last line from a crash
+    return done
+
+
+def goal_context(goal: str, index: dict, max_files: int = 8) -> dict[str, str]:
+    """
+    Pick files from a prebuilt index whose name or symbols are mentioned in the goal
+    and return {path: content} for the best `max_files` of them.
+    """
+    words = set(_WORD_RE.findall(goal))
+    if not words:
+        return {}
+    scored: list[tuple[int, str]] = []
+    for path, data in index.get("files", {}).items():
+        score = 2 if Path(path).stem in words else 0
+        score += sum(1 for s in data.get("symbols", []) if s["name"] in words)
+        if score:
+            scored.append((score, path))
+    scored.sort(key=lambda t: (-t[0], t[1]))
+    context: dict[str, str] = {}
+    for _, path in scored[:max_files]:
+        try:
+            context[path] = Path(path).read_text(encoding="utf-8", errors="ignore")
+        except OSError:
+            continue
+    return context
+
+
+def run_batch(
+    goals_path: str | Path,
+    workers: int = 4,
+    out: IO[str] | None = None,
+    checkpoint: str | Path | None = None,
+    auto_pr: bool = False,
+    root: str = ".",
+    runner: Callable[..., dict[str, Any]] = run_task,
+) -> dict[str, Any]:
+    """
+    Run many goals in one process with at most `workers` in flight. All goals share one
+    semantic index, the pooled HTTP sessions and a WorktreePool. Each result is written
+    to `out` as one NDJSON line as soon as it finishes, and its id appended to
+    `checkpoint` so a rerun after a crash skips completed goals.
+    """
+    out = out or sys.stdout
+    goals = load_goals(goals_path)
+    ckpt = Path(checkpoint) if checkpoint else None
+    done = _load_checkpoint(ckpt) if ckpt else set()
+    pending = [g for g in goals if g["id"] not in done]
+
+    index = build_index(root)
+    pool = WorktreePool(size=workers)
+    lock = threading.Lock()
+    summary = {"total": len(goals), "skipped": len(goals) - len(pending), "ok": 0, "failed": 0}
+
+    def _one(entry: dict[str, Any]) -> None:
+        if "error" in entry:
+            res: dict[str, Any] = {"ok": False, "stage": "input", "error": entry["error"]}
+        else:
+            try:
+                res = runner(
+                    goal=entry["goal"],
+                    auto_pr=entry.get("auto_pr", auto_pr),
+                    model=entry.get("model"),
+                    candidates=entry.get("candidates", 1),
+                    context=goal_context(entry["goal"], index),
+                    pool=pool,
+                )
+            except Exception as e:
+                res = {"ok": False, "stage": "error", "error": str(e)}
+        line = json.dumps({"id": entry["id"], "goal": entry.get("goal"), **res}, default=str)
+        with lock:
+            summary["ok" if res.get("ok") else "failed"] += 1
+            out.write(line + "\n")
+            out.flush()
+            if ckpt:
+                with ckpt.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps({"id": entry["id"], "ok": bool(res.get("ok"))}) + "\n")
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            list(executor.map(_one, pending))
+    finally:
+        pool.close()
+    return summary
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from .model_adapter import get_diff
+from .tracing import span
+
+# (goal, context, model, temperature) -> unified diff
+Generator = Callable[[str, dict[str, str], "str | None", float], str]
+# diff -> validation result with an "applied" bool (see patch.validate_items)
+Validator = Callable[[str], dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class Candidate:
+    model: str | None = None
+    temperature: float = 0.0
+
+
+def default_candidates(n: int, model: str | None = None) -> list[Candidate]:
+    """Spread `n` candidates over temperatures 0.0 .. 1.0 for a single model."""
+    if n <= 1:
+        return [Candidate(model, 0.0)]
+    step = 1.0 / (n - 1)
+    return [Candidate(model, round(i * step, 2)) for i in range(n)]
+
+
+async def first_valid_diff(
+    goal: str,
+    context: dict[str, str],
+    candidates: list[Candidate],
+    validate: Validator,
+    generate: Generator = get_diff,
+) -> dict[str, Any]:
+    """
+    Request every candidate diff concurrently and validate each as soon as it arrives.
+    Returns as soon as one validates; remaining candidates are cancelled. Work already
+    running in a thread cannot be interrupted, but it will not start a sandbox once a
+    winner is known.
+
+    Result: {"ok", "diff", "candidate", "result", "attempts": [...]}. On failure "result"
+    holds the last validation result (empty if no candidate produced a diff).
+    """
+    loop = asyncio.get_running_loop()
+    done = threading.Event()
+    pool = ThreadPoolExecutor(
+        max_workers=max(1, len(candidates)), thread_name_prefix="codexrt-cand"
+    )
+    attempts: list[dict[str, Any]] = []
+    last_result: dict[str, Any] = {}
+
+    def _work(c: Candidate) -> dict[str, Any]:
+        with span("candidate", model=c.model, temperature=c.temperature):
+            with span("model", model=c.model):
+                diff = generate(goal, context, c.model, c.temperature)
+            if not isinstance(diff, str) or not diff.strip():
+                return {"candidate": asdict(c), "stage": "plan", "reason": "no-diff"}
+            if done.is_set():
+                return {"candidate": asdict(c), "stage": "cancelled"}
+            res = validate(diff)
+            return {"candidate": asdict(c), "diff": diff, "result": res}
+
+    # run_in_executor does not carry context over; copy it so spans opened in the
+    # worker threads nest under the caller's (one copy per candidate: a Context
+    # cannot be entered by two threads at once)
+    tasks = [
+        loop.run_in_executor(pool, contextvars.copy_context().run, _work, c) for c in candidates
+    ]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            try:
+                att = await fut
+            except Exception as e:  # a provider error only sinks that candidate
+                attempts.append({"stage": "error", "error": str(e)})
+                continue
+            res = att.get("result") or {}
+            if res:
+                last_result = res
+            attempts.append(
+                {k: v for k, v in att.items() if k != "diff" and k != "result"}
+                | {"stage": res.get("stage", att.get("stage")), "applied": bool(res.get("applied"))}
+            )
+            if res.get("applied"):
+                done.set()
+                return {
+                    "ok": True,
+                    "diff": att["diff"],
+                    "candidate": att["candidate"],
+                    "result": res,
+                    "attempts": attempts,
+                }
+        stage = last_result.get("stage") or "plan"
+        return {"ok": False, "stage": stage, "result": last_result, "attempts": attempts}
+    finally:
+        done.set()
+        for t in tasks:
+            t.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_candidates(
+    goal: str,
+    context: dict[str, str],
+    candidates: list[Candidate],
+    validate: Validator,
+    generate: Generator = get_diff,
+) -> dict[str, Any]:
+    """Synchronous wrapper around `first_valid_diff`."""
+    return asyncio.run(first_valid_diff(goal, context, candidates, validate, generate))
@@ -2,47 +2,46 @@ from __future__ import annotations
 
 import argparse
 import json
+import sys
+from typing import Any
 
-from .fs_utils import list_files, read_file
-from .github_api import open_pull_request
-from .patch import (
-    apply_bundle,
-    apply_patch,
-    discard_patch,
-    propose_bundle,
-    propose_patch,
-)
-from .qa import lint_code, run_tests
-from .search import search_code
-from .semantic import (
-    build_index,
-    dependency_graph,
-    find_symbol,
-    save_repo_map,
-)
-from .task import run as run_task
+# Subcommand implementations are imported inside their branch of execute(): agents call
+# the CLI thousands of times per task, and `cat`/`ls` should not pay for requests,
+# yaml or the indexer.
 
 
-def main() -> None:
+_REV_HELP = "Read this git revision from the object database instead of the working tree"
+
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser("codexrt", description="Codex Repo Tool CLI")
+    parser.add_argument(
+        "--trace", default=None, metavar="PATH", help="Write stage spans as OTLP/JSON here"
+    )
+    parser.add_argument(
+        "--profile", default=None, metavar="PATH", help="Write a cProfile dump (pstats) here"
+    )
     sub = parser.add_subparsers(dest="cmd", required=True)
 
     # ls
     p_ls = sub.add_parser("ls", help="List files")
     p_ls.add_argument("--path", default=".")
     p_ls.add_argument("--pattern", default=None)
+    p_ls.add_argument("--rev", default=None, help=_REV_HELP)
 
     # cat
     p_cat = sub.add_parser("cat", help="Read a file (slice)")
     p_cat.add_argument("path")
     p_cat.add_argument("--start", type=int)
     p_cat.add_argument("--end", type=int)
+    p_cat.add_argument("--rev", default=None, help=_REV_HELP)
 
     # search
     p_search = sub.add_parser("search", help="Search code via ripgrep/grep")
     p_search.add_argument("pattern")
     p_search.add_argument("--path", default=".")
     p_search.add_argument("--max", type=int, default=200)
+    p_search.add_argument("--rev", default=None, help=_REV_HELP)
 
     # patch ops
     p_prop = sub.add_parser("propose", help="Propose a single-file patch")
@@ -65,6 +64,18 @@ def main() -> None:
     p_apply_bundle.add_argument("bundle_id")
     p_apply_bundle.add_argument("--branch", default="HEAD")
 
+    p_pending = sub.add_parser(
+        "validate-pending", help="Validate pending patches/bundles in non-conflicting batches"
+    )
+    p_pending.add_argument("--branch", default="HEAD")
+    p_pending.add_argument("--max-batch", type=int, default=16)
+
+    p_patches = sub.add_parser("patches", help="List stored patches and bundles")
+    p_patches.add_argument("--file", default=None, help="Only entries touching this path")
+    p_patches.add_argument("--status", default=None, help="pending/checking/applied/failed")
+    p_patches.add_argument("--kind", default=None, choices=["patch", "bundle"])
+    p_patches.add_argument("--gc", type=float, default=None, help="First drop entries idle N s")
+
     # QA
     p_test = sub.add_parser("test", help="Run tests (best effort)")
     p_test.add_argument("--scope", default=None)
@@ -75,22 +86,54 @@ def main() -> None:
     # index/symbol/deps/summarize
     p_index = sub.add_parser("index", help="Build repo index")
     p_index.add_argument("--root", default=".")
+    p_index.add_argument("--rev", default=None, help=_REV_HELP)
 
     p_symbol = sub.add_parser("symbol", help="Find symbol by name")
     p_symbol.add_argument("name")
     p_symbol.add_argument("--root", default=".")
+    p_symbol.add_argument("--rev", default=None, help=_REV_HELP)
+
+    p_src = sub.add_parser("symbol-source", help="Print the source of a symbol (e.g. Class.method)")
+    p_src.add_argument("name", help="Bare or qualified name")
+    p_src.add_argument("--root", default=".")
+    p_src.add_argument("--file", default=None, help="Only look in this file (parses just it)")
 
     p_deps = sub.add_parser("deps", help="Dependency graph (adjacency)")
     p_deps.add_argument("--root", default=".")
 
-    p_sum = sub.add_parser("summarize", help="Write repo summary map to disk")
+    p_sum = sub.add_parser(
+        "summarize", help="Repo summary ranked by import centrality, cut to a budget"
+    )
     p_sum.add_argument("--root", default=".")
+    p_sum.add_argument("--tokens", type=int, default=2048, help="Budget in tokens (~4 bytes)")
+    p_sum.add_argument("--bytes", type=int, default=None, help="Budget in bytes")
 
     # simplified task runner
     p_run = sub.add_parser("run", help="Run a task with minimal options")
     p_run.add_argument("goal", help="Natural language task objective")
     p_run.add_argument("--auto-pr", action="store_true", default=False)
+    p_run.add_argument(
+        "--branch", default=None, help="Branch to push for --auto-pr (default codexrt/auto/...)"
+    )
     p_run.add_argument("--model", default=None)
+    p_run.add_argument(
+        "--candidates", type=int, default=1, help="Concurrent candidate diffs (first valid wins)"
+    )
+    p_run.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Use the model response cache (--no-cache bypasses it)",
+    )
+
+    # batch runner
+    p_batch = sub.add_parser("batch", help="Run many goals from a JSONL file (NDJSON results)")
+    p_batch.add_argument("goals", help="JSONL file: one goal string or {goal, id, ...} per line")
+    p_batch.add_argument("--workers", type=int, default=4)
+    p_batch.add_argument("--checkpoint", default=None, help="Resume file of completed goal ids")
+    p_batch.add_argument("--out", default=None, help="Write NDJSON results here (default stdout)")
+    p_batch.add_argument("--auto-pr", action="store_true", default=False)
+    p_batch.add_argument("--root", default=".")
 
     # task orchestrator
     p_task = sub.add_parser("task", help="Plan → validate → (optional) PR")
@@ -105,57 +148,154 @@ def main() -> None:
     p_task.add_argument("--time-budget-sec", type=int, default=600)
     p_task.add_argument("--strict-checks", action="store_true")
 
+    # model response cache
+    p_cache = sub.add_parser("cache", help="Model response cache stats")
+    p_cache.add_argument("--clear", action="store_true")
+
+    # subprocess / I/O metrics
+    p_stats = sub.add_parser("stats", help="Subprocess and I/O metrics (see metrics.json)")
+    p_stats.add_argument("--reset", action="store_true", help="Clear the recorded metrics")
+
+    # daemon
+    p_serve = sub.add_parser("serve", help="Run a warm daemon on a local Unix socket")
+    p_serve.add_argument(
+        "--socket", default=None, help="Socket path (default .codexrt/daemon.sock)"
+    )
+    p_serve.add_argument("--workers", type=int, default=4, help="Worktree pool size")
+    p_serve.add_argument(
+        "--watch",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Keep indexes current with a file watcher (--no-watch rescans per query)",
+    )
+
     # PR
     p_pr = sub.add_parser("pr", help="Open PR")
     p_pr.add_argument("--branch", required=True)
     p_pr.add_argument("--title", required=True)
     p_pr.add_argument("--body", default="")
 
-    args = parser.parse_args()
+    return parser
+
+
+# Commands whose result is printed as plain text rather than JSON.
+_RAW_OUTPUT = {"cat", "summarize"}
+# Commands that never go through the daemon (they stream output or manage it).
+_LOCAL_ONLY = {"serve", "batch"}
+
+
+class UnknownCommand(ValueError):
+    """execute() was given a subcommand it does not implement."""
+
+
+def execute(cmd: str, params: dict[str, Any]) -> Any:
+    """Run one subcommand in-process and return its result (also used by the daemon)."""
+    args = argparse.Namespace(**params)
+    rev = params.get("rev")  # older daemon clients do not send it
+    if cmd == "ls":
+        from .fs_utils import list_files
+
+        return list_files(args.path, args.pattern, rev)
+    if cmd == "cat":
+        from .fs_utils import read_file
 
-    if args.cmd == "ls":
-        print(json.dumps(list_files(args.path, args.pattern), indent=2))
-    elif args.cmd == "cat":
         lines = (args.start, args.end) if args.start and args.end else None
-        print(read_file(args.path, lines))
-    elif args.cmd == "search":
-        print(json.dumps(search_code(args.pattern, args.path, args.max), indent=2))
-    elif args.cmd == "propose":
-        print(json.dumps(propose_patch(args.file, args.diff, args.description), indent=2))
-    elif args.cmd == "apply":
-        print(json.dumps(apply_patch(args.patch_id, args.branch), indent=2))
-    elif args.cmd == "discard":
-        print(json.dumps(discard_patch(args.patch_id), indent=2))
-    elif args.cmd == "bundle":
-        items = json.loads(args.items_json)
-        print(json.dumps(propose_bundle(items), indent=2))
-    elif args.cmd == "apply-bundle-commit":
+        return read_file(args.path, lines, rev)
+    if cmd == "search":
+        from .search import search_code
+
+        return search_code(args.pattern, args.path, args.max, rev)
+    if cmd == "propose":
+        from .patch import propose_patch
+
+        return propose_patch(args.file, args.diff, args.description)
+    if cmd == "apply":
+        from .patch import apply_patch
+
+        return apply_patch(args.patch_id, args.branch)
+    if cmd == "discard":
+        from .patch import discard_patch
+
+        return discard_patch(args.patch_id)
+    if cmd == "bundle":
+        from .patch import propose_bundle
+
+        return propose_bundle(json.loads(args.items_json))
+    if cmd == "apply-bundle-commit":
+        from .patch import apply_bundle
+
         # Validate bundle in sandbox
-        res = apply_bundle(args.bundle_id, args.branch)
-        print(json.dumps(res, indent=2))
-        if not res.get("applied"):
-            return
-    elif args.cmd == "test":
-        print(json.dumps(run_tests(args.scope), indent=2))
-    elif args.cmd == "lint":
-        print(json.dumps(lint_code(args.scope), indent=2))
-    elif args.cmd == "index":
-        print(json.dumps(build_index(args.root), indent=2))
-    elif args.cmd == "symbol":
-        idx = build_index(args.root)
-        print(json.dumps(find_symbol(args.name, idx), indent=2))
-    elif args.cmd == "deps":
-        idx = build_index(args.root)
-        print(json.dumps(dependency_graph(idx), indent=2))
-    elif args.cmd == "summarize":
-        idx = build_index(args.root)
-        path = save_repo_map(idx, args.root)
-        print(path)
-    elif args.cmd == "run":
-        res = run_task(goal=args.goal, auto_pr=args.auto_pr, model=args.model)
-        print(json.dumps(res, indent=2))
-    elif args.cmd == "task":
-        res = run_task(
+        return apply_bundle(args.bundle_id, args.branch)
+    if cmd == "validate-pending":
+        from .merge import validate_pending
+
+        return validate_pending(args.branch, max_batch=args.max_batch)
+    if cmd == "patches":
+        from .store import default_store
+
+        store = default_store()
+        removed = store.gc(args.gc) if args.gc is not None else 0
+        entries = store.find(args.file, args.status, args.kind)
+        return {"entries": entries, "removed": removed}
+    if cmd == "test":
+        from .qa import run_tests
+
+        return run_tests(args.scope)
+    if cmd == "lint":
+        from .qa import lint_code
+
+        return lint_code(args.scope)
+    if cmd == "index":
+        from .semantic import build_index
+
+        return build_index(args.root, rev)
+    if cmd == "symbol":
+        from .semantic import build_index, find_symbol
+
+        return find_symbol(args.name, build_index(args.root, rev))
+    if cmd == "symbol-source":
+        from .semantic import symbol_source
+
+        return symbol_source(args.name, root=args.root, file=args.file)
+    if cmd == "deps":
+        from .semantic import build_index, dependency_graph
+
+        return dependency_graph(build_index(args.root))
+    if cmd == "summarize":
+        from .repomap import summarize_repo
+        from .semantic import IncrementalIndex, save_repo_map
+
+        index = IncrementalIndex(args.root)
+        try:
+            index.refresh()
+        finally:
+            index.close()
+        save_repo_map(index.to_dict(), args.root)  # the full index, for other tools
+        return summarize_repo(args.root, args.tokens, args.bytes, index=index)
+    if cmd == "run":
+        from .task import run as run_task
+
+        return run_task(
+            goal=args.goal,
+            auto_pr=args.auto_pr,
+            model=args.model,
+            candidates=args.candidates,
+            cache=args.cache,
+            branch=args.branch,
+        )
+    if cmd == "batch":
+        from .batch import run_batch
+
+        if args.out:
+            with open(args.out, "a", encoding="utf-8") as fh:
+                return run_batch(
+                    args.goals, args.workers, fh, args.checkpoint, args.auto_pr, args.root
+                )
+        return run_batch(args.goals, args.workers, None, args.checkpoint, args.auto_pr, args.root)
+    if cmd == "task":
+        from .task import run as run_task
+
+        return run_task(
             goal=args.goal,
             hints=args.hints,
             dry_run=args.dry_run,
@@ -167,11 +307,99 @@ def main() -> None:
             time_budget_sec=args.time_budget_sec,
             strict_checks=args.strict_checks,
         )
-        print(json.dumps(res, indent=2))
-    elif args.cmd == "pr":
-        print(json.dumps(open_pull_request(args.branch, args.title, args.body), indent=2))
+    if cmd == "cache":
+        from .model_cache import ResponseCache
+
+        cache = ResponseCache()
+        if args.clear:
+            return {"removed": cache.clear()}
+        return cache.stats()
+    if cmd == "stats":
+        from .metrics import load, reset
+
+        if args.reset:
+            reset()
+            return {"reset": True}
+        return load()
+    if cmd == "pr":
+        from .github_api import open_pull_request
+
+        return open_pull_request(args.branch, args.title, args.body)
+    raise UnknownCommand(f"unknown command: {cmd}")
+
+
+def _emit(cmd: str, result: Any) -> None:
+    if cmd == "batch":
+        # results were streamed as NDJSON; keep stdout clean
+        print(json.dumps(result), file=sys.stderr)
+    elif cmd in _RAW_OUTPUT:
+        print(result)
     else:
-        parser.print_help()
+        print(json.dumps(result, indent=2))
+
+
+def _flush_metrics() -> None:
+    # only if the command loaded the module, i.e. it may have recorded something
+    metrics = sys.modules.get("codex_repo_tool.metrics")
+    if metrics is not None:
+        metrics.flush()
+
+
+def _execute_instrumented(
+    cmd: str, params: dict[str, Any], trace: str | None, profile: str | None
+) -> Any:
+    """execute() under a root span and/or cProfile; the files are written even on error."""
+    from contextlib import ExitStack
+
+    with ExitStack() as stack:
+        if trace:
+            from .tracing import span, write_otlp
+
+            roots: list = []
+            # registered first so it runs last, after the root span has closed
+            stack.callback(lambda: roots and write_otlp(roots[0].trace, trace))
+            roots.append(stack.enter_context(span(f"codexrt.{cmd}")))
+        if profile:
+            import cProfile
+
+            prof = cProfile.Profile()
+            stack.callback(prof.dump_stats, profile)
+            stack.callback(prof.disable)
+            prof.enable()
+        return execute(cmd, params)
+
+
+def main() -> None:
+    parser = build_parser()
+    args = parser.parse_args()
+    params = {k: v for k, v in vars(args).items() if k not in ("cmd", "trace", "profile")}
+
+    if args.cmd == "serve":
+        from .daemon import serve
+
+        serve(args.socket, workers=args.workers, watch=args.watch)
+        return
+
+    if args.trace or args.profile:
+        # measure this process: a daemon would run the command where we cannot see it
+        try:
+            _emit(args.cmd, _execute_instrumented(args.cmd, params, args.trace, args.profile))
+        finally:
+            _flush_metrics()
+        return
+
+    if args.cmd not in _LOCAL_ONLY:
+        from .daemon import try_call
+
+        found, result = try_call(args.cmd, params)
+        if found:
+            _emit(args.cmd, result)
+            return
+
+    try:
+        _emit(args.cmd, execute(args.cmd, params))
+    finally:
+        _flush_metrics()
 
 
 if __name__ == "__main__":
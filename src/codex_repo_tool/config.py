@@ -10,6 +10,24 @@ class Settings:
     # Use a real Path so callers can do: SETTINGS.tmp_dir / "something"
     tmp_dir: Path = Path(os.environ.get("CODEX_TMP", ".codexrt"))
     github_token_env: str = "GITHUB_TOKEN"
+    # HTTP connection pooling / retry (see http_client.py)
+    http_pool_connections: int = int(os.environ.get("CODEXRT_HTTP_POOL_CONNECTIONS", "4"))
+    http_pool_maxsize: int = int(os.environ.get("CODEXRT_HTTP_POOL_MAXSIZE", "16"))
+    http_max_retries: int = int(os.environ.get("CODEXRT_HTTP_MAX_RETRIES", "3"))
+    http_backoff_base: float = float(os.environ.get("CODEXRT_HTTP_BACKOFF_BASE", "0.5"))
+    http_backoff_max: float = float(os.environ.get("CODEXRT_HTTP_BACKOFF_MAX", "30"))
+    # Model response cache bounds (see model_cache.py)
+    model_cache_max_bytes: int = int(os.environ.get("CODEXRT_MODEL_CACHE_MAX_BYTES", str(64 << 20)))
+    model_cache_ttl: float = float(os.environ.get("CODEXRT_MODEL_CACHE_TTL", str(7 * 86400)))
+    # JS/TS files larger than this are assumed to be bundles and not indexed (semantic.py)
+    index_js_max_bytes: int = int(os.environ.get("CODEXRT_INDEX_JS_MAX_BYTES", str(1 << 20)))
+    # Where the index enumerates files from: "git" (ls-files + cat-file), "fs" (directory
+    # walk) or "auto" (git inside a work tree)
+    index_source: str = os.environ.get("CODEXRT_INDEX_SOURCE", "auto")
+    # Parse results by blob SHA; empty: <tmp_dir>/cache/parse.sqlite, "off": disabled
+    parse_cache: str = os.environ.get("CODEXRT_PARSE_CACHE", "")
+    # Proposed patches and bundles not updated for this many seconds are deleted (store.py)
+    store_ttl: float = float(os.environ.get("CODEXRT_STORE_TTL", str(7 * 86400)))
 
 
 SETTINGS = Settings()
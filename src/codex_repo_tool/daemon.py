@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+# Only light stdlib modules at module level: the CLI imports this on every call to look
+# for a daemon.
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from .repomap import RepoMap
+    from .semantic import IncrementalIndex
+
+# JSON-RPC error codes
+_FALLBACK = -32001  # daemon cannot serve this request; client runs it in-process
+_METHOD_NOT_FOUND = -32601
+_INTERNAL = -32603
+
+# Seconds between metrics-file flushes while serving (see metrics.flush).
+_METRICS_FLUSH_INTERVAL = 5.0
+# Indexes of other revisions kept per root (least recently used dropped first)
+_REV_INDEXES = 4
+# Environment that changes what a command does (credentials, model, settings). It is
+# process-wide, so a daemon only serves clients whose values match its own.
+_ENV_PREFIXES = ("GITHUB_", "MODEL_", "OPENAI_", "CODEXRT_", "CODEX_")
+_ENV_NAMES = ("DEFAULT_BRANCH", "DIFF_ENDPOINT")
+_ENV_IGNORED = ("CODEXRT_SOCKET", "CODEXRT_NO_DAEMON")  # how to reach a daemon, not what it does
+
+
+class DaemonError(RuntimeError):
+    """A command raised inside the daemon."""
+
+
+def socket_path() -> Path:
+    env = os.environ.get("CODEXRT_SOCKET")
+    if env:
+        return Path(env)
+    # Same default as config.Settings.tmp_dir, read directly so the client does not
+    # import config (and with it dataclasses) on every CLI call.
+    return Path(os.environ.get("CODEX_TMP", ".codexrt")) / "daemon.sock"
+
+
+def env_digest() -> str:
+    """Digest of the relevant environment (see _ENV_PREFIXES), so secrets stay local."""
+    env = sorted(
+        (k, v)
+        for k, v in os.environ.items()
+        if (k.startswith(_ENV_PREFIXES) or k in _ENV_NAMES) and k not in _ENV_IGNORED
+    )
+    return hashlib.sha256(json.dumps(env).encode()).hexdigest()
+
+
+def _rpc(path: Path, method: str, params: dict[str, Any], timeout: float | None) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(str(path))
+        req = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        s.sendall(json.dumps(req).encode() + b"\n")
+        with s.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("daemon closed the connection")
+    return json.loads(line)
+
+
+def try_call(
+    cmd: str,
+    params: dict[str, Any],
+    path: str | Path | None = None,
+    timeout: float | None = None,
+) -> tuple[bool, Any]:
+    """
+    Run `cmd` on a running daemon. Returns (True, result) if the daemon served it, or
+    (False, None) when there is no usable daemon (no socket, stale socket, different
+    working directory or environment, CODEXRT_NO_DAEMON set) and the caller should run
+    in-process.
+    """
+    if os.environ.get("CODEXRT_NO_DAEMON"):
+        return False, None
+    p = Path(path) if path else socket_path()
+    if not p.exists():
+        return False, None
+    try:
+        resp = _rpc(p, cmd, {**params, "cwd": os.getcwd(), "env": env_digest()}, timeout)
+    except (OSError, ValueError):
+        return False, None
+    err = resp.get("error")
+    if err:
+        if err.get("code") in (_FALLBACK, _METHOD_NOT_FOUND):
+            return False, None
+        raise DaemonError(err.get("message", "daemon error"))
+    return True, resp.get("result")
+
+
+class _Tree:
+    """
+    Semantic index, search index and repo map for one root. A watcher feeds changes
+    in as they happen, so queries only sync with it instead of re-statting the tree;
+    without a live watcher they fall back to a full incremental refresh.
+    """
+
+    def __init__(self, root: str, watch: bool) -> None:
+        from .search import SearchIndex
+        from .semantic import IncrementalIndex
+
+        self.root = root
+        self.index = IncrementalIndex(root)
+        self.search = SearchIndex(root)
+        self.lock = threading.Lock()
+        self.indexed = self.searched = self.map_saved = False
+        self.revs: dict[str, IncrementalIndex] = {}
+        self.repo_map: RepoMap | None = None  # ranks kept warm for summarize
+        self.watcher = None
+        if watch:
+            from .watcher import Watcher
+
+            self.watcher = Watcher(root, self._on_change).start()
+
+    def _on_change(self, changes) -> None:
+        with self.lock:
+            if changes.overflow:
+                self.indexed = self.searched = False  # events lost: rescan on next query
+                return
+            if self.indexed:
+                self.index.update(changes.paths, changes.dirs)
+                if self.map_saved:
+                    from .semantic import save_repo_map
+
+                    save_repo_map(self.index.to_dict(), self.root)
+            if self.searched:
+                self.search.update(changes.paths, changes.dirs)
+
+    def _fresh(self) -> bool:
+        return self.watcher is not None and self.watcher.alive and self.watcher.sync()
+
+    def query(self, fn: Callable[[IncrementalIndex], Any]) -> Any:
+        """Run `fn` on the up-to-date index (under the lock, so it must not keep it)."""
+        fresh = self._fresh()  # before taking the lock: delivery needs it
+        with self.lock:
+            if not (fresh and self.indexed):
+                self.index.refresh()
+                self.indexed = True
+            return fn(self.index)
+
+    def query_rev(self, rev: str, fn: Callable[[IncrementalIndex], Any]) -> Any:
+        """`query` for a git revision: only blobs that changed since the last call are read."""
+        from .semantic import IncrementalIndex
+
+        with self.lock:
+            index = self.revs.pop(rev, None) or IncrementalIndex(self.root, rev=rev)
+            self.revs[rev] = index
+            while len(self.revs) > _REV_INDEXES:
+                self.revs.pop(next(iter(self.revs))).close()
+            index.refresh()  # rev may be a branch that moved
+            return fn(index)
+
+    def index_dict(self) -> dict:
+        return self.query(lambda index: index.to_dict())
+
+    def summarize(self, max_tokens: int | None, max_bytes: int | None) -> str:
+        from .repomap import load_repo_map, summarize_repo
+        from .semantic import save_repo_map
+
+        def run(index: IncrementalIndex) -> str:
+            save_repo_map(index.to_dict(), self.root)
+            if self.repo_map is None:
+                self.repo_map = load_repo_map(self.root)
+            return summarize_repo(
+                self.root, max_tokens, max_bytes, index=index, repo_map=self.repo_map
+            )
+
+        text = self.query(run)
+        self.map_saved = True
+        return text
+
+    def search_hits(self, query: str, max_results: int | None) -> list:
+        fresh = self._fresh()
+        with self.lock:
+            if not (fresh and self.searched):
+                self.search.refresh()
+                self.searched = True
+            return self.search.search(query, max_results)
+
+    def status(self) -> dict[str, Any]:
+        w = self.watcher
+        return {
+            "backend": w.backend if w and w.alive else None,
+            "fresh_as_of": w.fresh_as_of if w and w.alive else None,
+        }
+
+    def close(self) -> None:
+        if self.watcher:
+            self.watcher.stop()
+        self.index.close()
+        for index in self.revs.values():
+            index.close()
+
+
+class Warm:
+    """State the daemon keeps hot between requests."""
+
+    def __init__(self, workers: int = 4, watch: bool = True) -> None:
+        from .sandbox import WorktreePool
+
+        self.cwd = os.path.realpath(os.getcwd())
+        self.env = env_digest()
+        self.pool = WorktreePool(size=workers)
+        self.watch = watch
+        self._trees: dict[str, _Tree] = {}
+        self._lock = threading.Lock()
+        self._flushed = time.monotonic()
+
+    def tree(self, root: str) -> _Tree:
+        key = os.path.realpath(root)
+        with self._lock:
+            if key not in self._trees:
+                self._trees[key] = _Tree(root, self.watch)
+            return self._trees[key]
+
+    def handle(self, cmd: str, params: dict[str, Any]) -> Any:
+        if cmd == "ping":
+            trees = {k: t.status() for k, t in self._trees.items()}
+            return {"pid": os.getpid(), "cwd": self.cwd, "trees": trees}
+        if cmd in ("index", "symbol") and params.get("rev"):
+            from .semantic import find_symbol
+
+            tree = self.tree(params["root"])
+            if cmd == "index":
+                return tree.query_rev(params["rev"], lambda ix: ix.to_dict())
+            return tree.query_rev(params["rev"], lambda ix: find_symbol(params["name"], ix))
+        if cmd == "index":
+            return self.tree(params["root"]).index_dict()
+        if cmd == "symbol":
+            from .semantic import find_symbol
+
+            return self.tree(params["root"]).query(lambda ix: find_symbol(params["name"], ix))
+        if cmd == "symbol-source" and params.get("file") is None:
+            from .semantic import symbol_source
+
+            return self.tree(params["root"]).query(lambda ix: symbol_source(params["name"], ix))
+        if cmd == "deps":
+            from .semantic import dependency_graph
+
+            return self.tree(params["root"]).query(dependency_graph)
+        if cmd == "summarize":
+            tree = self.tree(params["root"])
+            return tree.summarize(params.get("tokens", 2048), params.get("bytes"))
+        if cmd == "search" and not params.get("rev"):
+            return self.tree(params["path"]).search_hits(params["pattern"], params["max"])
+        if cmd == "apply-bundle-commit":
+            from .patch import apply_bundle
+
+            return apply_bundle(params["bundle_id"], params["branch"], pool=self.pool)
+        if cmd == "validate-pending":
+            from .merge import validate_pending
+
+            return validate_pending(params["branch"], self.pool, params["max_batch"])
+        if cmd == "run":
+            from .task import run as run_task
+
+            return run_task(
+                goal=params["goal"],
+                auto_pr=params["auto_pr"],
+                model=params["model"],
+                candidates=params["candidates"],
+                cache=params["cache"],
+                branch=params.get("branch"),  # older clients do not send it
+                pool=self.pool,
+            )
+        from .cli import execute
+
+        return execute(cmd, params)
+
+    def flush_metrics(self, force: bool = False) -> None:
+        """Write the metrics gathered while serving, at most every few seconds."""
+        from .metrics import flush
+
+        now = time.monotonic()
+        if force or now - self._flushed >= _METRICS_FLUSH_INTERVAL:
+            self._flushed = now
+            flush()
+
+    def close(self) -> None:
+        for t in self._trees.values():
+            t.close()
+        self.pool.close()
+        self.flush_metrics(force=True)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: DaemonServer
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            resp = self.server.dispatch(line)
+            self.wfile.write(json.dumps(resp, default=str).encode() + b"\n")
+            self.wfile.flush()
+
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str | Path, workers: int = 4, watch: bool = True) -> None:
+        self.path = Path(path)
+        self.warm = Warm(workers, watch)
+        super().__init__(str(self.path), _Handler)
+
+    def dispatch(self, line: bytes) -> dict[str, Any]:
+        try:
+            req = json.loads(line)
+        except ValueError:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "parse"}}
+        rid = req.get("id")
+        method = req.get("method", "")
+        params = dict(req.get("params") or {})
+        cwd = params.pop("cwd", None)
+        if cwd is not None and os.path.realpath(cwd) != self.warm.cwd:
+            # relative paths would resolve against the wrong directory
+            err = {"code": _FALLBACK, "message": "daemon serves a different directory"}
+            return {"jsonrpc": "2.0", "id": rid, "error": err}
+        env = params.pop("env", None)
+        if env is not None and env != self.warm.env:
+            # e.g. another GITHUB_TOKEN or MODEL_PROVIDER: the result would differ from
+            # running in-process
+            err = {"code": _FALLBACK, "message": "daemon runs with a different environment"}
+            return {"jsonrpc": "2.0", "id": rid, "error": err}
+        if method == "shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"jsonrpc": "2.0", "id": rid, "result": True}
+        from .cli import UnknownCommand
+
+        try:
+            result = self.warm.handle(method, params)
+        except UnknownCommand as e:
+            # only this one: the client reruns the command in-process on this code
+            err = {"code": _METHOD_NOT_FOUND, "message": str(e)}
+            return {"jsonrpc": "2.0", "id": rid, "error": err}
+        except Exception as e:
+            err = {"code": _INTERNAL, "message": f"{type(e).__name__}: {e}"}
+            return {"jsonrpc": "2.0", "id": rid, "error": err}
+        finally:
+            self.warm.flush_metrics()
+        return {"jsonrpc": "2.0", "id": rid, "result": result}
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.warm.close()
+        self.path.unlink(missing_ok=True)
+
+
+def make_server(
+    path: str | Path | None = None, workers: int = 4, watch: bool = True
+) -> DaemonServer:
+    """Bind the daemon socket, replacing a stale one. Raises if a daemon is running."""
+    p = Path(path) if path else socket_path()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    if p.exists():
+        try:
+            _rpc(p, "ping", {}, timeout=1.0)
+        except (OSError, ValueError):
+            p.unlink()
+        else:
+            raise RuntimeError(f"a daemon is already listening on {p}")
+    return DaemonServer(p, workers, watch)
+
+
+def serve(path: str | Path | None = None, workers: int = 4, watch: bool = True) -> None:
+    """Run the daemon in the foreground until interrupted or sent `shutdown`."""
+    server = make_server(path, workers, watch)
+    print(f"codexrt daemon listening on {server.path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable, Iterator
+
+_HUNK_RE = re.compile(r"^@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@")
+_PATH_RE = re.compile(r"^(?:\+\+\+ b/|--- a/)(.+?)\s*$")
+_SIDE_RE = re.compile(r"^(?:\+\+\+|---) (?:[ab]/)?(.+?)\s*$")
+_MOVE_RE = re.compile(r"^(?:rename|copy) (?:from|to) (.+?)\s*$")
+
+
+class DiffSplitter:
+    """
+    Incremental unified-diff splitter. Feed text in arbitrary chunks; every time a
+    file section is known to be complete (the next one has started) it is returned.
+    Hunk line counts are tracked so removed lines that look like '--- ' headers are
+    not mistaken for a new file. Text before the first header (model chatter) is dropped.
+    """
+
+    def __init__(self) -> None:
+        self._partial: list[str] = []  # pieces of an unfinished line
+        self._lines: list[str] = []
+        self._has_minus = False  # current section already saw its '--- ' line
+        self._has_hunk = False
+        self._git_old: str | None = None  # old path from the section's 'diff --git' line
+        self._new_file = False  # ... which announced 'new file mode'
+        self._old = 0  # lines remaining in the current hunk
+        self._new = 0
+
+    def feed(self, chunk: str) -> list[str]:
+        if "\n" not in chunk:
+            # keep pieces until the line ends, so long lines in small chunks stay linear
+            self._partial.append(chunk)
+            return []
+        self._partial.append(chunk)
+        lines = "".join(self._partial).split("\n")
+        self._partial = [lines.pop()]
+        out: list[str] = []
+        for line in lines:
+            done = self._line(line + "\n")
+            if done is not None:
+                out.append(done)
+        return out
+
+    def close(self) -> list[str]:
+        out: list[str] = []
+        partial = "".join(self._partial)
+        self._partial = []
+        if partial:
+            done = self._line(partial)
+            if done is not None:
+                out.append(done)
+        if self._lines:
+            out.append("".join(self._lines))
+            self._lines = []
+        return out
+
+    def _start(self, line: str) -> str | None:
+        prev = "".join(self._lines) if self._lines else None
+        self._lines = [line]
+        self._has_minus = line.startswith("--- ")
+        self._has_hunk = False
+        self._git_old = None
+        self._new_file = False
+        if line.startswith("diff --git "):
+            parts = line[len("diff --git ") :].split()
+            if len(parts) == 2 and parts[0].startswith("a/"):
+                self._git_old = parts[0]
+        return prev
+
+    def _line(self, line: str) -> str | None:
+        if self._old > 0 or self._new > 0:
+            tag = line[:1]
+            if tag == " " or line in ("\n", ""):
+                self._old -= 1
+                self._new -= 1
+            elif tag == "-":
+                self._old -= 1
+            elif tag == "+":
+                self._new -= 1
+            self._lines.append(line)
+            return None
+        if line.startswith("diff --git "):
+            return self._start(line)
+        if line.startswith("--- "):
+            if not self._lines or self._has_minus or self._has_hunk:
+                return self._start(line)
+            old = line[4:].split("\t")[0].strip()
+            if self._git_old and old != ("/dev/null" if self._new_file else self._git_old):
+                # a plain diff right after a git section without hunks (pure rename,
+                # mode change, binary): the '--- ' line belongs to the next file
+                return self._start(line)
+            self._has_minus = True
+            self._lines.append(line)
+            return None
+        if not self._lines:
+            return None  # preamble before the first header
+        if line.startswith("new file mode"):
+            self._new_file = True
+        m = _HUNK_RE.match(line)
+        if m:
+            self._has_hunk = True
+            self._old = int(m.group(1)) if m.group(1) is not None else 1
+            self._new = int(m.group(2)) if m.group(2) is not None else 1
+        self._lines.append(line)
+        return None
+
+
+def iter_sections(chunks: Iterable[str]) -> Iterator[str]:
+    """Yield per-file sections from an iterable of text chunks as they complete."""
+    splitter = DiffSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.close()
+
+
+def split_diff(diff: str) -> list[str]:
+    """Split a multi-file unified diff into per-file sections."""
+    return list(iter_sections([diff]))
+
+
+def section_path(section: str) -> str | None:
+    """
+    Best-effort target path of a section: '+++ b/x', falling back to '--- a/x' (a
+    deletion), then 'rename/copy to x' and the 'diff --git' line (renames, mode
+    changes and binary files without ---/+++ headers).
+    """
+    path = moved = git = None
+    for line in section.splitlines():
+        if line.startswith("@@") or line.startswith(("GIT binary patch", "Binary files ")):
+            break
+        m = _PATH_RE.match(line)
+        if m:
+            path = m.group(1)
+        elif line.startswith(("rename to ", "copy to ")):
+            moved = line.split(" ", 2)[2].strip()
+        elif line.startswith("diff --git "):
+            parts = line[len("diff --git ") :].split()
+            if len(parts) == 2:
+                git = parts[1][2:] if parts[1].startswith("b/") else parts[1]
+    return path or moved or git
+
+
+def section_paths(section: str) -> set[str]:
+    """Every path a section touches: both sides, plus rename/copy sources and targets."""
+    paths: set[str] = set()
+    for line in section.splitlines():
+        if line.startswith("@@"):
+            break
+        m = _SIDE_RE.match(line) or _MOVE_RE.match(line)
+        if m and m.group(1) != "/dev/null":
+            paths.add(m.group(1))
+    return paths
+
+
+def diff_paths(diff: str) -> set[str]:
+    """Every path a multi-file diff touches (see section_paths)."""
+    paths: set[str] = set()
+    for section in split_diff(diff):
+        paths |= section_paths(section)
+    return paths
+
+
+def iter_items(chunks: Iterable[str], description: str = "") -> Iterator[dict]:
+    """
+    One bundle item ({"file", "diff", "description"}) per file section of a diff
+    streamed in chunks, yielded as each section completes. Every item carries only
+    its own section, so `apply_bundle` applies each file once.
+    """
+    for section in iter_sections(chunks):
+        yield {"file": section_path(section) or "", "diff": section, "description": description}
+
+
+def diff_items(diff: str, description: str = "") -> list[dict]:
+    """Bundle items for a multi-file diff (see iter_items)."""
+    return list(iter_items([diff], description))
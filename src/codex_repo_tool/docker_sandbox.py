@@ -1,11 +1,27 @@
 from __future__ import annotations
 
-import subprocess
+import threading
+import time
 
+from . import proc
 
-def docker_available() -> bool:
-    try:
-        p = subprocess.run(["docker", "version"], capture_output=True, text=True, timeout=3)
-        return p.returncode == 0
-    except Exception:
-        return False
+_checked: list[float | bool] = [float("-inf"), False]  # (when, result) of the last probe
+_lock = threading.Lock()
+
+
+def docker_available(max_age: float = 60.0) -> bool:
+    """
+    Whether `docker version` succeeds. The answer is reused for `max_age` seconds:
+    lint and tests both ask, and each probe can take seconds when the daemon is down.
+    """
+    with _lock:
+        when, ok = _checked
+        if time.monotonic() - when < max_age:
+            return bool(ok)
+        try:
+            p = proc.run(["docker", "version"], capture_output=True, text=True, timeout=3)
+            ok = p.returncode == 0
+        except Exception:
+            ok = False
+        _checked[:] = [time.monotonic(), ok]
+        return ok
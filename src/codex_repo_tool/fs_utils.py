@@ -1,28 +1,54 @@
 from __future__ import annotations
 
+from fnmatch import fnmatch
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 
+from .metrics import scanned
 
-def list_files(root: str | Path) -> List[Dict[str, str]]:
+
+def list_files(
+    root: str | Path, pattern: Optional[str] = None, rev: Optional[str] = None
+) -> List[Dict[str, str]]:
     """
-    Return a list of {'path': <path>} for files under root.
+    Return a list of {'path': <path>} for files under root, optionally filtered by a
+    glob `pattern` matched against the file name or the full path. With `rev`, the
+    files of that git revision are listed (read from the object database).
     """
     base = Path(root)
     out: List[Dict[str, str]] = []
-    for p in base.rglob("*"):
-        if p.is_file():
-            out.append({"path": str(p)})
+    if rev:
+        from .gitobj import tree_blobs
+
+        paths = (base / rel for rel in tree_blobs(rev, base))
+    else:
+        paths = (p for p in base.rglob("*") if p.is_file())
+    for p in paths:
+        if pattern and not (fnmatch(p.name, pattern) or fnmatch(str(p), pattern)):
+            continue
+        out.append({"path": str(p)})
     return out
 
 
-def read_file(path: str | Path, line_range: Optional[Tuple[int, int]] = None) -> str:
+def read_file(
+    path: str | Path, line_range: Optional[Tuple[int, int]] = None, rev: Optional[str] = None
+) -> str:
     """
     Read full file text. If line_range=(start,end) is provided (1-based, inclusive),
-    return only those lines joined by '\n' with no trailing newline.
+    return only those lines joined by '\n' with no trailing newline. With `rev`, the
+    file's contents at that git revision are read instead of the working copy.
     """
     p = Path(path)
-    text = p.read_text(encoding="utf-8", errors="ignore")
+    if rev:
+        from .gitobj import read_at
+
+        raw = read_at(p, rev)
+        scanned("git", 1, len(raw))
+        # same newline handling as read_text below
+        text = raw.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+    else:
+        text = p.read_text(encoding="utf-8", errors="ignore")
+        scanned("fs", 1, len(text))  # characters: close enough to bytes for source files
     if not line_range:
         return text
     start, end = line_range
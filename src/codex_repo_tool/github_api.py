@@ -1,9 +1,18 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Any
 
-import requests
+from .config import SETTINGS
+from .http_client import request
 
 API = "https://api.github.com"
 
@@ -28,33 +37,359 @@ def _headers(token: str) -> dict[str, str]:
     }
 
 
-def open_pull_request(branch: str, title: str, body: str) -> dict[str, Any]:
+def open_pull_request(
+    branch: str, title: str, body: str, base: str | None = None, existing_ok: bool = False
+) -> dict[str, Any]:
+    """
+    Open a PR from `branch` into `base` (default: DEFAULT_BRANCH, else "main"). With
+    `existing_ok`, an open PR from `branch` (GitHub answers 422) is returned instead.
+    """
     token, repo, default_branch = _get_env()
     url = f"{API}/repos/{repo}/pulls"
-    payload = {"title": title, "head": branch, "base": default_branch, "body": body}
-    r = requests.post(url, headers=_headers(token), json=payload, timeout=30)
+    payload = {"title": title, "head": branch, "base": base or default_branch, "body": body}
+    r = request("POST", url, endpoint="github", headers=_headers(token), json=payload)
+    if existing_ok and r.status_code == 422:
+        found = find_pull_request(branch)
+        if found is not None:
+            return found
     r.raise_for_status()
     return r.json()
 
 
+def find_pull_request(branch: str) -> dict[str, Any] | None:
+    """The open PR from `branch` of GITHUB_REPO, or None."""
+    token, repo, _ = _get_env()
+    url = f"{API}/repos/{repo}/pulls"
+    params = {"head": f"{repo.split('/')[0]}:{branch}", "state": "open"}
+    r = request("GET", url, endpoint="github", headers=_headers(token), params=params)
+    r.raise_for_status()
+    pulls = r.json()
+    return pulls[0] if pulls else None
+
+
 def comment_pr(pr_id: int, body: str) -> dict[str, Any]:
     token, repo, _ = _get_env()
     url = f"{API}/repos/{repo}/issues/{pr_id}/comments"
-    r = requests.post(url, headers=_headers(token), json={"body": body}, timeout=30)
+    r = request("POST", url, endpoint="github", headers=_headers(token), json={"body": body})
     r.raise_for_status()
     return r.json()
 
 
-def list_issues(labels: list[str] | None = None, state: str = "open") -> list[dict[str, Any]]:
+class RateLimiter:
+    """
+    Paces requests using the X-RateLimit-Remaining / X-RateLimit-Reset headers of the
+    last response. Once fewer than `low_water` requests remain, the rest of the window
+    is spread evenly over the time left; at zero it waits for the reset.
+    """
+
+    def __init__(
+        self,
+        low_water: int = 50,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.low_water = low_water
+        self.remaining: int | None = None
+        self.reset: float | None = None
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def update(self, headers: Any) -> None:
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        with self._lock:
+            if remaining is not None:
+                self.remaining = int(remaining)
+            if reset is not None:
+                self.reset = float(reset)
+
+    def delay(self) -> float:
+        with self._lock:
+            if self.remaining is None or self.reset is None or self.remaining >= self.low_water:
+                return 0.0
+            left = max(0.0, self.reset - self._clock())
+            if self.remaining <= 0:
+                return left
+            return left / self.remaining
+
+    def wait(self) -> None:
+        d = self.delay()
+        if d > 0:
+            self._sleep(d)
+
+
+RATE_LIMIT = RateLimiter()
+
+
+def _cache_dir() -> Path:
+    return Path(SETTINGS.tmp_dir) / "cache" / "github"
+
+
+def _cache_path(url: str, params: dict[str, str] | None) -> Path:
+    key = url + "?" + json.dumps(params or {}, sort_keys=True)
+    return _cache_dir() / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+
+def _conditional_get(
+    url: str, token: str, params: dict[str, str] | None = None
+) -> tuple[Any, str | None]:
+    """
+    GET with If-None-Match against the on-disk ETag cache. A 304 (which GitHub does not
+    count against the rate limit) is answered from the cache. Returns (body, next_url).
+    """
+    path = _cache_path(url, params)
+    cached: dict[str, Any] | None = None
+    try:
+        cached = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        cached = None
+    headers = _headers(token)
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+
+    RATE_LIMIT.wait()
+    r = request("GET", url, endpoint="github", headers=headers, params=params)
+    RATE_LIMIT.update(r.headers)
+    if r.status_code == 304 and cached:
+        return cached["body"], cached.get("next")
+    r.raise_for_status()
+    body = r.json()
+    next_url = (r.links or {}).get("next", {}).get("url")
+    etag = r.headers.get("ETag")
+    if etag:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({"etag": etag, "body": body, "next": next_url}), encoding="utf-8")
+        os.replace(tmp, path)
+    return body, next_url
+
+
+def iter_issues(
+    labels: list[str] | None = None,
+    state: str = "open",
+    since: str | None = None,
+    per_page: int = 100,
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield issues page by page, following Link rel="next". Each page is a conditional
+    request, so unchanged pages cost nothing against the rate limit. `since` (ISO 8601)
+    limits results to issues updated at or after that time.
+    """
     token, repo, _ = _get_env()
-    url = f"{API}/repos/{repo}/issues"
-    params = {"state": state}
+    params: dict[str, str] | None = {"state": state, "per_page": str(per_page)}
     if labels:
         params["labels"] = ",".join(labels)
-    r = requests.get(url, headers=_headers(token), params=params, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    if since:
+        params["since"] = since
+    url: str | None = f"{API}/repos/{repo}/issues"
+    while url:
+        page, url = _conditional_get(url, token, params)
+        # the next link already carries the query string
+        params = None
+        yield from page
+
+
+def list_issues(labels: list[str] | None = None, state: str = "open") -> list[dict[str, Any]]:
+    return list(iter_issues(labels, state))
+
+
+def _sync_path(labels: list[str] | None, state: str) -> Path:
+    # one store (and watermark) per repo and filter: a sync with other labels or state
+    # must not skip what an earlier, narrower sync never fetched
+    _, repo, _ = _get_env()
+    key = json.dumps([repo, sorted(labels or []), state])
+    return _cache_dir() / f"issues-sync-{hashlib.sha256(key.encode()).hexdigest()[:16]}.json"
+
+
+def load_synced_issues(
+    labels: list[str] | None = None, state: str = "all"
+) -> dict[str, dict[str, Any]]:
+    """Issues stored by `sync_issues` with the same filter, keyed by number (as a string)."""
+    try:
+        path = _sync_path(labels, state)
+        return json.loads(path.read_text(encoding="utf-8")).get("issues", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def sync_issues(labels: list[str] | None = None, state: str = "all") -> list[dict[str, Any]]:
+    """
+    Incrementally sync issues into a local store: only issues updated since the previous
+    sync of this repo with the same labels and state are fetched. Returns the issues
+    that changed.
+    """
+    path = _sync_path(labels, state)
+    try:
+        saved = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        saved = {}
+    issues: dict[str, dict[str, Any]] = saved.get("issues", {})
+    since = saved.get("since")
+    changed: list[dict[str, Any]] = []
+    for issue in iter_issues(labels, state, since=since):
+        key = str(issue["number"])
+        # `since` is inclusive: skip issues we already hold at this exact version
+        if key in issues and issues[key].get("updated_at") == issue.get("updated_at"):
+            continue
+        issues[key] = issue
+        changed.append(issue)
+        updated = issue.get("updated_at")
+        if updated and (since is None or updated > since):
+            since = updated
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"since": since, "issues": issues}), encoding="utf-8")
+    return changed
 
 
 def link_to_issue(issue_id: int, pr_id: int) -> dict[str, Any]:
     return comment_pr(pr_id, f"Linking to issue #{issue_id}.")
+
+
+@dataclass
+class PROperation:
+    """
+    Everything to do for one task's PR: open it, label it, comment, link issues. Issues
+    are referenced without closing them unless `close_issues` is set.
+    """
+
+    branch: str
+    title: str
+    body: str = ""
+    labels: list[str] = field(default_factory=list)
+    comments: list[str] = field(default_factory=list)
+    issues: list[int] = field(default_factory=list)
+    base: str | None = None
+    close_issues: bool = False
+
+
+def _graphql(token: str, query: str, variables: dict[str, Any]) -> dict[str, Any]:
+    RATE_LIMIT.wait()
+    r = request(
+        "POST",
+        f"{API}/graphql",
+        endpoint="github",
+        headers=_headers(token),
+        json={"query": query, "variables": variables},
+        # a query can be repeated safely; a mutation (create PR, comment) cannot
+        idempotent=not query.lstrip().startswith("mutation"),
+    )
+    RATE_LIMIT.update(r.headers)
+    r.raise_for_status()
+    data = r.json()
+    if data.get("errors"):
+        raise RuntimeError("; ".join(e.get("message", str(e)) for e in data["errors"]))
+    return data.get("data") or {}
+
+
+def _repo_meta(token: str, repo: str, labels: list[str]) -> dict[str, Any]:
+    """Repository node id, default branch and label ids for `labels`, in one query."""
+    owner, name = repo.split("/", 1)
+    decls = "".join(f", $l{i}: String!" for i in range(len(labels)))
+    fields = " ".join(f"l{i}: label(name: $l{i}) {{ id }}" for i in range(len(labels)))
+    query = (
+        f"query($owner: String!, $name: String!{decls}) {{"
+        f" repository(owner: $owner, name: $name) {{ id defaultBranchRef {{ name }} {fields} }} }}"
+    )
+    variables: dict[str, Any] = {"owner": owner, "name": name}
+    variables.update({f"l{i}": label for i, label in enumerate(labels)})
+    node = _graphql(token, query, variables)["repository"]
+    return {
+        "id": node["id"],
+        "default_branch": (node.get("defaultBranchRef") or {}).get("name"),
+        "labels": {
+            label: node[f"l{i}"]["id"] for i, label in enumerate(labels) if node.get(f"l{i}")
+        },
+    }
+
+
+_REPO_META: dict[str, dict[str, Any]] = {}
+
+
+def repo_metadata() -> dict[str, Any]:
+    """
+    Node id and default branch of GITHUB_REPO, fetched once per process. Fetching it
+    early (a task does so while its tests run) also opens the pooled connection that
+    the PR request will reuse; pass its "default_branch" to `open_pull_request` as
+    `base` to target the real default branch.
+    """
+    token, repo, _ = _get_env()
+    meta = _REPO_META.get(repo)
+    if meta is None:
+        meta = _REPO_META[repo] = _repo_meta(token, repo, [])
+    return meta
+
+
+def _pr_body(op: PROperation) -> str:
+    # References in the body link issues natively, so linking costs no extra round-trip;
+    # only a closing keyword makes merging the PR close them.
+    keyword = "Closes" if op.close_issues else "Refs"
+    links = "\n".join(f"{keyword} #{n}" for n in op.issues)
+    return f"{op.body}\n\n{links}".strip() if links else op.body
+
+
+def _run_pr_operation(token: str, meta: dict[str, Any], op: PROperation) -> dict[str, Any]:
+    created = _graphql(
+        token,
+        "mutation($input: CreatePullRequestInput!) {"
+        " createPullRequest(input: $input) { pullRequest { id number url } } }",
+        {
+            "input": {
+                "repositoryId": meta["id"],
+                "baseRefName": op.base or meta["default_branch"] or _get_env()[2],
+                "headRefName": op.branch,
+                "title": op.title,
+                "body": _pr_body(op),
+            }
+        },
+    )
+    pr = created["createPullRequest"]["pullRequest"]
+    label_ids = [meta["labels"][label] for label in op.labels if label in meta["labels"]]
+    if label_ids or op.comments:
+        decls = ["$pr: ID!"]
+        fields = []
+        variables: dict[str, Any] = {"pr": pr["id"]}
+        if label_ids:
+            decls.append("$labels: [ID!]!")
+            fields.append(
+                "labels: addLabelsToLabelable(input: {labelableId: $pr, labelIds: $labels})"
+                " { clientMutationId }"
+            )
+            variables["labels"] = label_ids
+        for i, comment in enumerate(op.comments):
+            decls.append(f"$c{i}: String!")
+            fields.append(
+                f"c{i}: addComment(input: {{subjectId: $pr, body: $c{i}}}) {{ clientMutationId }}"
+            )
+            variables[f"c{i}"] = comment
+        _graphql(token, f"mutation({', '.join(decls)}) {{ {' '.join(fields)} }}", variables)
+    return {
+        "ok": True,
+        "branch": op.branch,
+        "number": pr["number"],
+        "url": pr["url"],
+        "missing_labels": [label for label in op.labels if label not in meta["labels"]],
+    }
+
+
+def batch_pull_requests(ops: list[PROperation], max_workers: int = 4) -> list[dict[str, Any]]:
+    """
+    Open many PRs through GraphQL: one shared metadata query for the batch, then per PR
+    one createPullRequest mutation and at most one combined label+comment mutation.
+    Operations run concurrently with at most `max_workers` in flight. Results are in
+    input order; a failing operation yields {"ok": False, "error": ...}.
+    """
+    if not ops:
+        return []
+    token, repo, _ = _get_env()
+    labels = sorted({label for op in ops for label in op.labels})
+    meta = _repo_meta(token, repo, labels)
+
+    def _one(op: PROperation) -> dict[str, Any]:
+        try:
+            return _run_pr_operation(token, meta, op)
+        except Exception as e:
+            return {"ok": False, "branch": op.branch, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        return list(pool.map(_one, ops))
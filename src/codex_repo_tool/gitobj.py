@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import subprocess
+import threading
+import time
+import weakref
+from collections.abc import Sequence
+from pathlib import Path
+
+from . import proc
+from .metrics import METRICS
+
+# Writes larger than this go through a feeder thread so that a full stdout pipe
+# cannot block us while git is still waiting for input.
+_INLINE_WRITE = 4096
+
+
+def blob_sha(data: bytes) -> str:
+    """The SHA-1 git gives `data` as a blob (`git hash-object`), without running git."""
+    h = hashlib.sha1(b"blob %d\0" % len(data))
+    h.update(data)
+    return h.hexdigest()
+
+
+def worktree_blobs(root: str | Path = ".") -> dict[str, str | None] | None:
+    """
+    Files under `root` (paths relative to it) from `git ls-files -s`: the blob SHA of
+    each tracked file whose working copy matches the index, None for files that must
+    be read from disk (modified, untracked, unmerged). Deleted files are listed as
+    modified. Submodules and symlinks are left out. None outside a git work tree.
+    """
+    staged = proc.run(["git", "ls-files", "-s", "-z"], cwd=root, capture_output=True)
+    if staged.returncode != 0 or not isinstance(staged.stdout, bytes):
+        return None
+    out: dict[str, str | None] = {}
+    for rec in staged.stdout.split(b"\0"):
+        meta, _, path = rec.partition(b"\t")
+        fields = meta.split()
+        if len(fields) != 3 or fields[0] in (b"160000", b"120000"):
+            continue
+        out[os.fsdecode(path)] = fields[1].decode() if fields[2] == b"0" else None
+    dirty = proc.run(
+        ["git", "ls-files", "-m", "-o", "--exclude-standard", "-z"], cwd=root, capture_output=True
+    )
+    if dirty.returncode != 0 or not isinstance(dirty.stdout, bytes):
+        return None
+    for path in dirty.stdout.split(b"\0"):
+        if path:
+            out[os.fsdecode(path)] = None
+    return out
+
+
+def tree_blobs(rev: str, root: str | Path = ".") -> dict[str, str]:
+    """
+    Files under `root` at revision `rev` (paths relative to `root`) -> blob SHA, from
+    `git ls-tree -r`; nothing is checked out. Submodules and symlinks are left out.
+    Raises ValueError if `rev` does not name a tree.
+    """
+    p = proc.run(["git", "ls-tree", "-r", "-z", rev], cwd=root, capture_output=True)
+    if p.returncode != 0 or not isinstance(p.stdout, bytes):
+        raise ValueError(f"unknown revision or not a git repository: {rev!r}")
+    out: dict[str, str] = {}
+    for rec in p.stdout.split(b"\0"):
+        meta, _, path = rec.partition(b"\t")
+        fields = meta.split()
+        if len(fields) == 3 and fields[1] == b"blob" and fields[0] != b"120000":
+            out[os.fsdecode(path)] = fields[2].decode()
+    return out
+
+
+def read_at(path: str | Path, rev: str) -> bytes:
+    """Contents of `path` (as it would be on disk) at `rev`. FileNotFoundError if absent."""
+    p = Path(path)
+    with CatFile(p.parent) as cat:
+        obj = cat.read(f"{rev}:./{p.name}")
+    if obj is None or obj[0] != "blob":
+        raise FileNotFoundError(f"{path} does not exist at {rev}")
+    return obj[1]
+
+
+def _stop(p: subprocess.Popen, started: float, stats: list[int]) -> None:
+    if p.poll() is None:
+        try:
+            p.stdin.close()  # type: ignore[union-attr]
+            p.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            p.kill()
+            p.wait()
+    p.stdout.close()  # type: ignore[union-attr]
+    code = p.returncode if p.returncode >= 0 else "error"
+    METRICS.record("git cat-file", time.perf_counter() - started, 0.0, code, stats[0], 0)
+
+
+class CatFile:
+    """
+    A long-lived `git cat-file --batch` process: any number of object reads (SHAs or
+    `rev:path` specs) for the cost of one git start-up. Started on first use and
+    restarted if it dies; thread-safe. Counted in metrics as one "git cat-file" call
+    per process, plus the `git.objects_read` counter.
+    """
+
+    def __init__(self, cwd: str | Path | None = None) -> None:
+        self.cwd = cwd
+        self._p: subprocess.Popen | None = None
+        self._stats = [0]  # bytes read; shared with the finalizer
+        self._lock = threading.Lock()
+        self._finalizer: weakref.finalize | None = None
+
+    def _proc(self) -> subprocess.Popen:
+        if self._p is None or self._p.poll() is not None:
+            self.close()
+            self._p = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                cwd=self.cwd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+            self._stats = [0]
+            self._finalizer = weakref.finalize(
+                self, _stop, self._p, time.perf_counter(), self._stats
+            )
+        return self._p
+
+    @staticmethod
+    def _feed(p: subprocess.Popen, payload: bytes) -> None:
+        try:
+            p.stdin.write(payload)  # type: ignore[union-attr]
+            p.stdin.flush()  # type: ignore[union-attr]
+        except (BrokenPipeError, ValueError):
+            pass  # git exited; the reader notices
+
+    def read_many(self, specs: Sequence[str]) -> list[tuple[str, bytes] | None]:
+        """(type, body) per spec, in order; None for missing or ambiguous objects."""
+        if not specs:
+            return []
+        payload = "".join(s + "\n" for s in specs).encode()
+        with self._lock:
+            p = self._proc()
+            feeder = None
+            if len(payload) <= _INLINE_WRITE:
+                self._feed(p, payload)
+            else:
+                feeder = threading.Thread(target=self._feed, args=(p, payload), daemon=True)
+                feeder.start()
+            out: list[tuple[str, bytes] | None] = []
+            try:
+                for _ in specs:
+                    header = p.stdout.readline()  # type: ignore[union-attr]
+                    if not header:
+                        raise OSError("git cat-file exited (not a git repository?)")
+                    fields = header.split()
+                    if len(fields) != 3:
+                        out.append(None)  # "<spec> missing" / "ambiguous": no body
+                        continue
+                    size = int(fields[2])
+                    body = p.stdout.read(size)  # type: ignore[union-attr]
+                    p.stdout.read(1)  # type: ignore[union-attr]
+                    self._stats[0] += size
+                    out.append((fields[1].decode(), body))
+            except (OSError, ValueError):
+                self.close()
+                raise
+            finally:
+                if feeder is not None:
+                    feeder.join()
+        METRICS.count("git.objects_read", len(specs))
+        return out
+
+    def read(self, spec: str) -> tuple[str, bytes] | None:
+        return self.read_many([spec])[0]
+
+    def close(self) -> None:
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+        self._p = None
+
+    def __enter__(self) -> CatFile:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import email.utils
+import os
+import random
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import SETTINGS
+
+# Statuses worth retrying: rate limiting and transient upstream failures.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Methods that are safe to send twice; anything else (POST, PATCH) could create a
+# second PR or comment, so it is only retried when the server cannot have acted on it.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# Per-endpoint read timeouts (seconds). Override with CODEXRT_TIMEOUT_<NAME>,
+# e.g. CODEXRT_TIMEOUT_GITHUB=10 or CODEXRT_TIMEOUT_MODEL_HTTP=120.
+DEFAULT_TIMEOUTS: dict[str, float] = {
+    "default": 30.0,
+    "github": 30.0,
+    "openai": 60.0,
+    "model-http": 30.0,
+}
+CONNECT_TIMEOUT = 10.0
+
+_sessions: dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_retries: int = SETTINGS.http_max_retries
+    backoff_base: float = SETTINGS.http_backoff_base
+    backoff_max: float = SETTINGS.http_backoff_max
+    statuses: frozenset[int] = RETRY_STATUSES
+
+
+def endpoint_timeout(endpoint: str) -> tuple[float, float]:
+    """Return a (connect, read) timeout tuple for a logical endpoint name."""
+    env = "CODEXRT_TIMEOUT_" + endpoint.upper().replace("-", "_")
+    read = os.environ.get(env)
+    if read:
+        return CONNECT_TIMEOUT, float(read)
+    return CONNECT_TIMEOUT, DEFAULT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUTS["default"])
+
+
+def get_session(endpoint: str = "default") -> requests.Session:
+    """
+    Return the shared keep-alive session for `endpoint`, creating it on first use.
+    Each endpoint gets its own connection pool sized from SETTINGS.
+    """
+    with _lock:
+        s = _sessions.get(endpoint)
+        if s is None:
+            s = requests.Session()
+            # Retries are handled in `request` so Retry-After and jitter apply uniformly.
+            adapter = HTTPAdapter(
+                pool_connections=SETTINGS.http_pool_connections,
+                pool_maxsize=SETTINGS.http_pool_maxsize,
+                max_retries=0,
+            )
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _sessions[endpoint] = s
+        return s
+
+
+def close_sessions() -> None:
+    """Close all pooled sessions (drops idle keep-alive connections)."""
+    with _lock:
+        for s in _sessions.values():
+            s.close()
+        _sessions.clear()
+
+
+def backoff_delay(
+    attempt: int, policy: RetryPolicy, rand: Callable[[], float] = random.random
+) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(max, base * 2**attempt))."""
+    cap = min(policy.backoff_max, policy.backoff_base * (2**attempt))
+    return cap * rand()
+
+
+def retry_after(resp: requests.Response) -> float | None:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def request(
+    method: str,
+    url: str,
+    *,
+    endpoint: str = "default",
+    timeout: float | tuple[float, float] | None = None,
+    retry: RetryPolicy | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+    idempotent: bool | None = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """
+    Send a request through the pooled session for `endpoint`.
+
+    Retries connection errors and RETRY_STATUSES with jittered exponential backoff,
+    waiting at least as long as the server's Retry-After. Requests that are not
+    idempotent (by IDEMPOTENT_METHODS unless `idempotent` says otherwise) are only
+    retried after a connect timeout or a 429, when the server did not act on them.
+    After the last attempt the final response is returned as-is (callers still call
+    raise_for_status()).
+    """
+    policy = retry or RetryPolicy()
+    session = get_session(endpoint)
+    timeout = timeout if timeout is not None else endpoint_timeout(endpoint)
+    safe = method.upper() in IDEMPOTENT_METHODS if idempotent is None else idempotent
+    attempt = 0
+    while True:
+        try:
+            resp = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= policy.max_retries or not (
+                safe or isinstance(e, requests.ConnectTimeout)
+            ):
+                raise
+            sleep(backoff_delay(attempt, policy))
+            attempt += 1
+            continue
+        retryable = resp.status_code in policy.statuses and (safe or resp.status_code == 429)
+        if not retryable or attempt >= policy.max_retries:
+            return resp
+        delay = backoff_delay(attempt, policy)
+        server_delay = retry_after(resp)
+        if server_delay is not None:
+            delay = max(delay, min(server_delay, policy.backoff_max))
+        resp.close()
+        sleep(delay)
+        attempt += 1
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import sys
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from .metrics import METRICS
+from .prescreen import Rejected, parse_patch
+from .sandbox import WorktreePool
+from .store import PatchStore, default_store
+from .tracing import span
+
+# Line range standing for "the whole file" (new, deleted, renamed, binary files)
+WHOLE = (0, sys.maxsize)
+
+# items -> validation result with an "applied" bool (see patch.validate_items)
+Validator = Callable[[list[dict]], dict[str, Any]]
+
+
+def touched_ranges(diff: str) -> dict[str, list[tuple[int, int]]] | None:
+    """
+    Inclusive old-side line ranges each file of `diff` touches, context lines
+    included; None if the diff does not parse. Files that are created, deleted,
+    renamed, binary or changed without hunks count as touched everywhere.
+    """
+    try:
+        files = parse_patch(diff)
+    except Rejected:
+        return None
+    out: dict[str, list[tuple[int, int]]] = {}
+    for fp in files:
+        if fp.binary or not fp.hunks or fp.old_path != fp.new_path:
+            for path in (fp.old_path, fp.new_path):
+                if path:
+                    out[path] = [WHOLE]
+            continue
+        ranges = out.setdefault(fp.path, [])
+        if WHOLE in ranges:
+            continue
+        for h in fp.hunks:
+            # a pure insertion (-n,0) sits between lines n and n + 1
+            end = h.old_start + h.old_len - 1 if h.old_len else h.old_start + 1
+            ranges.append((h.old_start, end))
+    return out
+
+
+def _overlap(a: Sequence[tuple[int, int]], b: Sequence[tuple[int, int]]) -> bool:
+    return any(s1 <= e2 and s2 <= e1 for s1, e1 in a for s2, e2 in b)
+
+
+class ConflictIndex:
+    """
+    Pending patches by file and line range. Two patches conflict when they touch an
+    overlapping range of the same file; a patch whose diff does not parse conflicts
+    with everything, so it is always validated on its own.
+    """
+
+    def __init__(self) -> None:
+        self._by_file: dict[str, dict[str, list[tuple[int, int]]]] = {}
+        self._files: dict[str, list[str]] = {}
+        self._solo: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def __contains__(self, pid: object) -> bool:
+        return pid in self._files
+
+    def add(self, pid: str, diff: str) -> None:
+        self.remove(pid)
+        ranges = touched_ranges(diff)
+        if ranges is None:
+            self._solo.add(pid)
+            ranges = {}
+        for path, spans in ranges.items():
+            self._by_file.setdefault(path, {})[pid] = spans
+        self._files[pid] = list(ranges)
+
+    def remove(self, pid: str) -> None:
+        for path in self._files.pop(pid, ()):
+            entries = self._by_file[path]
+            del entries[pid]
+            if not entries:
+                del self._by_file[path]
+        self._solo.discard(pid)
+
+    def conflicts(self, pid: str) -> set[str]:
+        """IDs of the other indexed patches `pid` cannot be batched with."""
+        if pid in self._solo:
+            return set(self._files) - {pid}
+        out = set(self._solo) - {pid}
+        for path in self._files[pid]:
+            entries = self._by_file[path]
+            mine = entries[pid]
+            out.update(o for o, spans in entries.items() if o != pid and _overlap(mine, spans))
+        return out
+
+    def batches(self, pids: Sequence[str], max_batch: int = 16) -> list[list[str]]:
+        """
+        Group `pids` (in order) into batches of mutually non-conflicting patches, at
+        most `max_batch` each: every patch joins the first batch it fits in.
+        """
+        out: list[list[str]] = []
+        for pid in pids:
+            clash = self.conflicts(pid)
+            for members in out:
+                if len(members) < max_batch and clash.isdisjoint(members):
+                    members.append(pid)
+                    break
+            else:
+                out.append([pid])
+        return out
+
+
+def _items(entry: dict[str, Any]) -> list[dict]:
+    if entry.get("kind") == "bundle":
+        return list(entry["items"])
+    return [{k: entry[k] for k in ("file", "diff", "description") if k in entry}]
+
+
+def _diff(entry: dict[str, Any]) -> str:
+    # items of one model diff share its text; count it once
+    return "".join(dict.fromkeys(item.get("diff", "") for item in _items(entry)))
+
+
+def validate_entries(
+    entries: Sequence[dict[str, Any]],
+    branch: str = "HEAD",
+    pool: WorktreePool | None = None,
+    max_batch: int = 16,
+    validate: Validator | None = None,
+) -> dict[str, Any]:
+    """
+    Validate many store entries (patches or bundles) with as few sandbox runs as
+    possible: entries that touch disjoint lines are applied together and checked in
+    one run. A failing batch is bisected until each failure is pinned on one entry;
+    if every half passes alone, the later half is failed as conflicting with the
+    earlier one ("stage": "combined"). Returns per-entry results and run counts.
+    """
+    if validate is None:
+        from .patch import validate_items
+
+        def validate(items: list[dict]) -> dict[str, Any]:
+            return validate_items(items, branch, pool)
+
+    by_id = {e["id"]: e for e in entries}
+    index = ConflictIndex()
+    for e in entries:
+        index.add(e["id"], _diff(e))
+    runs = 0
+
+    def check(group: list[str]) -> dict[str, dict[str, Any]]:
+        nonlocal runs
+        runs += 1
+        with span("merge.batch", size=len(group)):
+            res = validate([item for pid in group for item in _items(by_id[pid])])
+        if res.get("applied") or len(group) == 1:
+            return {pid: res for pid in group}
+        half = len(group) // 2
+        out = {**check(group[:half]), **check(group[half:])}
+        if all(r.get("applied") for r in out.values()):
+            for pid in group[half:]:
+                out[pid] = {**res, "applied": False, "stage": "combined", "with": group[:half]}
+        return out
+
+    batches = index.batches([e["id"] for e in entries], max_batch)
+    results: dict[str, dict[str, Any]] = {}
+    for group in batches:
+        results.update(check(group))
+    METRICS.count("merge.entries", len(entries))
+    METRICS.count("merge.sandbox_runs", runs)
+    return {
+        "entries": len(entries),
+        "batches": len(batches),
+        "sandbox_runs": runs,
+        "applied": [pid for pid in by_id if results[pid].get("applied")],
+        "failed": [pid for pid in by_id if not results[pid].get("applied")],
+        "results": results,
+    }
+
+
+def validate_pending(
+    branch: str = "HEAD",
+    pool: WorktreePool | None = None,
+    max_batch: int = 16,
+    store: PatchStore | None = None,
+    validate: Validator | None = None,
+) -> dict[str, Any]:
+    """
+    Claim every pending patch and bundle in the store, validate them in batches (see
+    validate_entries) and record each outcome as its status.
+    """
+    store = store or default_store()
+    entries = store.claim_pending()
+    try:
+        with span("validate_pending", entries=len(entries)) as s:
+            report = validate_entries(entries, branch, pool, max_batch, validate)
+    except BaseException:
+        for e in entries:
+            store.set_status(e["id"], "pending")  # let the next run pick them up
+        raise
+    for pid, res in report["results"].items():
+        store.set_status(pid, "applied" if res.get("applied") else "failed", res)
+    report["timings"] = s.timings()
+    return report
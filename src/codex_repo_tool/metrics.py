@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from .config import SETTINGS
+
+try:  # POSIX only; without it concurrent flushes may lose an update
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+
+def _empty_command() -> dict[str, Any]:
+    return {
+        "count": 0,
+        "wall_s": 0.0,
+        "cpu_s": 0.0,
+        "max_wall_s": 0.0,
+        "stdout_bytes": 0,
+        "stderr_bytes": 0,
+        "exit_codes": {},
+    }
+
+
+class Metrics:
+    """
+    Process-wide counters and per-command subprocess statistics (see proc.run).
+    Thread-safe. `flush` folds them into the metrics file and starts over, so one
+    file aggregates every CLI invocation and the daemon.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.commands: dict[str, dict[str, Any]] = {}
+        self.counters: dict[str, int] = {}
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def scanned(self, prefix: str, files: int, nbytes: int) -> None:
+        """Count files read and bytes scanned under `<prefix>.files_read`/`.bytes_scanned`."""
+        with self._lock:
+            c = self.counters
+            c[prefix + ".files_read"] = c.get(prefix + ".files_read", 0) + files
+            c[prefix + ".bytes_scanned"] = c.get(prefix + ".bytes_scanned", 0) + nbytes
+
+    def record(
+        self, key: str, wall: float, cpu: float, code: int | str, out: int, err: int
+    ) -> None:
+        with self._lock:
+            c = self.commands.get(key)
+            if c is None:
+                c = self.commands[key] = _empty_command()
+            c["count"] += 1
+            c["wall_s"] += wall
+            c["cpu_s"] += cpu
+            c["max_wall_s"] = max(c["max_wall_s"], wall)
+            c["stdout_bytes"] += out
+            c["stderr_bytes"] += err
+            codes = c["exit_codes"]
+            codes[str(code)] = codes.get(str(code), 0) + 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "commands": json.loads(json.dumps(self.commands)),
+                "counters": dict(self.counters),
+            }
+
+    def take(self) -> dict[str, Any]:
+        """Snapshot and reset in one step."""
+        with self._lock:
+            out = {"commands": self.commands, "counters": self.counters}
+            self.commands, self.counters = {}, {}
+        return out
+
+    def restore(self, taken: dict[str, Any]) -> None:
+        """Put back what `take` returned (a flush that could not be written)."""
+        with self._lock:
+            merge({"commands": self.commands, "counters": self.counters}, taken)
+
+    def empty(self) -> bool:
+        return not self.commands and not self.counters
+
+
+METRICS = Metrics()
+
+
+def count(name: str, n: int = 1) -> None:
+    METRICS.count(name, n)
+
+
+def scanned(prefix: str, files: int, nbytes: int) -> None:
+    METRICS.scanned(prefix, files, nbytes)
+
+
+def merge(into: dict[str, Any], new: dict[str, Any]) -> dict[str, Any]:
+    """Add the commands/counters of `new` to `into` (in place) and return it."""
+    cmds = into.setdefault("commands", {})
+    for key, c in new.get("commands", {}).items():
+        cur = cmds.setdefault(key, _empty_command())
+        for field in ("count", "wall_s", "cpu_s", "stdout_bytes", "stderr_bytes"):
+            cur[field] += c.get(field, 0)
+        cur["max_wall_s"] = max(cur["max_wall_s"], c.get("max_wall_s", 0.0))
+        for code, n in c.get("exit_codes", {}).items():
+            cur["exit_codes"][code] = cur["exit_codes"].get(code, 0) + n
+    counters = into.setdefault("counters", {})
+    for name, n in new.get("counters", {}).items():
+        counters[name] = counters.get(name, 0) + n
+    return into
+
+
+def metrics_path() -> Path:
+    return Path(os.environ.get("CODEXRT_METRICS_FILE") or Path(SETTINGS.tmp_dir) / "metrics.json")
+
+
+def enabled() -> bool:
+    """Whether `flush` writes the metrics file: opt-in with CODEXRT_METRICS=1."""
+    return os.environ.get("CODEXRT_METRICS", "0").lower() in ("1", "true", "yes", "on")
+
+
+@contextmanager
+def _locked(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(str(path) + ".lock", "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        yield
+
+
+def _read(path: Path) -> dict[str, Any]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write(path: Path, data: dict[str, Any]) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def flush(path: str | Path | None = None) -> bool:
+    """Fold this process's metrics into the metrics file. False if there was nothing to add."""
+    if METRICS.empty() or not enabled():
+        return False
+    p = Path(path) if path else metrics_path()
+    new = METRICS.take()
+    try:
+        with _locked(p):
+            data = _read(p)
+            now = time.time()
+            data.setdefault("since", now)
+            data["updated"] = now
+            data["flushes"] = data.get("flushes", 0) + 1
+            _write(p, merge(data, new))
+    except OSError:
+        METRICS.restore(new)  # keep them for the next attempt
+        return False
+    return True
+
+
+def load(path: str | Path | None = None, live: bool = True) -> dict[str, Any]:
+    """
+    Aggregated metrics: the metrics file plus (with `live`) what this process has not
+    flushed yet. Each command also gets `mean_wall_s` and `failures` (non-zero exits).
+    """
+    data = _read(Path(path) if path else metrics_path())
+    data.setdefault("commands", {})
+    data.setdefault("counters", {})
+    if live:
+        merge(data, METRICS.snapshot())
+    for c in data["commands"].values():
+        c["mean_wall_s"] = c["wall_s"] / c["count"] if c["count"] else 0.0
+        c["failures"] = sum(n for code, n in c["exit_codes"].items() if code != "0")
+    return data
+
+
+def reset(path: str | Path | None = None) -> None:
+    """Forget everything recorded so far, on disk and in this process."""
+    p = Path(path) if path else metrics_path()
+    METRICS.take()
+    with _locked(p):
+        p.unlink(missing_ok=True)
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import json
 import os
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
 from typing import Any, Dict
 
-import requests
+from .diffsplit import DiffSplitter, section_path
+from .http_client import request
+from .model_cache import ResponseCache, cache_enabled, cache_key, repo_tree_hash
 
 
-def _openai_payload(goal: str, context: Dict[str, str], model: str) -> Dict[str, Any]:
+def _openai_payload(
+    goal: str, context: Dict[str, str], model: str, temperature: float = 0
+) -> Dict[str, Any]:
     # Minimal, provider-agnostic "diff-only" instruction
     prompt = (
         "You are a code patch generator.\n"
@@ -22,11 +29,153 @@ def _openai_payload(goal: str, context: Dict[str, str], model: str) -> Dict[str,
             {"role": "system", "content": prompt},
             {"role": "user", "content": user},
         ],
-        "temperature": 0,
+        "temperature": temperature,
     }
 
 
-def get_diff(goal: str, context: Dict[str, str], model: str | None = None) -> str:
+def _post_http(endpoint: str, body: Dict[str, Any]) -> str:
+    # generating a diff has no side effects: safe to retry despite the POST
+    resp = request("POST", endpoint, endpoint="model-http", json=body, idempotent=True)
+    # In tests, raise_for_status is mocked to no-op
+    if hasattr(resp, "raise_for_status"):
+        resp.raise_for_status()
+    data = (resp.json() or {}) if hasattr(resp, "json") else {}
+    diff = data.get("diff", "")
+    return diff or ""
+
+
+def _post_openai(endpoint: str, payload: Dict[str, Any], headers: Dict[str, str]) -> str:
+    resp = request(
+        "POST", endpoint, endpoint="openai", json=payload, headers=headers, idempotent=True
+    )
+    if hasattr(resp, "raise_for_status"):
+        resp.raise_for_status()
+    data = (resp.json() or {}) if hasattr(resp, "json") else {}
+
+    # Allow tests to just return {"diff": "..."} even on "openai" path
+    if "diff" in data:
+        return data.get("diff") or ""
+
+    try:
+        return data["choices"][0]["message"]["content"]
+    except Exception:
+        return ""
+
+
+class DiffRejected(RuntimeError):
+    """A streamed diff section failed early validation; the stream was aborted."""
+
+    def __init__(self, file: str | None, stderr: str, partial: str) -> None:
+        super().__init__(f"diff section for {file or '?'} does not apply: {stderr.strip()}")
+        self.file = file
+        self.stderr = stderr
+        self.partial = partial
+
+
+def _sse_deltas(resp: Any) -> Iterator[str]:
+    """Text deltas from an OpenAI-style server-sent event stream."""
+    for line in resp.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        try:
+            event = json.loads(data)
+        except ValueError:
+            continue
+        if "diff" in event:
+            yield event.get("diff") or ""
+            continue
+        try:
+            delta = event["choices"][0]["delta"].get("content")
+        except (KeyError, IndexError, TypeError, AttributeError):
+            continue
+        if delta:
+            yield delta
+
+
+def _stream_chunks(resp: Any) -> Iterator[str]:
+    """SSE, chunked plain text, or (for non-streaming servers) a JSON {'diff'} body."""
+    ctype = resp.headers.get("Content-Type", "")
+    if ctype.startswith("text/event-stream"):
+        yield from _sse_deltas(resp)
+    elif ctype.startswith("application/json"):
+        yield (resp.json() or {}).get("diff") or ""
+    else:
+        resp.encoding = resp.encoding or "utf-8"
+        for chunk in resp.iter_content(chunk_size=None, decode_unicode=True):
+            if chunk:
+                yield chunk
+
+
+def _validate_stream(chunks: Iterable[str], check: Callable[[str], dict]) -> str:
+    """
+    Assemble a diff from streamed chunks, checking each file section as soon as it is
+    complete. Raises DiffRejected on the first section that cannot apply.
+    """
+    splitter = DiffSplitter()
+    parts: list[str] = []
+
+    def _check(sections: list[str]) -> None:
+        for section in sections:
+            res = check(section)
+            if not res.get("ok"):
+                raise DiffRejected(section_path(section), res.get("stderr", ""), "".join(parts))
+
+    for chunk in chunks:
+        parts.append(chunk)
+        _check(splitter.feed(chunk))
+    _check(splitter.close())
+    return "".join(parts)
+
+
+def _stream_post(
+    endpoint: str,
+    name: str,
+    body: Dict[str, Any],
+    headers: Dict[str, str] | None = None,
+    check: Callable[[str], dict] | None = None,
+) -> str:
+    if check is None:
+        from .patch import check_section as check
+    # Leaving the `with` block early (DiffRejected) closes the connection, which is
+    # what stops the provider from generating the rest of the diff.
+    with request(
+        "POST", endpoint, endpoint=name, json=body, headers=headers, stream=True, idempotent=True
+    ) as resp:
+        resp.raise_for_status()
+        return _validate_stream(_stream_chunks(resp), check)
+
+
+def _cached(
+    use_cache: bool,
+    provider: str,
+    model: str,
+    payload: Dict[str, Any],
+    fetch: Callable[[], str],
+) -> str:
+    if not use_cache:
+        return fetch()
+    cache = ResponseCache()
+    key = cache_key(provider, model, payload, repo_tree_hash())
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+    diff = fetch()
+    if diff:
+        cache.put(key, diff)
+    return diff
+
+
+def get_diff(
+    goal: str,
+    context: Dict[str, str],
+    model: str | None = None,
+    temperature: float | None = None,
+    cache: bool | None = None,
+    stream: bool | None = None,
+) -> str:
     """
     Providers:
       - MODEL_PROVIDER=http:
@@ -36,8 +185,19 @@ def get_diff(goal: str, context: Dict[str, str], model: str | None = None) -> st
       - MODEL_PROVIDER=openai (default):
           POST OpenAI-style payload to OPENAI_ENDPOINT (or default).
           Accept either {'diff': '...'} or OpenAI-style choices[].
+
+    `temperature` defaults to 0; the http provider only receives it when set.
+    `cache` enables the on-disk response cache (keyed by provider, model, payload and
+    repo tree); None defers to CODEXRT_MODEL_CACHE, False bypasses it.
+
+    `stream` (default: MODEL_STREAM=1) requests a streamed response (SSE or chunked
+    text) and `git apply --check`s each file section as it completes; the first
+    unapplicable section aborts the stream with DiffRejected.
     """
     provider = (os.environ.get("MODEL_PROVIDER") or "openai").lower()
+    use_cache = cache_enabled() if cache is None else cache
+    if stream is None:
+        stream = os.environ.get("MODEL_STREAM", "") not in ("", "0")
 
     if provider == "http":
         endpoint = (
@@ -47,13 +207,14 @@ def get_diff(goal: str, context: Dict[str, str], model: str | None = None) -> st
         )
         if not endpoint:
             return ""
-        resp = requests.post(endpoint, json={"goal": goal, "context": context}, timeout=30)
-        # In tests, raise_for_status is mocked to no-op
-        if hasattr(resp, "raise_for_status"):
-            resp.raise_for_status()
-        data = (resp.json() or {}) if hasattr(resp, "json") else {}
-        diff = data.get("diff", "")
-        return diff or ""
+        body: Dict[str, Any] = {"goal": goal, "context": context}
+        if temperature is not None:
+            body["temperature"] = temperature
+        if stream:
+            fetch = partial(_stream_post, endpoint, "model-http", {**body, "stream": True})
+        else:
+            fetch = partial(_post_http, endpoint, body)
+        return _cached(use_cache, provider, endpoint, body, fetch)
 
     # default: openai-style
     endpoint = os.environ.get("OPENAI_ENDPOINT", "https://api.openai.com/v1/chat/completions")
@@ -61,18 +222,9 @@ def get_diff(goal: str, context: Dict[str, str], model: str | None = None) -> st
     headers: Dict[str, str] = {}
     if os.environ.get("OPENAI_API_KEY"):
         headers["Authorization"] = f"Bearer {os.environ['OPENAI_API_KEY']}"
-    payload = _openai_payload(goal, context, model)
-
-    resp = requests.post(endpoint, json=payload, headers=headers, timeout=60)
-    if hasattr(resp, "raise_for_status"):
-        resp.raise_for_status()
-    data = (resp.json() or {}) if hasattr(resp, "json") else {}
-
-    # Allow tests to just return {"diff": "..."} even on "openai" path
-    if "diff" in data:
-        return data.get("diff") or ""
-
-    try:
-        return data["choices"][0]["message"]["content"]
-    except Exception:
-        return ""
+    payload = _openai_payload(goal, context, model, temperature or 0)
+    if stream:
+        fetch = partial(_stream_post, endpoint, "openai", {**payload, "stream": True}, headers)
+    else:
+        fetch = partial(_post_openai, endpoint, payload, headers)
+    return _cached(use_cache, provider, model, payload, fetch)
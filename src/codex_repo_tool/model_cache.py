@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from . import proc
+from .config import SETTINGS
+
+try:  # POSIX only; without it concurrent processes may lose a stats update
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+_stats_lock = threading.Lock()
+
+
+def cache_enabled() -> bool:
+    """The cache is opt-in: CODEXRT_MODEL_CACHE=1 turns it on for get_diff by default."""
+    return os.environ.get("CODEXRT_MODEL_CACHE", "") not in ("", "0")
+
+
+def repo_tree_hash(root: str | Path = ".") -> str:
+    """
+    Hash identifying the repo state a diff was generated against: the HEAD tree plus
+    any uncommitted changes and untracked file names. Empty string outside git.
+    """
+    head = proc.run(
+        ["git", "rev-parse", "HEAD^{tree}"], cwd=root, capture_output=True, text=True
+    )
+    if head.returncode != 0:
+        return ""
+    h = hashlib.sha256(head.stdout.strip().encode())
+    dirty = proc.run(["git", "diff", "HEAD"], cwd=root, capture_output=True)
+    h.update(dirty.stdout or b"")
+    cmd = ["git", "ls-files", "--others", "--exclude-standard"]
+    if not Path(SETTINGS.tmp_dir).is_absolute():
+        # our own scratch dir (including this cache) must not change the key
+        cmd += ["--", ".", f":(exclude){SETTINGS.tmp_dir}"]
+    others = proc.run(cmd, cwd=root, capture_output=True)
+    h.update(others.stdout or b"")
+    return h.hexdigest()
+
+
+def cache_key(provider: str, model: str, payload: Any, tree: str) -> str:
+    payload_hash = hashlib.sha256(
+        json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+    raw = "\0".join([provider, model, payload_hash, tree])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk cache of model diffs under <tmp_dir>/cache/model, one JSON file per key.
+    Entries expire after `ttl` seconds; when the cache grows past `max_bytes` the
+    least recently used entries (by mtime, refreshed on hit) are evicted.
+    """
+
+    def __init__(
+        self,
+        root: str | Path | None = None,
+        max_bytes: int = SETTINGS.model_cache_max_bytes,
+        ttl: float = SETTINGS.model_cache_ttl,
+    ) -> None:
+        self.root = Path(root) if root else Path(SETTINGS.tmp_dir) / "cache" / "model"
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._record(hit=False)
+            return None
+        if time.time() - entry.get("created", 0) > self.ttl:
+            path.unlink(missing_ok=True)
+            self._record(hit=False)
+            return None
+        os.utime(path)  # LRU touch
+        diff = entry.get("diff", "")
+        self._record(hit=True, saved=len(diff.encode("utf-8")))
+        return diff
+
+    def put(self, key: str, diff: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({"diff": diff, "created": time.time()}), encoding="utf-8")
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then oldest entries until under max_bytes. Returns count."""
+        now = time.time()
+        entries: list[tuple[float, int, Path]] = []
+        removed = 0
+        for p in self.root.glob("*/*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if now - st.st_mtime > self.ttl:
+                p.unlink(missing_ok=True)
+                removed += 1
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> int:
+        removed = 0
+        for p in self.root.glob("*/*.json"):
+            p.unlink(missing_ok=True)
+            removed += 1
+        (self.root / "stats.json").unlink(missing_ok=True)
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        data = self._load_stats()
+        lookups = data["hits"] + data["misses"]
+        files = list(self.root.glob("*/*.json"))
+        return {
+            **data,
+            "hit_rate": data["hits"] / lookups if lookups else 0.0,
+            "entries": len(files),
+            "bytes": sum(p.stat().st_size for p in files),
+        }
+
+    def _load_stats(self) -> dict[str, int]:
+        try:
+            data = json.loads((self.root / "stats.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        return {k: int(data.get(k, 0)) for k in ("hits", "misses", "bytes_saved")}
+
+    @contextmanager
+    def _stats_locked(self) -> Iterator[None]:
+        # the thread lock orders this process's writers, the file lock other processes
+        with _stats_lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.root / "stats.json.lock", "a") as fh:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_EX)
+                yield
+
+    def _record(self, hit: bool, saved: int = 0) -> None:
+        with self._stats_locked():
+            data = self._load_stats()
+            data["hits" if hit else "misses"] += 1
+            data["bytes_saved"] += saved
+            tmp = self.root / f"stats.{os.getpid()}.tmp"
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp, self.root / "stats.json")
@@ -1,16 +1,18 @@
 from __future__ import annotations
 
 import json
-import subprocess
-import uuid
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
-from .config import SETTINGS
-from .policy import load_policy
+from . import proc
+from .diffsplit import diff_paths
+from .policy import Policy, load_policy
+from .prescreen import prescreen
 from .qa import lint_code, run_tests
-from .sandbox import with_worktree
+from .sandbox import WorktreePool, with_worktree
+from .store import default_store
+from .tracing import span
 
 
 @dataclass
@@ -20,126 +22,193 @@ class Patch:
     description: str = ""
 
 
-def _tmpdir() -> Path:
-    p = Path(SETTINGS.tmp_dir)
-    p.mkdir(parents=True, exist_ok=True)
-    return p
-
-
 def propose_patch(file: str, diff: str, description: str = "") -> str:
     """
-    Create a uniquely-named patch JSON under tmp_dir and return its ID (string)
-    like 'patch_<id>'. Tests expect the returned value to start with 'patch_'.
+    Record a single-file patch in the patch store (status "pending") and return its
+    unique ID, 'patch_<hex>'.
     """
-    tmp = _tmpdir()
-    patch_id = f"patch_{uuid.uuid4().hex[:8]}"
-    path = tmp / f"{patch_id}.json"
-    data = {"file": file, "diff": diff, "description": description}
-    path.write_text(json.dumps(data), encoding="utf-8")
-    return patch_id
+    return default_store().add_patch(file, diff, description)
 
 
 def apply_patch(patch_id: str, branch: str = "HEAD") -> dict:
     """
-    Read the patch JSON by ID and attempt to apply it (dry-run validate).
+    Validate a stored patch against the working tree with `git apply --check` (a
+    dry run) and record the outcome as its status ("applied" or "failed").
     """
-    tmp = _tmpdir()
-    path = tmp / f"{patch_id}.json"
-    info = json.loads(path.read_text(encoding="utf-8"))
+    store = default_store()
+    info = store.get(patch_id)
+    if info is None or info["kind"] != "patch":
+        raise KeyError(f"unknown patch: {patch_id}")
+    # the diff goes through stdin, so concurrent calls share no scratch file
+    dry = check_section(info["diff"])
+    if not dry["ok"]:
+        res = {
+            "applied": False,
+            "stage": "dry-run",
+            "stdout": dry["stdout"],
+            "stderr": dry["stderr"],
+        }
+    else:
+        res = {"applied": True, "stage": "done"}
+    store.set_status(patch_id, "applied" if res["applied"] else "failed", res)
+    return res
 
-    diff_path = tmp / "apply.patch"
-    diff_path.write_text(info["diff"], encoding="utf-8")
 
-    # Dry-run apply to validate
-    dry = subprocess.run(
-        ["git", "apply", "--check", str(diff_path)],
+def check_section(section: str, cwd: str | None = None) -> dict:
+    """
+    `git apply --check` a single file section of a diff (read from stdin) against the
+    working tree. Used to reject streamed diffs before the model has finished.
+    """
+    p = proc.run(
+        ["git", "apply", "--check", "-"],
+        input=section,
+        cwd=cwd,
         capture_output=True,
         text=True,
     )
-    if dry.returncode != 0:
-        return {
-            "applied": False,
-            "stage": "dry-run",
-            "stdout": dry.stdout,
-            "stderr": dry.stderr,
-        }
-    return {"applied": True, "stage": "done"}
+    return {"ok": p.returncode == 0, "stdout": p.stdout, "stderr": p.stderr}
 
 
 def discard_patch(patch_id: str) -> bool:
     """
-    Remove the patch file created by `propose_patch`.
+    Remove a patch created by `propose_patch` from the store.
     Tests expect True on success.
     """
-    path = _tmpdir() / f"{patch_id}.json"
-    if path.exists():
-        try:
-            path.unlink()
-            return True
-        except Exception:
-            return False
-    return False
+    return default_store().delete(patch_id)
 
 
 def propose_bundle(items: list[dict]) -> str:
     """
-    Store a bundle file under tmp_dir and return its full path (str).
+    Record a bundle of items in the patch store and return its unique ID,
+    'bundle_<hex>'. Concurrent callers always get distinct bundles.
     """
-    tmp = _tmpdir()
-    bid = tmp / "bundle.json"
-    bid.parent.mkdir(parents=True, exist_ok=True)
-    bid.write_text(json.dumps({"items": items}), encoding="utf-8")
-    return str(bid)
+    return default_store().add_bundle(items)
 
 
-def apply_bundle(bundle_id: str, branch: str = "HEAD") -> dict:
-    bundle = json.loads(Path(bundle_id).read_text(encoding="utf-8"))
+def apply_bundle(bundle_id: str, branch: str = "HEAD", pool: WorktreePool | None = None) -> dict:
+    """
+    Validate a stored bundle (see validate_items), tracking its status in the store:
+    "checking" while it runs, then "applied" or "failed" with the result. A path to a
+    bundle JSON file ({"items": [...]}) is accepted as well and not tracked.
+    """
+    store = default_store()
+    bundle = store.get(bundle_id)
+    if bundle is None:
+        items = json.loads(Path(bundle_id).read_text(encoding="utf-8")).get("items", [])
+        return validate_items(items, branch, pool)
+    store.set_status(bundle_id, "checking")
+    res: dict = {"applied": False, "stage": "error"}
+    try:
+        res = validate_items(bundle["items"], branch, pool)
+    finally:
+        store.set_status(bundle_id, "applied" if res.get("applied") else "failed", res)
+    return res
+
+
+def check_policy(items: list[dict], policy: Policy | None = None) -> dict | None:
+    """
+    Check bundle targets and size against policy without touching the repo. Returns
+    a refusal result (stage "policy") or None if the bundle may be applied.
+    """
+    policy = policy or load_policy()
+    paths: set[str] = set()
+    diffs: set[str] = set()  # items of one diff share its text; count it once
+    for item in items:
+        if item.get("file"):
+            paths.add(item["file"])
+        diffs.add(item.get("diff", ""))
+    for diff in diffs:
+        paths |= diff_paths(diff)
+    size = sum(len(d.encode("utf-8")) for d in diffs)
+    problems = policy.violations(paths, size)
+    if not problems:
+        return None
+    return {"applied": False, "stage": "policy", "error": problems[0], "violations": problems}
+
+
+def _git_apply(wt: str, diff_file: Path) -> dict | None:
+    """`git apply --check` then `git apply` one diff in worktree `wt`; None on success."""
+    dry = proc.run(
+        ["git", "apply", "--check", str(diff_file)],
+        cwd=wt,
+        capture_output=True,
+        text=True,
+    )
+    if dry.returncode != 0:
+        return {
+            "applied": False,
+            "stage": "dry-run",
+            "stdout": dry.stdout,
+            "stderr": dry.stderr,
+        }
+    apply = proc.run(
+        ["git", "apply", str(diff_file)],
+        cwd=wt,
+        capture_output=True,
+        text=True,
+    )
+    if apply.returncode != 0:
+        return {
+            "applied": False,
+            "stage": "apply",
+            "stdout": apply.stdout,
+            "stderr": apply.stderr,
+        }
+    return None
+
+
+def validate_items(
+    items: list[dict], branch: str = "HEAD", pool: WorktreePool | None = None
+) -> dict:
+    """
+    Pre-screen bundle items, then apply them in a fresh worktree of `branch` (leased
+    from `pool` if given) and run the required checks. Works on in-memory items so
+    concurrent callers never share a bundle file. The result carries per-stage
+    "timings" in milliseconds.
+    """
+    with span("apply_bundle", items=len(items), branch=branch) as s:
+        res = _validate_items(items, branch, pool)
+    res["timings"] = s.timings()
+    return res
+
+
+def _validate_items(items: list[dict], branch: str, pool: WorktreePool | None) -> dict:
     policy = load_policy()
+    # cheap checks first: policy, then an in-memory apply + syntax check (milliseconds)
+    with span("policy"):
+        refused = check_policy(items, policy)
+    if refused:
+        return refused
+    with span("prescreen"):
+        refused = prescreen(items, branch)
+    if refused:
+        return refused
 
     def _apply_in_wt(wt: str) -> dict:
         from pathlib import Path
 
         wt_path = Path(wt)
-        for i, item in enumerate(bundle.get("items", []), start=1):
+        for i, item in enumerate(items, start=1):
             diff_file = wt_path / f"diff_{i}.patch"
             diff_file.parent.mkdir(parents=True, exist_ok=True)
             diff_file.write_text(item["diff"], encoding="utf-8")
-            dry = subprocess.run(
-                ["git", "apply", "--check", str(diff_file)],
-                cwd=wt,
-                capture_output=True,
-                text=True,
-            )
-            if dry.returncode != 0:
-                return {
-                    "applied": False,
-                    "stage": "dry-run",
-                    "stdout": dry.stdout,
-                    "stderr": dry.stderr,
-                }
-            apply = subprocess.run(
-                ["git", "apply", str(diff_file)],
-                cwd=wt,
-                capture_output=True,
-                text=True,
-            )
-            if apply.returncode != 0:
-                return {
-                    "applied": False,
-                    "stage": "apply",
-                    "stdout": apply.stdout,
-                    "stderr": apply.stderr,
-                }
+            with span("git.apply", item=i):
+                res = _git_apply(wt, diff_file)
+            if res is not None:
+                return res
 
         lint_required = policy.require_checks.get("lint", True)
         tests_required = policy.require_checks.get("tests", True)
 
         lint: dict[str, Any] = {"ok": True}
         tests: dict[str, Any] = {"ok": True}
-        if lint_required:
-            lint = lint_code()
-        if tests_required:
-            tests = run_tests()
+        with span("qa"):
+            # in the worktree: the patched tree is what is checked, and concurrent
+            # validations never touch the main checkout or each other
+            if lint_required:
+                lint = lint_code(cwd=wt)
+            if tests_required:
+                tests = run_tests(cwd=wt)
 
         lint_ok = lint.get("ok", False) if lint_required else True
         tests_ok = tests.get("ok", False) if tests_required else True
@@ -159,7 +228,61 @@ def apply_bundle(bundle_id: str, branch: str = "HEAD") -> dict:
             "tests": tests,
         }
 
-    ok, res = with_worktree(branch, _apply_in_wt)
+    ok, res = with_worktree(branch, _apply_in_wt, pool=pool)
     if not ok:
         return {"applied": False, **res}
     return res
+
+
+def publish_items(
+    items: list[dict],
+    head: str,
+    message: str,
+    branch: str = "HEAD",
+    pool: WorktreePool | None = None,
+    replace: bool = False,
+) -> dict:
+    """
+    Commit bundle items on top of `branch` and push the commit to origin as branch
+    `head`, the head of a pull request. Runs in a worktree (leased from `pool` if
+    given), so the main checkout is left alone. With `replace`, an existing `head` is
+    overwritten (a lease on the commit it pointed to when we looked); otherwise the
+    push only creates or fast-forwards it. Returns {"ok": True, "branch": head,
+    "commit": <sha>} or {"ok": False, "stage": ..., "stderr": ...}.
+    """
+
+    def _publish_in_wt(wt: str) -> dict:
+        for item in items:
+            # through stdin: a diff file in the worktree would be committed too
+            p = proc.run(
+                ["git", "apply", "-"], input=item["diff"], cwd=wt, capture_output=True, text=True
+            )
+            if p.returncode != 0:
+                return {"ok": False, "stage": "apply", "stdout": p.stdout, "stderr": p.stderr}
+        ref = f"refs/heads/{head}"
+        push = ["git", "push", "-q", "origin", f"HEAD:{ref}"]
+        if replace:
+            remote = proc.run(
+                ["git", "ls-remote", "origin", ref], cwd=wt, capture_output=True, text=True
+            )
+            if remote.returncode != 0:
+                return {"ok": False, "stage": "push", "stderr": remote.stderr}
+            seen = remote.stdout.split()[0] if remote.stdout.strip() else ""
+            # a push made after we looked is not overwritten; "" means "must not exist"
+            push.insert(3, f"--force-with-lease={ref}:{seen}")
+        for stage, cmd in (
+            ("commit", ["git", "add", "-A"]),
+            ("commit", ["git", "commit", "-q", "-m", message]),
+            ("push", push),
+        ):
+            p = proc.run(cmd, cwd=wt, capture_output=True, text=True)
+            if p.returncode != 0:
+                return {"ok": False, "stage": stage, "stdout": p.stdout, "stderr": p.stderr}
+        sha = proc.run(["git", "rev-parse", "HEAD"], cwd=wt, capture_output=True, text=True)
+        return {"ok": True, "branch": head, "commit": sha.stdout.strip()}
+
+    with span("publish", items=len(items), head=head):
+        ok, res = with_worktree(branch, _publish_in_wt, pool=pool)
+    if not ok:
+        return {"ok": False, **res}
+    return res
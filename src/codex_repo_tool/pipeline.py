@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any
+
+from .tracing import span
+
+
+def _union(intervals: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    out: list[tuple[float, float]] = []
+    for start, end in sorted(intervals):
+        if out and start <= out[-1][1]:
+            out[-1] = (out[-1][0], max(out[-1][1], end))
+        else:
+            out.append((start, end))
+    return out
+
+
+def _length(intervals: list[tuple[float, float]]) -> float:
+    return sum(end - start for start, end in intervals)
+
+
+def _intersect(a: list[tuple[float, float]], b: list[tuple[float, float]]) -> float:
+    """Total length of the intersection of two sorted, disjoint interval lists."""
+    total, i, j = 0.0, 0, 0
+    while i < len(a) and j < len(b):
+        lo, hi = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if lo < hi:
+            total += hi - lo
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+class Pipeline:
+    """
+    Runs the stages of one task, independent ones in the background: `start` hands a
+    stage to a worker thread and returns its Future, `stage` times one on the calling
+    thread. Both open a tracing span of the stage's name (background spans nest under
+    the caller's). `report` tells, per stage, how much of its wall time ran alongside
+    another stage, and how much time the overlap saved against running them in turn.
+    """
+
+    def __init__(self, workers: int = 4) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="codexrt-pipe")
+        self._t0 = time.perf_counter()
+        self._intervals: dict[str, list[tuple[float, float]]] = {}
+        self._errors: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, name: str, start: float, error: BaseException | None) -> None:
+        with self._lock:
+            self._intervals.setdefault(name, []).append((start, time.perf_counter()))
+            if error is not None:
+                self._errors[name] = f"{type(error).__name__}: {error}"
+
+    @contextmanager
+    def stage(self, name: str, **attrs: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        error: BaseException | None = None
+        try:
+            with span(name, **attrs):
+                yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._record(name, start, error)
+
+    def start(self, name: str, fn: Callable[..., Any], *args: Any) -> Future:
+        def run() -> Any:
+            with self.stage(name):
+                return fn(*args)
+
+        # a Context cannot be entered by two threads at once: one copy per stage
+        return self._pool.submit(contextvars.copy_context().run, run)
+
+    def report(self) -> dict[str, Any]:
+        """
+        {"wall_ms", "saved_ms", "stages": {name: {"ms", "overlap_ms"[, "error"]}}}, for
+        the stages finished so far. overlap_ms is the part of a stage that ran while
+        any other stage was running; saved_ms is the summed stage time minus the time
+        during which at least one stage ran.
+        """
+        with self._lock:
+            intervals = {name: _union(list(spans)) for name, spans in self._intervals.items()}
+            errors = dict(self._errors)
+        stages: dict[str, dict[str, Any]] = {}
+        for name, mine in intervals.items():
+            others = _union([iv for other, ivs in intervals.items() if other != name for iv in ivs])
+            stages[name] = {
+                "ms": round(_length(mine) * 1e3, 3),
+                "overlap_ms": round(_intersect(mine, others) * 1e3, 3),
+            }
+            if name in errors:
+                stages[name]["error"] = errors[name]
+        busy = _length(_union([iv for ivs in intervals.values() for iv in ivs]))
+        return {
+            "wall_ms": round((time.perf_counter() - self._t0) * 1e3, 3),
+            "saved_ms": round(
+                sum(_length(ivs) for ivs in intervals.values()) * 1e3 - busy * 1e3, 3
+            ),
+            "stages": stages,
+        }
+
+    def close(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def __enter__(self) -> Pipeline:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
@@ -1,27 +1,137 @@
 from __future__ import annotations
 
+import posixpath
+import re
+import threading
+from collections.abc import Iterable
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict
 
-import yaml
+# Always protected, whatever the policy file says; entries under `protected:` add to it.
+DEFAULT_PROTECTED = ("**/.git/**",)
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """
+    Translate a gitignore-style glob to a regex over '/'-separated relative paths.
+    `*` and `?` stay within one segment, `**` spans segments, a trailing '/' means
+    "everything below", and patterns without an inner '/' match at any depth.
+    """
+    pat = pattern.strip()
+    # decided before the "**" below, or "secrets/" would only match at the root
+    anchored = "/" in pat.rstrip("/")
+    if pat.endswith("/"):
+        pat += "**"
+    pat = pat.lstrip("/")
+    out: list[str] = []
+    i, n = 0, len(pat)
+    while i < n:
+        c = pat[i]
+        if pat.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pat.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[" and "]" in pat[i + 2 :]:
+            j = pat.index("]", i + 2)
+            body = pat[i + 1 : j]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append("[" + body.replace("\\", "\\\\") + "]")
+            i = j + 1
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return ("" if anchored else "(?:.*/)?") + "".join(out)
+
+
+@lru_cache(maxsize=64)
+def compile_globs(patterns: tuple[str, ...]) -> re.Pattern[str] | None:
+    """Compile many globs into one alternation, so a path is checked in one match."""
+    parts = [_glob_to_regex(p) for p in patterns if p.strip()]
+    if not parts:
+        return None
+    return re.compile("(?:" + "|".join(f"(?:{p})" for p in parts) + r")\Z")
+
+
+def _norm(path: str | Path) -> str:
+    s = posixpath.normpath(str(path).replace("\\", "/"))
+    return s[2:] if s.startswith("./") else s
 
 
 @dataclass
 class Policy:
     # which checks to require after applying a bundle
     require_checks: Dict[str, bool] = field(default_factory=lambda: {"lint": True, "tests": True})
+    # glob lists; an empty `allowed` list allows every path that is not protected
+    protected: list[str] = field(default_factory=list)
+    allowed: list[str] = field(default_factory=list)
+    # limits on a whole bundle; None means unlimited
+    max_diff_bytes: int | None = None
+    max_files: int | None = None
+
+    def __post_init__(self) -> None:
+        self._protected = compile_globs(DEFAULT_PROTECTED + tuple(self.protected))
+        self._allowed = compile_globs(tuple(self.allowed))
 
     def is_path_protected(self, path: str | Path) -> bool:
         """
-        Default policy: protect .git hooks (e.g., .git/hooks/pre-commit) by default.
-        Keeps other paths unprotected.
+        True if `path` matches a protected glob (.git internals, e.g.
+        .git/hooks/pre-commit, are always protected).
         """
-        s = str(path).replace("\\", "/")
-        # Normalize to avoid false negatives with relative/absolute variants
-        if ".git/hooks/" in s or s.endswith(".git/hooks/pre-commit"):
-            return True
-        return False
+        return bool(self._protected and self._protected.match(_norm(path)))
+
+    def is_path_allowed(self, path: str | Path) -> bool:
+        if self.is_path_protected(path):
+            return False
+        return self._allowed is None or bool(self._allowed.match(_norm(path)))
+
+    def violations(self, paths: Iterable[str], diff_bytes: int = 0) -> list[str]:
+        """Reasons a change touching `paths` with `diff_bytes` of diff is refused."""
+        out: list[str] = []
+        unique = sorted({_norm(p) for p in paths})
+        for p in unique:
+            if self.is_path_protected(p):
+                out.append(f"Protected path: {p}")
+            elif not self.is_path_allowed(p):
+                out.append(f"Path not allowed: {p}")
+        if self.max_files is not None and len(unique) > self.max_files:
+            out.append(f"Too many files: {len(unique)} > {self.max_files}")
+        if self.max_diff_bytes is not None and diff_bytes > self.max_diff_bytes:
+            out.append(f"Diff too large: {diff_bytes} bytes > {self.max_diff_bytes}")
+        return out
+
+
+def _from_yaml(c: Path) -> Policy:
+    import yaml  # only paid for when a policy file exists
+
+    data = yaml.safe_load(c.read_text(encoding="utf-8")) or {}
+    req = data.get("require_checks", {})
+    lint = bool(req.get("lint", True))
+    tests = bool(req.get("tests", True))
+    max_diff = data.get("max_diff_bytes")
+    max_files = data.get("max_files")
+    return Policy(
+        require_checks={"lint": lint, "tests": tests},
+        protected=[str(g) for g in data.get("protected") or []],
+        allowed=[str(g) for g in data.get("allowed") or []],
+        max_diff_bytes=int(max_diff) if max_diff is not None else None,
+        max_files=int(max_files) if max_files is not None else None,
+    )
+
+
+# resolved policy file -> (mtime_ns, size, Policy); avoids re-parsing YAML per bundle
+_CACHE: dict[str, tuple[int, int, Policy]] = {}
+_CACHE_LOCK = threading.Lock()
 
 
 def load_policy(path: str | None = None) -> Policy:
@@ -30,6 +140,8 @@ def load_policy(path: str | None = None) -> Policy:
     - If `path` is a directory, look for 'policy.yaml' or '.codexrt/policy.yaml' inside it.
     - If `path` is a file, read that file.
     - If nothing found, return default Policy().
+    Parsed policies are cached until the file's mtime or size changes; treat the
+    returned object as read-only.
     """
     candidates: list[Path] = []
     if path:
@@ -42,10 +154,19 @@ def load_policy(path: str | None = None) -> Policy:
         candidates = [Path(".") / "policy.yaml", Path(".") / ".codexrt" / "policy.yaml"]
 
     for c in candidates:
-        if c.exists() and c.is_file():
-            data = yaml.safe_load(c.read_text(encoding="utf-8")) or {}
-            req = data.get("require_checks", {})
-            lint = bool(req.get("lint", True))
-            tests = bool(req.get("tests", True))
-            return Policy(require_checks={"lint": lint, "tests": tests})
+        try:
+            st = c.stat()
+        except OSError:
+            continue
+        if not c.is_file():
+            continue
+        key = str(c.resolve())
+        with _CACHE_LOCK:
+            hit = _CACHE.get(key)
+        if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            return hit[2]
+        policy = _from_yaml(c)
+        with _CACHE_LOCK:
+            _CACHE[key] = (st.st_mtime_ns, st.st_size, policy)
+        return policy
     return Policy()
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import ast
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+from . import proc
+from .diffsplit import split_diff
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_UNKNOWN = object()  # repo content could not be read; skip checks that need it
+
+
+@dataclass
+class Hunk:
+    old_start: int
+    old_len: int
+    new_start: int
+    new_len: int
+    lines: list[str] = field(default_factory=list)  # body lines with their ' '/'-'/'+' tag
+
+
+@dataclass
+class FilePatch:
+    old_path: str | None  # None for a new file
+    new_path: str | None  # None for a deletion
+    hunks: list[Hunk] = field(default_factory=list)
+    binary: bool = False
+
+    @property
+    def path(self) -> str:
+        return self.new_path or self.old_path or ""
+
+
+class Rejected(Exception):
+    """A bundle failed the pre-screen; `reason` is a short machine-readable code."""
+
+    def __init__(self, reason: str, message: str, file: str | None = None, line: int | None = None):
+        super().__init__(message)
+        self.reason = reason
+        self.file = file
+        self.line = line
+
+    def result(self) -> dict[str, Any]:
+        out: dict[str, Any] = {
+            "applied": False,
+            "stage": "prescreen",
+            "reason": self.reason,
+            "error": str(self),
+        }
+        if self.file is not None:
+            out["file"] = self.file
+        if self.line is not None:
+            out["line"] = self.line
+        return out
+
+
+def _header_path(raw: str) -> str | None:
+    p = raw.split("\t")[0].strip()
+    if p == "/dev/null":
+        return None
+    return p[2:] if p.startswith(("a/", "b/")) else p
+
+
+def _parse_section(section: str) -> FilePatch:
+    old: str | None = None
+    new: str | None = None
+    seen_old = seen_new = False
+    binary = False
+    hunks: list[Hunk] = []
+    cur: Hunk | None = None
+    need_old = need_new = 0
+    lines = section.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    for line in lines:
+        if cur is not None and (need_old > 0 or need_new > 0):
+            tag = line[:1]
+            if tag in (" ", ""):
+                need_old -= 1
+                need_new -= 1
+            elif tag == "-":
+                need_old -= 1
+            elif tag == "+":
+                need_new -= 1
+            elif tag == "\\":
+                continue  # "\ No newline at end of file"
+            else:
+                raise Rejected("malformed", f"unexpected line in hunk: {line[:60]!r}", new or old)
+            cur.lines.append(line if line else " ")
+            continue
+        m = _HUNK_RE.match(line)
+        if m:
+            cur = Hunk(
+                int(m.group(1)),
+                int(m.group(2)) if m.group(2) is not None else 1,
+                int(m.group(3)),
+                int(m.group(4)) if m.group(4) is not None else 1,
+            )
+            need_old, need_new = cur.old_len, cur.new_len
+            hunks.append(cur)
+        elif hunks:
+            continue  # trailing text after the last hunk (e.g. a mail signature)
+        elif line.startswith("--- "):
+            old, seen_old = _header_path(line[4:]), True
+        elif line.startswith("+++ "):
+            new, seen_new = _header_path(line[4:]), True
+        elif line.startswith(("rename from ", "copy from ")) and not seen_old:
+            old = line.split(" ", 2)[2].strip()
+        elif line.startswith(("rename to ", "copy to ")) and not seen_new:
+            new = line.split(" ", 2)[2].strip()
+        elif line.startswith("diff --git ") and not (old or new):
+            parts = line[len("diff --git ") :].split(" ")
+            if len(parts) == 2:
+                old, new = _header_path(parts[0]), _header_path(parts[1])
+        elif line.startswith("new file mode"):
+            old, seen_old = None, True
+        elif line.startswith("deleted file mode"):
+            new, seen_new = None, True
+        elif line.startswith(("GIT binary patch", "Binary files ")):
+            binary = True
+    if need_old > 0 or need_new > 0:
+        where = new or old
+        raise Rejected("malformed", "diff ends in the middle of a hunk", where)
+    return FilePatch(old, new, hunks, binary)
+
+
+def parse_patch(diff: str) -> list[FilePatch]:
+    """Parse a (multi-file) unified diff; raises Rejected if a hunk is truncated or corrupt."""
+    return [_parse_section(s) for s in split_diff(diff)]
+
+
+def apply_hunks(text: str, hunks: list[Hunk], path: str = "") -> str:
+    """
+    Apply hunks to `text` like `git apply`: context must match exactly, but a hunk may
+    sit at an offset from its header position (the nearest match wins). As in git, a
+    hunk starting at line 1 must match at the top of the file and one without trailing
+    context at the bottom.
+    """
+    eol = text.endswith("\n")
+    lines = text.split("\n")[:-1] if eol else (text.split("\n") if text else [])
+    out: list[str] = []
+    pos = 0
+    for h in hunks:
+        old = [ln[1:] for ln in h.lines if ln[0] in " -"]
+        new = [ln[1:] for ln in h.lines if ln[0] in " +"]
+        trailing = len(h.lines) - len(_rstrip_context(h.lines))
+        want = h.old_start - 1 if h.old_len else h.old_start
+        at = _find(lines, old, max(want, pos), pos, h.old_start <= 1, trailing == 0)
+        if at is None:
+            raise Rejected("context-mismatch", "hunk does not apply", path, h.old_start)
+        out += lines[pos:at] + new
+        pos = at + len(old)
+    joined = "\n".join(out + lines[pos:])
+    return joined + "\n" if eol and joined else joined
+
+
+def _rstrip_context(body: list[str]) -> list[str]:
+    end = len(body)
+    while end and body[end - 1][0] == " ":
+        end -= 1
+    return body[:end]
+
+
+def _find(
+    lines: list[str], block: list[str], want: int, lo: int, begin: bool, end: bool
+) -> int | None:
+    hi = len(lines) - len(block)
+    if begin or end:
+        i = lo if begin else hi
+        ok = i >= lo and lines[i : i + len(block)] == block and (not end or i == hi)
+        return i if ok else None
+    for d in range(max(want - lo, hi - want, 0) + 1):
+        for i in (want - d, want + d) if d else (want,):
+            if lo <= i <= hi and lines[i : i + len(block)] == block:
+                return i
+    return None
+
+
+def read_blobs(paths: list[str], rev: str = "HEAD", cwd: str | None = None) -> dict[str, Any]:
+    """
+    Contents of `paths` at `rev` in one `git cat-file --batch` call: str, None if the
+    path does not exist, or _UNKNOWN (binary, or not a readable git repo).
+    """
+    out: dict[str, Any] = {p: _UNKNOWN for p in paths}
+    specs = [f"{rev}^{{tree}}"] + [f"{rev}:{p}" for p in paths]
+    p = proc.run(
+        ["git", "cat-file", "--batch"],
+        input="\n".join(specs).encode() + b"\n",
+        cwd=cwd,
+        capture_output=True,
+    )
+    data = p.stdout
+    if p.returncode != 0 or not isinstance(data, bytes) or not data:
+        return out
+    pos = 0
+    for i in range(len(specs)):
+        nl = data.find(b"\n", pos)
+        if nl < 0:
+            return out
+        header = data[pos:nl].split()
+        pos = nl + 1
+        if header[-1:] == [b"missing"]:
+            if i == 0:
+                return out  # no such revision (e.g. an empty repo): nothing to compare
+            out[paths[i - 1]] = None
+            continue
+        if len(header) != 3:
+            continue  # "ambiguous" and similar: no body follows
+        size = int(header[2])
+        body = data[pos : pos + size]
+        pos += size + 1
+        if i == 0:
+            continue
+        if header[1] != b"blob":
+            continue
+        try:
+            out[paths[i - 1]] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            pass
+    return out
+
+
+def _syntax_error(path: str, text: str) -> tuple[str, int | None] | None:
+    try:
+        if path.endswith(".py"):
+            ast.parse(text, filename=path)
+        elif path.endswith(".json"):
+            json.loads(text)
+    except SyntaxError as e:
+        return e.msg, e.lineno
+    except ValueError as e:
+        return str(e), getattr(e, "lineno", None)
+    return None
+
+
+def screen(items: list[dict], branch: str = "HEAD", cwd: str | None = None) -> None:
+    """Raise Rejected if the bundle cannot apply cleanly or breaks Python/JSON syntax."""
+    patches: list[FilePatch] = []
+    seen: set[str] = set()
+    for item in items:
+        diff = item.get("diff", "")
+        if diff not in seen:  # items split from one diff share its text
+            seen.add(diff)
+            patches += parse_patch(diff)
+
+    touched = sorted({p for fp in patches for p in (fp.old_path, fp.new_path) if p})
+    files = read_blobs(touched, branch, cwd) if touched else {}
+    original = dict(files)
+    for fp in patches:
+        if fp.binary:
+            continue
+        src = files.get(fp.old_path, _UNKNOWN) if fp.old_path else None
+        if fp.old_path and src is None:
+            raise Rejected("missing-target", f"{fp.old_path} does not exist", fp.old_path)
+        if fp.old_path is None and fp.new_path and files.get(fp.new_path) not in (None, _UNKNOWN):
+            raise Rejected("exists", f"{fp.new_path} already exists", fp.new_path)
+        if src is _UNKNOWN:
+            if fp.new_path:
+                files[fp.new_path] = _UNKNOWN
+            continue
+        result = apply_hunks(src or "", fp.hunks, fp.path) if fp.hunks else (src or "")
+        if fp.old_path and fp.old_path != fp.new_path:
+            files[fp.old_path] = None  # renamed away or deleted
+        if fp.new_path:
+            files[fp.new_path] = result
+
+    for path, text in files.items():
+        if not isinstance(text, str) or text == original.get(path):
+            continue
+        err = _syntax_error(path, text)
+        if err and (
+            not isinstance(original.get(path), str) or not _syntax_error(path, original[path])
+        ):
+            msg, line = err
+            raise Rejected("syntax", f"{path}: {msg}", path, line)
+
+
+def prescreen(items: list[dict], branch: str = "HEAD", cwd: str | None = None) -> dict | None:
+    """
+    In-memory check of a bundle before it reaches a worktree. Returns a refusal result
+    (stage "prescreen" with `reason`, `error`, and `file`/`line` where known) or None.
+    """
+    try:
+        screen(items, branch, cwd)
+    except Rejected as e:
+        return e.result()
+    return None
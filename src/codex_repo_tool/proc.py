@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import time
+from collections.abc import Sequence
+from typing import Any
+
+from .metrics import METRICS
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not on Windows
+    resource = None  # type: ignore[assignment]
+
+
+def command_key(cmd: Sequence[str] | str) -> str:
+    """Metrics bucket for a command line: the program name, plus the subcommand for git/npm."""
+    argv = cmd.split() if isinstance(cmd, str) else list(cmd)
+    if not argv:
+        return "?"
+    prog = os.path.basename(str(argv[0]))
+    if prog in ("git", "npm", "docker"):
+        rest = iter(argv[1:])
+        for a in map(str, rest):
+            if a in ("-C", "-c", "--git-dir", "--work-tree"):
+                next(rest, None)  # option value, not the subcommand
+            elif not a.startswith("-"):
+                return f"{prog} {a}"
+    return prog
+
+
+def _children_cpu() -> float:
+    if resource is None:
+        return 0.0
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+def _size(out: Any) -> int:
+    if isinstance(out, bytes):
+        return len(out)
+    if isinstance(out, str):
+        return len(out.encode("utf-8", "surrogateescape"))
+    return 0
+
+
+def run(cmd: Sequence[str] | str, **kwargs: Any) -> subprocess.CompletedProcess:
+    """
+    `subprocess.run` that records the call in metrics.METRICS: count, wall and CPU
+    time, exit code and output sizes per `command_key`. CPU time comes from the
+    RUSAGE_CHILDREN delta, so commands running concurrently may be attributed to
+    each other. Timeouts and missing executables are recorded and re-raised.
+    """
+    cpu0 = _children_cpu()
+    t0 = time.perf_counter()
+    code: int | str = "error"
+    out = err = 0
+    try:
+        p = subprocess.run(cmd, **kwargs)
+        code = p.returncode if isinstance(p.returncode, int) else "?"
+        out, err = _size(p.stdout), _size(p.stderr)
+        return p
+    except subprocess.TimeoutExpired:
+        code = "timeout"
+        raise
+    finally:
+        METRICS.record(
+            command_key(cmd),
+            time.perf_counter() - t0,
+            max(0.0, _children_cpu() - cpu0),
+            code,
+            out,
+            err,
+        )
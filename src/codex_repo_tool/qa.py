@@ -1,13 +1,14 @@
 from __future__ import annotations
 
-import subprocess
 from pathlib import Path
 
+from . import proc
 from .docker_sandbox import docker_available
+from .tracing import traced
 
 
-def _run(cmd: list[str]) -> dict:
-    p = subprocess.run(cmd, capture_output=True, text=True)
+def _run(cmd: list[str], cwd: str | None = None) -> dict:
+    p = proc.run(cmd, cwd=cwd, capture_output=True, text=True)
     return {"ok": p.returncode == 0, "stdout": p.stdout, "stderr": p.stderr, "code": p.returncode}
 
 
@@ -15,32 +16,56 @@ def _docker_enabled() -> bool:
     return docker_available()
 
 
-def _run_in_docker(cmd: list[str]) -> dict:
-    return _run(cmd)
+def _run_in_docker(cmd: list[str], cwd: str | None = None) -> dict:
+    return _run(cmd, cwd)
 
 
-def run_tests(scope: str | None = None) -> dict:
-    if Path("package.json").exists():
+def detect_toolchain(cwd: str | None = None) -> dict:
+    """
+    Which test runner and linter `run_tests`/`lint_code` would use in `cwd`, and whether
+    they would go through docker. Also primes the docker probe, so a task can run it
+    while it waits for the model.
+    """
+    root = Path(cwd or ".")
+    tests = lint = None
+    if (root / "package.json").exists():
+        tests = lint = "npm"
+    if (root / "pyproject.toml").exists() or (root / "pytest.ini").exists():
+        tests = tests or "pytest"
+    if (root / "pyproject.toml").exists() or (root / "ruff.toml").exists():
+        lint = "ruff"
+    return {"tests": tests, "lint": lint, "docker": bool(tests or lint) and _docker_enabled()}
+
+
+@traced("qa.run_tests")
+def run_tests(scope: str | None = None, cwd: str | None = None) -> dict:
+    """Run the project's tests in `cwd` (default: the current directory)."""
+    root = Path(cwd or ".")
+    if (root / "package.json").exists():
         if _docker_enabled():
-            return _run_in_docker(["npm", "test"] if scope is None else ["npm", "test", scope])
-        return _run(["npm", "test"] if scope is None else ["npm", "test", scope])
-    if Path("pyproject.toml").exists() or Path("pytest.ini").exists():
-        return _run(["pytest", "-q"] if scope is None else ["pytest", "-q", scope])
+            return _run_in_docker(["npm", "test"] if scope is None else ["npm", "test", scope], cwd)
+        return _run(["npm", "test"] if scope is None else ["npm", "test", scope], cwd)
+    if (root / "pyproject.toml").exists() or (root / "pytest.ini").exists():
+        return _run(["pytest", "-q"] if scope is None else ["pytest", "-q", scope], cwd)
     return {"ok": True, "stdout": "No tests detected; skipping.", "stderr": "", "code": 0}
 
 
-def lint_code(scope: str | None = None) -> dict:
-    if Path("pyproject.toml").exists() or Path("ruff.toml").exists():
+@traced("qa.lint_code")
+def lint_code(scope: str | None = None, cwd: str | None = None) -> dict:
+    """Lint the project in `cwd` (default: the current directory)."""
+    root = Path(cwd or ".")
+    if (root / "pyproject.toml").exists() or (root / "ruff.toml").exists():
         if _docker_enabled():
-            return _run_in_docker(["ruff", "check", "--fix", "."])
-        return _run(["ruff", "check", "--fix", "."])
-    if Path("package.json").exists():
+            return _run_in_docker(["ruff", "check", "--fix", "."], cwd)
+        return _run(["ruff", "check", "--fix", "."], cwd)
+    if (root / "package.json").exists():
         if _docker_enabled():
             return _run_in_docker(
-                ["npm", "run", "lint"] if scope is None else ["npm", "run", "lint", "--", scope]
+                ["npm", "run", "lint"] if scope is None else ["npm", "run", "lint", "--", scope],
+                cwd,
             )
         return _run(
-            ["npm", "run", "lint"] if scope is None else ["npm", "run", "lint", "--", scope]
+            ["npm", "run", "lint"] if scope is None else ["npm", "run", "lint", "--", scope], cwd
         )
     return {"ok": True, "stdout": "No linter detected; skipping.", "stderr": "", "code": 0}
 
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import json
+import os
+import posixpath
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+from .semantic import FileIndex, IncrementalIndex
+
+_JS_SUFFIXES = (".ts", ".tsx", ".js", ".jsx")
+_STATE_VERSION = 1
+# Room kept for the "## Other files" heading and the "(+N more files)" line
+_TAIL = 48
+
+
+def _module_keys(rel: str) -> list[str]:
+    """Names an import can use for the file at `rel` (a posix path relative to the root)."""
+    stem, ext = posixpath.splitext(rel)
+    if ext == ".py":
+        parts = stem.split("/")
+        if parts[-1] == "__init__":
+            parts.pop()
+        # every dotted suffix, so src/ layouts and relative imports ("from .x") resolve
+        return ["py:" + ".".join(parts[i:]) for i in range(len(parts))]
+    keys = ["js:" + stem]
+    if posixpath.basename(stem) == "index":
+        keys.append("js:" + posixpath.dirname(stem))
+    return keys
+
+
+def _lookups(rel: str, spec: str) -> list[str]:
+    """Module keys to try, in order, for import `spec` written in `rel`."""
+    if rel.endswith(".py"):
+        parts = spec.split(".")
+        return ["py:" + ".".join(parts[:i]) for i in range(len(parts), 0, -1)]
+    if spec.startswith("."):
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(rel), spec))
+        stem, ext = posixpath.splitext(target)
+        return ["js:" + (stem if ext in _JS_SUFFIXES else target)]
+    return []  # a package from node_modules
+
+
+def pagerank(
+    nodes: Sequence[str],
+    edges: Mapping[str, Sequence[str]],
+    start: Mapping[str, float] | None = None,
+    damping: float = 0.85,
+    tol: float = 1e-9,
+    max_iter: int = 200,
+) -> tuple[dict[str, float], int]:
+    """
+    PageRank of `nodes` over `edges` (node -> nodes it links to) by power iteration,
+    started from `start` when given (a previous result converges in a few rounds).
+    Returns (rank, iterations); ranks sum to 1.
+    """
+    n = len(nodes)
+    if not n:
+        return {}, 0
+    pos = {node: i for i, node in enumerate(nodes)}
+    incoming: list[list[int]] = [[] for _ in range(n)]
+    outdeg = [0] * n
+    for src, dsts in edges.items():
+        i = pos.get(src)
+        if i is None:
+            continue
+        targets = {pos[d] for d in dsts if d in pos and d != src}
+        outdeg[i] = len(targets)
+        for j in targets:
+            incoming[j].append(i)
+    rank = [start.get(node, 1.0 / n) for node in nodes] if start else [1.0 / n] * n
+    total = sum(rank)
+    rank = [r / total for r in rank]
+    base = (1.0 - damping) / n
+    it = 0
+    for it in range(1, max_iter + 1):
+        share = [r / d if d else 0.0 for r, d in zip(rank, outdeg)]
+        dangling = damping * sum(r for r, d in zip(rank, outdeg) if not d) / n
+        new = [base + dangling + damping * sum(share[j] for j in inc) for inc in incoming]
+        delta = sum(abs(a - b) for a, b in zip(new, rank))
+        rank = new
+        if delta < tol:
+            break
+    return dict(zip(nodes, rank)), it
+
+
+class RepoMap:
+    """
+    Import graph of an index resolved to files, ranked by PageRank. `update` redoes
+    only what a change can affect: imports are re-resolved for files whose imports
+    changed or whose lookups hit a module name that appeared or disappeared, and the
+    ranks are re-iterated from the previous ones only if an edge changed.
+    """
+
+    def __init__(self, root: str | Path = ".") -> None:
+        self.root = Path(root)
+        self.imports: dict[str, list[str]] = {}
+        self.edges: dict[str, list[str]] = {}
+        self.lookups: dict[str, list[str]] = {}  # file -> module keys its imports tried
+        self.rank: dict[str, float] = {}
+        self.stats: dict[str, int] = {}
+        self._rels: dict[str, str] = {}
+
+    def _rel(self, file: str) -> str:
+        rel = self._rels.get(file)
+        if rel is None:
+            rel = self._rels[file] = Path(os.path.relpath(file, self.root)).as_posix()
+        return rel
+
+    def _resolve(self, file: str, table: Mapping[str, list[str]]) -> tuple[list[str], list[str]]:
+        rel = self._rel(file)
+        here = posixpath.dirname(rel)
+        targets: set[str] = set()
+        tried: list[str] = []
+        for spec in self.imports[file]:
+            for key in _lookups(rel, spec):
+                tried.append(key)
+                found = table.get(key)
+                if found:
+                    # the same name in several places: prefer the importer's neighbourhood
+                    best = max(
+                        found,
+                        key=lambda f: (
+                            len(os.path.commonprefix([here, posixpath.dirname(self._rel(f))])),
+                            -len(f),
+                        ),
+                    )
+                    if best != file:
+                        targets.add(best)
+                    break
+        return sorted(targets), tried
+
+    def update(self, imports: Mapping[str, Sequence[str]]) -> dict[str, int]:
+        """Bring the graph and ranks up to date with `imports` (file -> import specs)."""
+        old_files = set(self.imports)
+        files = set(imports)
+        table: dict[str, list[str]] = {}
+        for f in sorted(files):
+            for key in _module_keys(self._rel(f)):
+                table.setdefault(key, []).append(f)
+        moved: set[str] = set()
+        for f in old_files ^ files:
+            moved.update(_module_keys(self._rel(f)))
+        for f in old_files - files:
+            self._rels.pop(f, None)
+            self.imports.pop(f, None)
+            self.edges.pop(f, None)
+            self.lookups.pop(f, None)
+        resolved = 0
+        changed = bool(old_files ^ files)
+        for f in files:
+            specs = list(imports[f])
+            if f in self.edges and specs == self.imports.get(f):
+                if not moved or moved.isdisjoint(self.lookups.get(f, ())):
+                    continue
+            self.imports[f] = specs
+            targets, tried = self._resolve(f, table)
+            resolved += 1
+            if targets != self.edges.get(f):
+                changed = True
+            self.edges[f], self.lookups[f] = targets, tried
+        iterations = 0
+        if changed or set(self.rank) != files:
+            self.rank, iterations = pagerank(sorted(files), self.edges, self.rank or None)
+        self.stats = {"files": len(files), "resolved": resolved, "iterations": iterations}
+        return self.stats
+
+    def ranked(self) -> list[str]:
+        return sorted(self.rank, key=lambda f: (-self.rank[f], f))
+
+    def summary(
+        self,
+        symbols: Mapping[str, FileIndex],
+        max_bytes: int | None = None,
+        max_tokens: int | None = None,
+    ) -> str:
+        """
+        Files by rank in three tiers, cut to fit the budget (tokens are estimated as 4
+        bytes): files with their most important symbols, further files by path only,
+        and a count of the rest. A symbol scores its file's rank halved per nesting
+        level and divided by 1 + the number of the file's symbols ahead of it, so the
+        budget goes to the key definitions of many central files rather than every
+        method of the first few.
+        """
+        budget = min(
+            max_bytes if max_bytes is not None else 1 << 62,
+            max_tokens * 4 if max_tokens is not None else 1 << 62,
+        )
+        order = self.ranked()
+        head = f"# Repo map: {len(order)} files ranked by import centrality\n"
+        left = budget - len(head.encode()) - _TAIL
+        paths = {f: f"{self._rel(f)}\n" for f in order}
+        # files past the point where their paths alone exhaust the budget cannot appear
+        reach, spent = 0, 0
+        while reach < len(order) and spent + len(paths[order[reach]]) <= left:
+            spent += len(paths[order[reach]])
+            reach += 1
+        scored = []
+        for pos, f in enumerate(order[:reach]):
+            fi = symbols.get(f)
+            for k, (depth, line, text) in enumerate(_symbol_lines(fi) if fi else ()):
+                scored.append((-self.rank[f] / (2**depth * (k + 1)), pos, line, text))
+        scored.sort()
+        chosen: dict[int, list[tuple[int, str]]] = {}
+        for _, pos, line, text in scored:
+            cost = len(text.encode()) + (0 if pos in chosen else len(paths[order[pos]]))
+            if cost <= left:
+                chosen.setdefault(pos, []).append((line, text))
+                left -= cost
+        plain: list[str] = []
+        for pos, f in enumerate(order):
+            if pos in chosen:
+                continue
+            if len(paths[f]) > left:
+                break
+            plain.append(paths[f])
+            left -= len(paths[f])
+        out = head + "".join(
+            paths[order[pos]] + "".join(text for _, text in sorted(chosen[pos]))
+            for pos in sorted(chosen)
+        )
+        if plain:
+            out += "\n## Other files\n" + "".join(plain)
+        rest = len(order) - len(chosen) - len(plain)
+        if rest:
+            out += f"(+{rest} more files)\n"
+        return out
+
+    def to_state(self) -> dict[str, Any]:
+        return {
+            "version": _STATE_VERSION,
+            "root": str(self.root),
+            "imports": self.imports,
+            "edges": self.edges,
+            "lookups": self.lookups,
+            "rank": self.rank,
+        }
+
+    @classmethod
+    def from_state(cls, state: Mapping[str, Any], root: str | Path = ".") -> RepoMap:
+        m = cls(root)
+        if state.get("version") == _STATE_VERSION and state.get("root") == str(m.root):
+            m.imports = dict(state["imports"])
+            m.edges = dict(state["edges"])
+            m.lookups = dict(state["lookups"])
+            m.rank = dict(state["rank"])
+        return m
+
+
+def _symbol_lines(fi: FileIndex) -> list[tuple[int, int, str]]:
+    """(depth, line, text) per symbol, most important first: outermost, then earliest."""
+    rows = []
+    for i in range(len(fi)):
+        sym = fi.symbol(i)
+        depth = sym.qualname.count(".")
+        rows.append((depth, sym.line, f"{'  ' * (depth + 1)}{sym.kind} {sym.name}:{sym.line}\n"))
+    rows.sort()
+    return rows
+
+
+def _state_path(root: str | Path) -> Path:
+    return Path(root) / ".codexrt" / "map.state.json"
+
+
+def load_repo_map(root: str | Path = ".") -> RepoMap:
+    """The RepoMap saved by the last summarize_repo under `root` (empty if none)."""
+    try:
+        state = json.loads(_state_path(root).read_text(encoding="utf-8"))
+        return RepoMap.from_state(state, root)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return RepoMap(root)
+
+
+def summarize_repo(
+    root: str | Path = ".",
+    max_tokens: int | None = 2048,
+    max_bytes: int | None = None,
+    index: IncrementalIndex | None = None,
+    repo_map: RepoMap | None = None,
+) -> str:
+    """
+    Ranked summary of the repo under `root` within the budget, also written to
+    .codexrt/summary.md. The graph and ranks are kept in .codexrt/map.state.json (or
+    in `repo_map` for long-lived callers) so the next call only redoes what changed.
+    """
+    if index is None:
+        index = IncrementalIndex(root)
+        try:
+            index.refresh()
+        finally:
+            index.close()
+    if repo_map is None:
+        repo_map = load_repo_map(root)
+    state = _state_path(root)
+    repo_map.update(index.deps())
+    text = repo_map.summary(index.files(), max_bytes=max_bytes, max_tokens=max_tokens)
+    state.parent.mkdir(parents=True, exist_ok=True)
+    tmp = state.with_name(f"{state.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(repo_map.to_state()), encoding="utf-8")
+    os.replace(tmp, state)
+    (state.parent / "summary.md").write_text(text, encoding="utf-8")
+    return text
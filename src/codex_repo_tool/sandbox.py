@@ -1,11 +1,16 @@
 from __future__ import annotations
 
 import shutil
-import subprocess
 import tempfile
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
 
+from . import proc
+from .tracing import span, traced
+
 
 @dataclass
 class CmdResult:
@@ -15,12 +20,155 @@ class CmdResult:
 
 
 def _run(cmd: list[str], cwd: str | None = None) -> CmdResult:
-    p = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+    p = proc.run(cmd, cwd=cwd, capture_output=True, text=True)
     return CmdResult(p.returncode == 0, p.stdout, p.stderr)
 
 
-def with_worktree(branch: str, apply_callable):
-    git_root = subprocess.run(
+def _git_root() -> Path | None:
+    p = proc.run(["git", "rev-parse", "--show-toplevel"], capture_output=True, text=True)
+    if p.returncode != 0:
+        return None
+    return Path(p.stdout.strip())
+
+
+class WorktreePool:
+    """
+    Reusable detached worktrees for one repository. `lease(branch)` hands out an idle
+    worktree reset to `branch` (checkout + reset + clean, much cheaper than
+    `worktree add` on large repos) or creates a new one; at most `size` are kept idle.
+    Thread-safe, so concurrent tasks can share one pool. `prepare(branch)` does the
+    reset (or creation) ahead of time, e.g. while a model call is in flight.
+    """
+
+    def __init__(self, size: int = 4, root: str | Path | None = None) -> None:
+        self.size = size
+        self.root = Path(root) if root else _git_root()
+        self._idle: list[Path] = []
+        self._all: list[Path] = []
+        self._fresh: dict[Path, str] = {}  # idle worktree -> commit it is clean at
+        self._lock = threading.Lock()
+
+    def _commit(self, branch: str) -> str | None:
+        res = _run(["git", "rev-parse", "--verify", "--quiet", branch], cwd=str(self.root))
+        return (res.stdout.strip() or None) if res.ok else None
+
+    def prepare(self, branch: str) -> bool:
+        """
+        Make sure the next `lease(branch)` finds an idle worktree already clean at
+        `branch`, so the lease costs one `git rev-parse` instead of a reset or a
+        `worktree add`. Returns False if no worktree could be prepared.
+        """
+        if self.root is None:
+            return False
+        commit = self._commit(branch)
+        if commit is None:
+            return False
+        path: Path | None = None
+        with self._lock:
+            if any(self._fresh.get(p) == commit for p in self._idle):
+                return True
+            if self._idle:
+                path = self._idle.pop()
+        if path is not None and not self._reset(path, commit).ok:
+            self._discard(path)
+            path = None
+        if path is None:
+            path, _ = self._create(commit)
+            if path is None:
+                return False
+        with self._lock:
+            self._fresh[path] = commit
+            self._idle.append(path)
+        return True
+
+    def _create(self, branch: str) -> tuple[Path | None, CmdResult]:
+        tmpdir = Path(tempfile.mkdtemp(prefix="codexrt-wt-"))
+        path = tmpdir / "wt"
+        with span("worktree.add", branch=branch):
+            add = _run(
+                ["git", "worktree", "add", "--detach", str(path), branch], cwd=str(self.root)
+            )
+        if not add.ok:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            return None, add
+        with self._lock:
+            self._all.append(path)
+        return path, add
+
+    @traced("worktree.reset")
+    def _reset(self, path: Path, branch: str) -> CmdResult:
+        co = _run(["git", "checkout", "--detach", "--force", branch], cwd=str(path))
+        if not co.ok:
+            return co
+        reset = _run(["git", "reset", "--hard", "--quiet"], cwd=str(path))
+        if not reset.ok:
+            return reset
+        return _run(["git", "clean", "-fdxq"], cwd=str(path))
+
+    def _discard(self, path: Path) -> None:
+        _run(["git", "worktree", "remove", "--force", str(path)], cwd=str(self.root))
+        shutil.rmtree(path.parent, ignore_errors=True)
+        with self._lock:
+            if path in self._all:
+                self._all.remove(path)
+            self._fresh.pop(path, None)
+
+    @contextmanager
+    def lease(self, branch: str) -> Iterator[tuple[Path | None, dict | None]]:
+        """Yield (path, None) on success or (None, error dict as with_worktree reports it)."""
+        if self.root is None:
+            yield None, {"error": "Not a git repository"}
+            return
+        path: Path | None = None
+        with self._lock:
+            if self._idle:
+                # a prepared worktree first (the most recently prepared one is last)
+                fresh = [p for p in self._idle if p in self._fresh]
+                path = fresh[-1] if fresh else self._idle[-1]
+                self._idle.remove(path)
+            fresh_at = self._fresh.pop(path, None) if path is not None else None
+        # resolved in the main repo: inside a worktree "HEAD" is its own old commit
+        target = self._commit(branch) or branch
+        if fresh_at is not None and fresh_at == target:
+            pass  # prepared at this very commit and untouched since
+        elif path is not None:
+            res = self._reset(path, target)
+            if not res.ok:
+                self._discard(path)
+                path = None
+        if path is None:
+            path, res = self._create(target)
+            if path is None:
+                yield None, {"stage": "worktree-add", "stdout": res.stdout, "stderr": res.stderr}
+                return
+        try:
+            yield path, None
+        finally:
+            with self._lock:
+                keep = len(self._idle) < self.size
+                if keep:
+                    self._idle.append(path)
+            if not keep:
+                self._discard(path)
+
+    def close(self) -> None:
+        with self._lock:
+            paths = list(self._all)
+            self._idle.clear()
+            self._fresh.clear()
+        for path in paths:
+            self._discard(path)
+
+
+@traced("with_worktree")
+def with_worktree(branch: str, apply_callable, pool: WorktreePool | None = None):
+    if pool is not None:
+        with pool.lease(branch) as (path, err):
+            if path is None:
+                return False, err
+            return True, apply_callable(str(path))
+
+    git_root = proc.run(
         ["git", "rev-parse", "--show-toplevel"], capture_output=True, text=True
     )
     if git_root.returncode != 0:
@@ -30,15 +178,17 @@ def with_worktree(branch: str, apply_callable):
     tmpdir = Path(tempfile.mkdtemp(prefix="codexrt-wt-"))
     worktree_path = tmpdir / "wt"
     try:
-        add = _run(
-            ["git", "worktree", "add", "--detach", str(worktree_path), branch], cwd=str(root)
-        )
+        with span("worktree.add", branch=branch):
+            add = _run(
+                ["git", "worktree", "add", "--detach", str(worktree_path), branch], cwd=str(root)
+            )
         if not add.ok:
             return False, {"stage": "worktree-add", "stdout": add.stdout, "stderr": add.stderr}
         ok, res = True, apply_callable(str(worktree_path))
         return ok, res
     finally:
-        try:
-            _run(["git", "worktree", "remove", "--force", str(worktree_path)], cwd=str(root))
-        finally:
-            shutil.rmtree(tmpdir, ignore_errors=True)
+        with span("worktree.remove"):
+            try:
+                _run(["git", "worktree", "remove", "--force", str(worktree_path)], cwd=str(root))
+            finally:
+                shutil.rmtree(tmpdir, ignore_errors=True)
@@ -1,28 +1,124 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
+from collections.abc import Generator
 from typing import Iterable, List, Dict
 
+from .metrics import scanned
+
+
+_TEXT_SUFFIXES = {".py", ".txt", ".md", ".rst"}
+
 
 def _iter_text_files(root: Path) -> Iterable[Path]:
     for p in root.rglob("*"):
-        if p.is_file() and p.suffix in {".py", ".txt", ".md", ".rst"}:
+        if p.is_file() and p.suffix in _TEXT_SUFFIXES:
             yield p
 
 
-def search_code(query: str, root: str | Path = ".") -> List[Dict[str, object]]:
+def _iter_rev_files(root: Path, rev: str, chunk: int = 256) -> Generator[tuple[Path, bytes]]:
+    from .gitobj import CatFile, tree_blobs
+
+    blobs = [(root / rel, sha) for rel, sha in tree_blobs(rev, root).items()]
+    blobs = [b for b in blobs if b[0].suffix in _TEXT_SUFFIXES]
+    with CatFile(root) as cat:
+        for i in range(0, len(blobs), chunk):
+            part = blobs[i : i + chunk]
+            for (p, _), obj in zip(part, cat.read_many([sha for _, sha in part])):
+                if obj is not None:
+                    yield p, obj[1]
+
+
+def _iter_worktree_files(root: Path) -> Generator[tuple[Path, bytes]]:
+    for file in _iter_text_files(root):
+        try:
+            yield file, file.read_bytes()
+        except OSError:
+            continue
+
+
+def search_code(
+    query: str, root: str | Path = ".", max_results: int | None = None, rev: str | None = None
+) -> List[Dict[str, object]]:
     """
     Naive text search for `query` under `root`.
-    Returns a list of hits: {'path': <file>, 'line': <1-based>, 'text': <line>}.
+    Returns a list of hits: {'path': <file>, 'line': <1-based>, 'text': <line>},
+    at most `max_results` of them when given. With `rev`, the files of that git
+    revision are searched, read from the object database in batches.
     """
     base = Path(root)
     hits: List[Dict[str, object]] = []
-    for file in _iter_text_files(base):
+    files = nbytes = 0
+    source = _iter_rev_files(base, rev) if rev else _iter_worktree_files(base)
+    try:
+        for file, raw in source:
+            files += 1
+            nbytes += len(raw)
+            for i, line in enumerate(raw.decode("utf-8", errors="ignore").splitlines(), 1):
+                if query in line:
+                    hits.append({"path": str(file), "line": i, "text": line})
+                    if max_results is not None and len(hits) >= max_results:
+                        return hits
+        return hits
+    finally:
+        source.close()  # stops cat-file when returning early
+        scanned("search", files, nbytes)
+
+
+class SearchIndex:
+    """
+    In-memory copy of the searchable text files under `root`, re-read only when a
+    file's (mtime, size) changes. Used by long-lived processes to avoid re-reading
+    the whole tree on every query.
+    """
+
+    def __init__(self, root: str | Path = ".") -> None:
+        self.root = Path(root)
+        self._files: Dict[str, tuple[int, int, List[str]]] = {}
+
+    def _load(self, p: Path) -> None:
+        key = str(p)
         try:
-            text = file.read_text(encoding="utf-8", errors="ignore")
+            st = p.stat()
         except OSError:
-            continue
-        for i, line in enumerate(text.splitlines(), 1):
-            if query in line:
-                hits.append({"path": str(file), "line": i, "text": line})
-    return hits
+            self._files.pop(key, None)
+            return
+        cur = self._files.get(key)
+        if cur and cur[0] == st.st_mtime_ns and cur[1] == st.st_size:
+            return
+        try:
+            text = p.read_text(encoding="utf-8", errors="ignore")
+        except OSError:
+            self._files.pop(key, None)
+            return
+        scanned("search", 1, st.st_size)
+        self._files[key] = (st.st_mtime_ns, st.st_size, text.splitlines())
+
+    def refresh(self) -> None:
+        seen: set[str] = set()
+        for p in _iter_text_files(self.root):
+            seen.add(str(p))
+            self._load(p)
+        for key in set(self._files) - seen:
+            del self._files[key]
+
+    def update(self, paths: Iterable[str | Path], removed_dirs: Iterable[str | Path] = ()) -> None:
+        """Re-read only `paths` and drop everything under `removed_dirs`."""
+        for d in removed_dirs:
+            prefix = str(Path(d)) + os.sep
+            for key in [k for k in self._files if k.startswith(prefix)]:
+                del self._files[key]
+        for p in map(Path, paths):
+            if p.suffix in _TEXT_SUFFIXES:
+                self._load(p)
+
+    def search(self, query: str, max_results: int | None = None) -> List[Dict[str, object]]:
+        hits: List[Dict[str, object]] = []
+        for path, (_, _, lines) in self._files.items():
+            for i, line in enumerate(lines, 1):
+                if query in line:
+                    hits.append({"path": path, "line": i, "text": line})
+                    if max_results is not None and len(hits) >= max_results:
+                        return hits
+        return hits
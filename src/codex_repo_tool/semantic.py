@@ -2,11 +2,19 @@ from __future__ import annotations
 
 import ast
 import json
+import os
 import re
-from dataclasses import asdict, dataclass
+import sqlite3
+import sys
+import threading
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
 from pathlib import Path
 
-PY_IMPORT_RE = re.compile(r"^\s*(?:from\s+([\w\.]+)\s+import\s+[\w\*]+|import\s+([\w\.]+))")
+from . import gitobj
+from .config import SETTINGS
+from .metrics import count, scanned
 
 
 @dataclass
@@ -14,53 +22,341 @@ class Symbol:
     name: str
     kind: str
     line: int
+    # dotted scope path, e.g. "Class.method"; `start`/`end` are byte offsets of the
+    # whole lines the definition spans, decorators included (None when unknown)
+    qualname: str = ""
+    end_line: int | None = None
+    start: int | None = None
+    end: int | None = None
+
+    def __post_init__(self) -> None:
+        if not self.qualname:
+            self.qualname = self.name
+
+
+KINDS = (
+    "class",
+    "function",
+    "async_function",
+    "method",
+    "async_method",
+    "interface",
+    "enum",
+    "type",
+    "namespace",
+)
+_KIND_CODE = {k: i for i, k in enumerate(KINDS)}
+_NONE = 0xFFFFFFFF  # "unknown" in the unsigned columns
+_STRIDE = 6  # kind, line, end_line, start, end, parent + 1 (0: top level)
 
 
-@dataclass
 class FileIndex:
-    symbols: list[Symbol]
-    imports: list[str]
+    """
+    Symbols of one file stored column-wise: interned names plus one flat array of
+    unsigned ints per symbol, about 32 bytes each instead of ~500 for a dict. A
+    qualified name is kept as a link to the enclosing symbol; Symbol objects and
+    dicts are only built when asked for.
+    """
+
+    __slots__ = ("names", "imports", "_cols", "_quals")
+
+    def __init__(self, symbols: Iterable[Symbol] = (), imports: Iterable[str] = ()) -> None:
+        intern = sys.intern
+        names: list[str] = []
+        cols = array("I")
+        quals: dict[int, str] = {}
+        by_qual: dict[str, int] = {}
+        for i, s in enumerate(symbols):
+            names.append(intern(s.name))
+            parent = 0
+            if s.qualname != s.name:
+                prefix = s.qualname[: -len(s.name) - 1]
+                if s.qualname.endswith("." + s.name) and prefix in by_qual:
+                    parent = by_qual[prefix] + 1
+                else:
+                    quals[i] = s.qualname  # not expressible as parent.name
+            by_qual.setdefault(s.qualname, i)
+            cols.extend(
+                (
+                    _KIND_CODE[s.kind],
+                    s.line,
+                    _NONE if s.end_line is None else s.end_line,
+                    _NONE if s.start is None else s.start,
+                    _NONE if s.end is None else s.end,
+                    parent,
+                )
+            )
+        self.names = tuple(names)
+        self.imports = [intern(m) for m in imports]
+        self._cols = cols
+        self._quals = quals or None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def qualname(self, i: int) -> str:
+        if self._quals and i in self._quals:
+            return self._quals[i]
+        parent = self._cols[i * _STRIDE + 5]
+        if not parent:
+            return self.names[i]
+        return self.qualname(parent - 1) + "." + self.names[i]
+
+    def symbol(self, i: int) -> Symbol:
+        kind, line, end_line, start, end, _ = self._cols[i * _STRIDE : (i + 1) * _STRIDE]
+        return Symbol(
+            self.names[i],
+            KINDS[kind],
+            line,
+            self.qualname(i),
+            None if end_line == _NONE else end_line,
+            None if start == _NONE else start,
+            None if end == _NONE else end,
+        )
+
+    @property
+    def symbols(self) -> list[Symbol]:
+        return [self.symbol(i) for i in range(len(self.names))]
+
+    def find(self, name: str) -> Iterator[int]:
+        """Positions of symbols whose bare or qualified name is `name`."""
+        bare = name.rpartition(".")[2]
+        for i, n in enumerate(self.names):
+            if n == bare and (n == name or self.qualname(i) == name):
+                yield i
+
+    def symbol_dict(self, i: int) -> dict:
+        kind, line, end_line, start, end, _ = self._cols[i * _STRIDE : (i + 1) * _STRIDE]
+        return {
+            "name": self.names[i],
+            "kind": KINDS[kind],
+            "line": line,
+            "qualname": self.qualname(i),
+            "end_line": None if end_line == _NONE else end_line,
+            "start": None if start == _NONE else start,
+            "end": None if end == _NONE else end,
+        }
 
+    def symbol_dicts(self) -> list[dict]:
+        """The serialized form (the fields of Symbol)."""
+        return [self.symbol_dict(i) for i in range(len(self.names))]
 
-def _parse_python(path: Path) -> FileIndex:
+    def dumps(self) -> tuple[str, bytes]:
+        """Compact form for ParseCache: names/imports/odd qualnames as JSON, columns raw."""
+        meta = [self.names, self.imports, self._quals or {}]
+        return json.dumps(meta, separators=(",", ":")), self._cols.tobytes()
+
+    @classmethod
+    def loads(cls, meta: str, cols: bytes) -> FileIndex:
+        names, imports, quals = json.loads(meta)
+        fi = cls.__new__(cls)
+        intern = sys.intern
+        fi.names = tuple(map(intern, names))
+        fi.imports = [intern(m) for m in imports]
+        fi._cols = array("I")
+        fi._cols.frombytes(cols)
+        fi._quals = {int(i): q for i, q in quals.items()} or None
+        return fi
+
+
+def _line_starts(raw: bytes) -> list[int]:
+    """Byte offset of the start of each line (index 0 is line 1), plus len(raw)."""
+    starts = [0]
+    find = raw.find
+    i = find(b"\n")
+    while i >= 0:
+        starts.append(i + 1)
+        i = find(b"\n", i + 1)
+    if starts[-1] != len(raw):
+        starts.append(len(raw))
+    return starts
+
+
+_DEF_KINDS = {
+    ast.FunctionDef: "function",
+    ast.AsyncFunctionDef: "async_function",
+    ast.ClassDef: "class",
+}
+
+
+_BLOCKS = (ast.stmt, ast.excepthandler, ast.match_case)
+
+
+def _scan_python(tree: ast.Module, starts: list[int]) -> tuple[list[Symbol], set[str]]:
+    """One walk over the statements collecting scoped definitions and imports."""
     symbols: list[Symbol] = []
     imports: set[str] = set()
-    src = path.read_text(encoding="utf-8", errors="ignore")
+    last = len(starts) - 1
+    # (node, qualified prefix, enclosing node is a class)
+    stack: list[tuple[ast.AST, str, bool]] = [(tree, "", False)]
+    while stack:
+        node, prefix, in_class = stack.pop()
+        for child in ast.iter_child_nodes(node):
+            kind = _DEF_KINDS.get(type(child))
+            if kind is None:
+                if isinstance(child, ast.Import):
+                    imports.update(alias.name for alias in child.names)
+                elif isinstance(child, ast.ImportFrom):
+                    if child.module:
+                        imports.add(child.module)
+                elif isinstance(child, _BLOCKS):
+                    # if/try/with/... bodies; expressions cannot hold definitions
+                    stack.append((child, prefix, in_class))
+                continue
+            name = child.name  # type: ignore[attr-defined]
+            if in_class and kind != "class":
+                kind = "async_method" if kind == "async_function" else "method"
+            first = min([d.lineno for d in child.decorator_list] + [child.lineno])  # type: ignore[attr-defined]
+            end_line = child.end_lineno or child.lineno
+            symbols.append(
+                Symbol(
+                    name,
+                    kind,
+                    child.lineno,
+                    prefix + name,
+                    end_line,
+                    starts[min(first - 1, last)],
+                    starts[min(end_line, last)],
+                )
+            )
+            stack.append((child, prefix + name + ".", kind == "class"))
+    symbols.sort(key=lambda s: s.start or 0)
+    return symbols, imports
+
+
+def _parse_python(path: Path, raw: bytes | None = None) -> FileIndex:
+    if raw is None:
+        raw = path.read_bytes()
+        scanned("index", 1, len(raw))
     try:
-        tree = ast.parse(src)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                symbols.append(Symbol(node.name, "function", node.lineno))
-            elif isinstance(node, ast.ClassDef):
-                symbols.append(Symbol(node.name, "class", node.lineno))
-            elif isinstance(node, ast.Import):
-                for alias in node.names:
-                    imports.add(alias.name)
-            elif isinstance(node, ast.ImportFrom):
-                if node.module:
-                    imports.add(node.module)
-    except SyntaxError:
-        pass
+        tree = ast.parse(raw)
+    except (SyntaxError, ValueError):
+        return FileIndex(symbols=[], imports=[])
+    symbols, imports = _scan_python(tree, _line_starts(raw))
     return FileIndex(symbols=symbols, imports=list(imports))
 
 
-def _parse_js_like(path: Path) -> FileIndex:
+# Declarations and static imports start a line (after indentation), so one line-anchored
+# alternation finds them without visiting every token; matching bytes keeps offsets in
+# bytes. require() and import() may appear anywhere and get their own pattern.
+_JS_DECL_RE = re.compile(
+    rb"""^(?P<indent>[ \t]*)(?=[acdefilntv])(?:  # cheap reject of lines that start otherwise
+      (?:export[ \t]+(?:default[ \t]+)?)?(?:declare[ \t]+)?(?:async[ \t]+)?function\b\s*\*?\s*(?P<fn>[\w$]+)
+    | (?:export[ \t]+(?:default[ \t]+)?)?(?:declare[ \t]+)?(?:abstract[ \t]+)?class[ \t]+(?P<cls>[\w$]+)
+    | (?:export[ \t]+)?(?:const|let|var)[ \t]+(?P<var>[\w$]+)\s*(?::[^=;\n]+)?=\s*
+      (?:async\s+)?(?:function\b|(?:\([^()]*\)|[\w$]+)\s*(?::\s*[^=;{\n]+)?=>)
+    | (?:export[ \t]+)?(?:declare[ \t]+)?(?:const[ \t]+)?
+      (?P<tkind>interface|enum|namespace|type(?=[ \t]+[\w$]+\s*[<=]))[ \t]+(?P<tname>[\w$]+)
+    | (?:import|export)\b[^;'"`()]*?\bfrom\s*['"](?P<from>[^'"\n]+)['"]
+    | import\s*['"](?P<bare>[^'"\n]+)['"]
+    )""",
+    re.M | re.X,
+)
+_JS_CALL_RE = re.compile(rb"""\b(?:import|require)\s*\(\s*['"`]([^'"`\n]+)['"`]\s*\)""")
+# Comments and string/template literals, whose contents _js_mask blanks. Regex literals
+# are not recognised; a quote in one masks at most the rest of its line.
+_JS_OPAQUE_RE = re.compile(
+    rb"""//[^\n]*|/\*.*?(?:\*/|\Z)|'(?:[^'\\\n]|\\.)*'?|"(?:[^"\\\n]|\\.)*"?|`(?:[^`\\]|\\.)*`?""",
+    re.S,
+)
+_BLANK = bytes(b if b == 0x0A else 0x20 for b in range(256))  # all but newlines to spaces
+_JS_MINIFIED_SUFFIXES = (".min.js", ".min.mjs", ".bundle.js", "-bundle.js")
+# Larger files whose lines average this many bytes or more are treated as minified.
+_JS_MINIFIED_LINE = 300
+_JS_MINIFIED_MIN_BYTES = 32 << 10
+
+
+def _js_skipped(path: Path, raw: bytes) -> bool:
+    """Minified or bundled output: slow to scan and nothing worth indexing in it."""
+    if path.name.endswith(_JS_MINIFIED_SUFFIXES):
+        return True
+    if len(raw) > SETTINGS.index_js_max_bytes:
+        return True
+    return len(raw) > _JS_MINIFIED_MIN_BYTES and len(raw) > _JS_MINIFIED_LINE * (
+        raw.count(b"\n") + 1
+    )
+
+
+def _js_body_end(raw: bytes, indent: bytes, pos: int) -> int:
+    """
+    Offset just past the line that closes the body of a definition starting at `pos`:
+    its own line if the braces there balance, else the next line that is `indent`
+    followed by "}" (formatted code closes a block at the indentation that opened it).
+    """
+    eol = raw.find(b"\n", pos)
+    eol = len(raw) if eol < 0 else eol + 1
+    opened = raw.count(b"{", pos, eol)
+    if not opened and (raw.find(b"=>", pos, eol) >= 0 or raw.find(b";", pos, eol) >= 0):
+        return eol  # expression-bodied arrow function, type alias, declaration
+    if opened and opened == raw.count(b"}", pos, eol):
+        return eol
+    close = raw.find(b"\n" + indent + b"}", pos)
+    if close < 0:
+        return eol
+    end = raw.find(b"\n", close + 1)
+    return len(raw) if end < 0 else end + 1
+
+
+def _blank_opaque(m: re.Match[bytes]) -> bytes:
+    tok = m.group()
+    if tok[:1] == b"/":
+        return tok.translate(_BLANK)
+    # keep the quotes, so a string still reads as one where the patterns expect it
+    if len(tok) > 1 and tok[-1:] == tok[:1]:
+        return tok[:1] + tok[1:-1].translate(_BLANK) + tok[-1:]
+    return tok[:1] + tok[1:].translate(_BLANK)
+
+
+def _js_mask(raw: bytes) -> bytes:
+    """
+    `raw` with comments and the contents of strings and template literals blanked to
+    spaces, newlines kept: offsets and line numbers stay the same, and code mentioned
+    in them is neither a declaration nor an import.
+    """
+    return _JS_OPAQUE_RE.sub(_blank_opaque, raw)
+
+
+def _scan_js(raw: bytes) -> tuple[list[Symbol], set[str]]:
     symbols: list[Symbol] = []
-    imports: set[str] = set()
-    src = path.read_text(encoding="utf-8", errors="ignore")
-    # naive symbol extraction
-    for i, line in enumerate(src.splitlines(), 1):
-        if line.strip().startswith("function "):
-            fn = line.strip().split()[1].split("(")[0]
-            symbols.append(Symbol(fn, "function", i))
-        if line.strip().startswith("class "):
-            cls = line.strip().split()[1].split("{")[0]
-            symbols.append(Symbol(cls, "class", i))
-        m = re.match(PY_IMPORT_RE, line)
-        if m:
-            pkg = m.group(1) or m.group(2)
-            imports.add(pkg)
-    return FileIndex(symbols=symbols, imports=list(imports))
+    code = _js_mask(raw)
+    # specifiers sit inside the blanked strings: read them from `raw` at the same offsets
+    imports = {
+        raw[m.start(1) : m.end(1)].decode("utf-8", "replace") for m in _JS_CALL_RE.finditer(code)
+    }
+    count = code.count
+    line = 1
+    pos = 0
+    for m in _JS_DECL_RE.finditer(code):
+        kind = m.lastgroup
+        if kind in ("from", "bare"):
+            imports.add(raw[m.start(kind) : m.end(kind)].decode("utf-8", "replace"))
+            continue
+        start = m.start()
+        line += count(b"\n", pos, start)
+        pos = start
+        if kind == "cls":
+            name, sym_kind = m.group("cls"), "class"
+        elif kind == "tname":
+            name, sym_kind = m.group("tname"), m.group("tkind").decode()
+        else:  # function declaration, or a function expression / arrow function assigned
+            name, sym_kind = m.group("fn") or m.group("var"), "function"
+        end = _js_body_end(code, m.group("indent"), start)
+        text = name.decode("utf-8", "replace")
+        symbols.append(
+            Symbol(text, sym_kind, line, text, line + count(b"\n", start, end - 1), start, end)
+        )
+    return symbols, imports
+
+
+def _parse_js_like(path: Path, raw: bytes | None = None) -> FileIndex:
+    if raw is None:
+        raw = path.read_bytes()
+        scanned("index", 1, len(raw))
+    if _js_skipped(path, raw):
+        scanned("index.skipped", 1, len(raw))
+        return FileIndex(symbols=[], imports=[])
+    symbols, imports = _scan_js(raw)
+    return FileIndex(symbols=symbols, imports=sorted(imports))
 
 
 def _should_index(p: Path) -> bool:
@@ -68,40 +364,439 @@ def _should_index(p: Path) -> bool:
     return suf in {".py", ".js", ".jsx", ".ts", ".tsx"}
 
 
-def build_index(root: str = ".") -> dict[str, dict]:
-    """Return per-file indices with symbols+imports and a dependency adjacency list."""
-    root_path = Path(root)
-    per_file: dict[str, FileIndex] = {}
-    for p in root_path.rglob("*"):
-        if _should_index(p):
-            fi = _parse_python(p) if p.suffix == ".py" else _parse_js_like(p)
-            per_file[str(p)] = fi
-        else:
-            continue
-    # Build deps map (file->imports) in a normalized way
-    deps: dict[str, list[str]] = {f: fi.imports for f, fi in per_file.items()}
+def _parse_file(p: Path, raw: bytes | None = None) -> FileIndex:
+    return _parse_python(p, raw) if p.suffix == ".py" else _parse_js_like(p, raw)
+
+
+# Bump when a parser's output changes: cached results of older parsers are then ignored.
+_PARSER_VERSION = 2
+
+
+def _parser_tag(p: Path) -> str | None:
+    """ParseCache namespace of the parser `p` needs; None for files that are never parsed."""
+    if p.suffix == ".py":
+        return f"py{_PARSER_VERSION}"
+    if p.name.endswith(_JS_MINIFIED_SUFFIXES):
+        return None
+    return f"js{_PARSER_VERSION}.{SETTINGS.index_js_max_bytes}"
+
+
+class ParseCache:
+    """
+    Parse results keyed by blob SHA and parser, in one SQLite file. Blobs never change,
+    so entries never go stale and every index pointing at the same file (branches,
+    worktrees, clones) shares them; deleting it is always safe. Errors (locked, read-only,
+    corrupt) turn the cache off for this process instead of failing the index.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._broken = False
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(
+                str(self.path), timeout=5, isolation_level=None, check_same_thread=False
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS parsed"
+                " (key TEXT PRIMARY KEY, meta TEXT NOT NULL, cols BLOB NOT NULL) WITHOUT ROWID"
+            )
+            self._db = db
+        return self._db
+
+    def get_many(self, keys: list[str]) -> dict[str, FileIndex]:
+        out: dict[str, FileIndex] = {}
+        with self._lock:
+            if self._broken:
+                return out
+            try:
+                db = self._conn()
+                for i in range(0, len(keys), 500):
+                    chunk = keys[i : i + 500]
+                    marks = ",".join("?" * len(chunk))
+                    q = f"SELECT key, meta, cols FROM parsed WHERE key IN ({marks})"
+                    for key, meta, cols in db.execute(q, chunk):
+                        out[key] = FileIndex.loads(meta, cols)
+            except (OSError, sqlite3.Error, ValueError):
+                self._broken = True
+        return out
+
+    def put_many(self, entries: dict[str, FileIndex]) -> None:
+        if not entries:
+            return
+        with self._lock:
+            if self._broken:
+                return
+            try:
+                db = self._conn()
+                db.execute("BEGIN")
+                db.executemany(
+                    "INSERT OR REPLACE INTO parsed VALUES (?, ?, ?)",
+                    [(key, *fi.dumps()) for key, fi in entries.items()],
+                )
+                db.execute("COMMIT")
+            except (OSError, sqlite3.Error):
+                self._broken = True
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_CACHES: dict[str, ParseCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def default_parse_cache() -> ParseCache | None:
+    """The ParseCache named by SETTINGS.parse_cache (one per file per process), or None."""
+    if SETTINGS.parse_cache.lower() in ("off", "0", "false", "no"):
+        return None
+    path = os.path.abspath(
+        SETTINGS.parse_cache or Path(SETTINGS.tmp_dir) / "cache" / "parse.sqlite"
+    )
+    with _CACHES_LOCK:
+        if path not in _CACHES:
+            _CACHES[path] = ParseCache(path)
+        return _CACHES[path]
+
+
+class IncrementalIndex:
+    """
+    In-memory index that re-parses only files whose (mtime, size) changed since the
+    last refresh. Long-lived processes (the daemon) keep one per root.
+
+    Inside a git work tree (`source` "auto" or "git"; see SETTINGS.index_source) files
+    are enumerated with `git ls-files` and unmodified ones are read from the object
+    database through one long-lived `git cat-file --batch`. Either way parse results
+    are looked up in `cache` by blob SHA first, so content seen before (on another
+    branch, in another worktree or clone) is not parsed again. `cache=False` disables
+    it; True uses default_parse_cache().
+
+    With `rev` the index is of that git revision instead of the working tree, read
+    entirely from the object database (its entries have no mtime/size). Refreshing
+    after the revision moves, or switching to a sibling branch through the shared
+    cache, only parses the blobs that differ.
+    """
+
+    def __init__(
+        self,
+        root: str | Path = ".",
+        source: str | None = None,
+        cache: ParseCache | bool = True,
+        rev: str | None = None,
+    ) -> None:
+        self.root = Path(root)
+        self.source = source or SETTINGS.index_source
+        self.cache = default_parse_cache() if cache is True else (cache or None)
+        self.rev = rev
+        self._files: dict[str, tuple[int | None, int | None, FileIndex]] = {}
+        self._blobs: dict[str, str] = {}  # file -> SHA of the content it was parsed from
+        self._cat: gitobj.CatFile | None = None
+
+    def _drop(self, key: str) -> None:
+        self._files.pop(key, None)
+        self._blobs.pop(key, None)
+
+    def _changed(self, p: Path) -> os.stat_result | None:
+        """Stat `p`: None if it is unchanged since it was parsed (or gone, then dropped)."""
+        key = str(p)
+        try:
+            st = p.stat()
+        except OSError:
+            self._drop(key)
+            return None
+        cur = self._files.get(key)
+        if cur and cur[0] == st.st_mtime_ns and cur[1] == st.st_size:
+            return None
+        return st
+
+    def _blob_reader(self) -> gitobj.CatFile:
+        if self._cat is None:
+            self._cat = gitobj.CatFile(self.root)
+        return self._cat
+
+    def _load(self, todo: list[tuple[Path, os.stat_result | None, str | None]]) -> int:
+        """
+        Index files given as (path, stat, blob SHA or None to read it from disk): from
+        the cache where possible, else parsed from git's copy or the disk's. Without a
+        stat (a revision's files) only git's copy is used. Returns the number of
+        entries (re)loaded.
+        """
+        jobs: list[tuple[Path, os.stat_result | None, str, str]] = []  # + sha, cache key
+        raws: dict[str, bytes] = {}
+        for p, st, sha in todo:
+            tag = _parser_tag(p)
+            if tag is None:
+                scanned("index.skipped", 1, st.st_size if st else 0)
+                self._files[str(p)] = (*_stamp(st), FileIndex())
+                continue
+            if sha is None:
+                try:
+                    raw = p.read_bytes()
+                except OSError:
+                    self._drop(str(p))
+                    continue
+                scanned("index", 1, len(raw))
+                sha = gitobj.blob_sha(raw)
+                raws[sha] = raw
+            jobs.append((p, st, sha, f"{sha}:{tag}"))
+        if not jobs:
+            return len(todo)
+        hits = self.cache.get_many([j[3] for j in jobs]) if self.cache else {}
+        count("index.cache_hits", len(hits))
+        need = sorted({sha for _, _, sha, key in jobs if key not in hits and sha not in raws})
+        if need:
+            try:
+                blobs = self._blob_reader().read_many(need)
+            except OSError:
+                blobs = [None] * len(need)
+            for sha, obj in zip(need, blobs):
+                if obj is not None and obj[0] == "blob":
+                    scanned("index", 1, len(obj[1]))
+                    raws[sha] = obj[1]
+        parsed: dict[str, FileIndex] = {}
+        for p, st, sha, key in jobs:
+            fi = hits[key] if key in hits else parsed.get(key)
+            if fi is None:
+                raw = raws.get(sha)
+                if st is None and raw is None:
+                    self._drop(str(p))  # listed in the tree but unreadable
+                    continue
+                if st is not None and (raw is None or len(raw) != st.st_size):
+                    # not in git after all, or checked out with conversion (CRLF, filters):
+                    # the offsets must match the file on disk
+                    try:
+                        raw = p.read_bytes()
+                    except OSError:
+                        self._drop(str(p))
+                        continue
+                    scanned("index", 1, len(raw))
+                fi = parsed[key] = _parse_file(p, raw)
+            self._files[str(p)] = (*_stamp(st), fi)
+            self._blobs[str(p)] = sha
+        count("index.parsed", len(parsed))
+        if self.cache:
+            self.cache.put_many(parsed)
+        return len(todo)
+
+    def _refresh_git(self, listing: Mapping[str, str | None]) -> int:
+        seen: set[str] = set()
+        todo: list[tuple[Path, os.stat_result | None, str | None]] = []
+        for rel, sha in listing.items():
+            p = self.root / rel
+            if not _should_index(p):
+                continue
+            key = str(p)
+            seen.add(key)
+            if sha is None:
+                st = self._changed(p)
+                if st is not None:
+                    todo.append((p, st, None))
+            elif self._blobs.get(key) == sha:
+                continue  # same content as last time
+            elif self.rev is not None:
+                todo.append((p, None, sha))  # nothing on disk to compare with
+            else:
+                st = _stat(p)
+                if st is None:
+                    self._drop(key)
+                else:
+                    todo.append((p, st, sha))
+        for key in set(self._files) - seen:
+            self._drop(key)
+        return self._load(todo)
+
+    def refresh(self) -> int:
+        """Walk the tree and re-parse changed files. Returns the number parsed."""
+        if self.rev is not None:
+            return self._refresh_git(gitobj.tree_blobs(self.rev, self.root))
+        if self.source != "fs":
+            listing = gitobj.worktree_blobs(self.root)
+            if listing is not None:
+                return self._refresh_git(listing)
+        seen: set[str] = set()
+        todo: list[tuple[Path, os.stat_result, str | None]] = []
+        for p in self.root.rglob("*"):
+            if _should_index(p):
+                seen.add(str(p))
+                st = self._changed(p)
+                if st is not None:
+                    todo.append((p, st, None))
+        for key in set(self._files) - seen:
+            self._drop(key)
+        return self._load(todo)
+
+    def update(self, paths: Iterable[str | Path], removed_dirs: Iterable[str | Path] = ()) -> int:
+        """
+        Re-check only `paths` (e.g. from a file watcher) and drop everything under
+        `removed_dirs`. Returns the number parsed.
+        """
+        for d in removed_dirs:
+            prefix = str(Path(d)) + os.sep
+            for key in [k for k in self._files if k.startswith(prefix)]:
+                self._drop(key)
+        todo: list[tuple[Path, os.stat_result, str | None]] = []
+        for p in map(Path, paths):
+            if _should_index(p):
+                st = self._changed(p)
+                if st is not None:
+                    todo.append((p, st, None))
+        return self._load(todo)
+
+    def close(self) -> None:
+        """Stop the cat-file process, if one was started."""
+        if self._cat is not None:
+            self._cat.close()
+            self._cat = None
+
+    def find(self, name: str) -> list[dict]:
+        """find_symbol without building the dict form of the whole index."""
+        return [
+            {"file": f, **fi.symbol_dict(i)}
+            for f, (_, _, fi) in self._files.items()
+            for i in fi.find(name)
+        ]
+
+    def stamp(self, file: str) -> tuple[int | None, int | None] | None:
+        """(mtime_ns, size) of `file` when it was parsed."""
+        cur = self._files.get(file)
+        return (cur[0], cur[1]) if cur else None
+
+    def files(self) -> dict[str, FileIndex]:
+        return {f: fi for f, (_, _, fi) in self._files.items()}
+
+    def deps(self) -> dict[str, list[str]]:
+        return {f: list(fi.imports) for f, (_, _, fi) in self._files.items()}
+
+    def to_dict(self) -> dict[str, dict]:
+        return {
+            "files": {
+                f: _file_entry(fi, mtime_ns, size)
+                for f, (mtime_ns, size, fi) in self._files.items()
+            },
+            "deps": self.deps(),
+        }
+
+
+def _stamp(st: os.stat_result | None) -> tuple[int | None, int | None]:
+    return (st.st_mtime_ns, st.st_size) if st is not None else (None, None)
+
+
+def _stat(p: Path) -> os.stat_result | None:
+    try:
+        return p.stat()
+    except OSError:
+        return None
+
+
+def _file_entry(fi: FileIndex, mtime_ns: int | None, size: int | None) -> dict:
+    # mtime/size let readers of the symbol offsets notice that the file has changed
     return {
-        "files": {
-            f: {"symbols": [asdict(s) for s in fi.symbols], "imports": fi.imports}
-            for f, fi in per_file.items()
-        },
-        "deps": deps,
+        "symbols": fi.symbol_dicts(),
+        "imports": list(fi.imports),
+        "mtime_ns": mtime_ns,
+        "size": size,
     }
 
 
-def find_symbol(name: str, index: dict) -> list[dict]:
+def build_index(root: str = ".", rev: str | None = None) -> dict[str, dict]:
+    """
+    Return per-file indices with symbols+imports and a dependency adjacency list, of
+    the working tree or (with `rev`) of a git revision without checking it out.
+    """
+    idx = IncrementalIndex(root, rev=rev)
+    try:
+        idx.refresh()
+    finally:
+        idx.close()
+    return idx.to_dict()
+
+
+def find_symbol(name: str, index: dict | IncrementalIndex) -> list[dict]:
+    """Symbols whose bare name or qualified name (e.g. "Class.method") is `name`."""
+    if isinstance(index, IncrementalIndex):
+        return index.find(name)
+    # every match has the last dotted part as its bare name: one comparison rejects
+    # the rest without looking up their qualname
+    bare = name.rpartition(".")[2]
     out: list[dict] = []
     for f, data in index.get("files", {}).items():
-        for s in data.get("symbols", []):
-            if s["name"] == name:
+        for s in data.get("symbols", ()):
+            if s["name"] == bare and (bare == name or s.get("qualname") == name):
                 out.append({"file": f, **s})
     return out
 
 
-def dependency_graph(root_or_index: str | Path | dict = ".") -> dict[str, list[str]]:
+def _read_span(path: str, start: int, end: int) -> str:
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        data = fh.read(end - start)
+    scanned("index", 0, len(data))
+    return data.decode("utf-8", errors="replace")
+
+
+def symbol_source(
+    name: str,
+    index: dict | IncrementalIndex | None = None,
+    root: str = ".",
+    file: str | None = None,
+) -> list[dict]:
+    """
+    Matches of `name` (as in find_symbol) with their "source": only the definition's
+    byte span is read from disk. With `file` just that file is parsed; otherwise
+    `index` (default: build_index(root)) is searched. Files that changed since they
+    were indexed are re-parsed first. "source" is None for symbols without offsets.
+    """
+    if file is not None:
+        index = IncrementalIndex(Path(file).parent)
+        index.update([file])
+    elif index is None:
+        index = IncrementalIndex(root)
+        index.refresh()
+    if isinstance(index, IncrementalIndex):
+        stamp = index.stamp
+    else:
+        files = index.get("files", {})
+
+        def stamp(f: str) -> tuple[int | None, int | None] | None:
+            return files[f].get("mtime_ns"), files[f].get("size")
+
+    out: list[dict] = []
+    for hit in find_symbol(name, index):
+        p = Path(hit["file"])
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        if (st.st_mtime_ns, st.st_size) != stamp(hit["file"]):
+            fi = _parse_file(p)
+            fresh = [i for i in fi.find(hit["qualname"]) if fi.qualname(i) == hit["qualname"]]
+            if not fresh:
+                continue  # gone since it was indexed
+            hit = {"file": hit["file"], **fi.symbol_dict(fresh[0])}
+        if hit.get("start") is None or hit.get("end") is None:
+            out.append({**hit, "source": None})
+            continue
+        out.append({**hit, "source": _read_span(hit["file"], hit["start"], hit["end"])})
+    return out
+
+
+def dependency_graph(
+    root_or_index: str | Path | dict | IncrementalIndex = ".",
+) -> dict[str, list[str]]:
     """
     Accept either a root path (str/Path) OR a precomputed index dict as returned by build_index().
     """
+    if isinstance(root_or_index, IncrementalIndex):
+        return root_or_index.deps()
     if isinstance(root_or_index, dict):
         return root_or_index.get("deps", {})
     idx = build_index(str(root_or_index))
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from .config import SETTINGS
+from .diffsplit import diff_paths
+from .metrics import METRICS
+
+STATUSES = ("pending", "checking", "applied", "failed", "discarded")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    body TEXT NOT NULL,
+    result TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_status ON entries (status, updated);
+CREATE INDEX IF NOT EXISTS entries_updated ON entries (updated);
+CREATE TABLE IF NOT EXISTS targets (
+    file TEXT NOT NULL,
+    id TEXT NOT NULL REFERENCES entries (id) ON DELETE CASCADE,
+    PRIMARY KEY (file, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS targets_id ON targets (id);
+"""
+
+
+def _targets(items: Iterable[dict]) -> set[str]:
+    files: set[str] = set()
+    for item in items:
+        if item.get("file"):
+            files.add(item["file"])
+        files |= diff_paths(item.get("diff", ""))
+    return files
+
+
+class PatchStore:
+    """
+    Proposed patches and bundles in one SQLite file in WAL mode, so any number of
+    threads and processes on a host can propose, list and validate at once: readers
+    never wait for the writer and writes are short transactions. Every entry has a
+    unique ID ("patch_..." or "bundle_..."), a status (see STATUSES), and the files it
+    touches in an indexed table. Entries not updated for `ttl` seconds are removed by
+    `gc`, which the default store runs once per process.
+    """
+
+    def __init__(self, path: str | Path | None = None, ttl: float = SETTINGS.store_ttl) -> None:
+        self.path = Path(path) if path else Path(SETTINGS.tmp_dir) / "store.sqlite"
+        self.ttl = ttl
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(
+                str(self.path), timeout=30, isolation_level=None, check_same_thread=False
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            db = self._conn()
+            # IMMEDIATE takes the write lock up front, so concurrent writers queue on the
+            # busy timeout instead of failing to upgrade a read transaction
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def _add(self, kind: str, body: dict[str, Any], files: set[str]) -> str:
+        now = time.time()
+        text = json.dumps(body)
+        with self._write() as db:
+            while True:
+                entry_id = f"{kind}_{uuid.uuid4().hex[:12]}"
+                try:
+                    db.execute(
+                        "INSERT INTO entries VALUES (?, ?, 'pending', ?, ?, ?, NULL)",
+                        (entry_id, kind, now, now, text),
+                    )
+                    break
+                except sqlite3.IntegrityError:
+                    continue  # ID collision: draw again
+            db.executemany(
+                "INSERT INTO targets VALUES (?, ?)", [(f, entry_id) for f in sorted(files)]
+            )
+        METRICS.count(f"store.{kind}_added")
+        return entry_id
+
+    def add_patch(self, file: str, diff: str, description: str = "") -> str:
+        body = {"file": file, "diff": diff, "description": description}
+        return self._add("patch", body, _targets([body]))
+
+    def add_bundle(self, items: list[dict]) -> str:
+        return self._add("bundle", {"items": items}, _targets(items))
+
+    def get(self, entry_id: str) -> dict[str, Any] | None:
+        """The entry with its body fields ("file"/"diff"/... or "items"), or None."""
+        with self._lock:
+            db = self._conn()
+            row = db.execute(
+                "SELECT id, kind, status, created, updated, body, result FROM entries WHERE id = ?",
+                (entry_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            files = [f for (f,) in db.execute("SELECT file FROM targets WHERE id = ?", (entry_id,))]
+        entry = self._meta(row)
+        entry["files"] = sorted(files)
+        entry.update(json.loads(row[5]))
+        return entry
+
+    @staticmethod
+    def _meta(row: tuple) -> dict[str, Any]:
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "created": row[3],
+            "updated": row[4],
+            "result": json.loads(row[6]) if row[6] else None,
+        }
+
+    def find(
+        self, file: str | None = None, status: str | None = None, kind: str | None = None
+    ) -> list[dict[str, Any]]:
+        """Entries (without bodies) touching `file` / with `status` / of `kind`, oldest first."""
+        where, args = [], []
+        if file is not None:
+            where.append("id IN (SELECT id FROM targets WHERE file = ?)")
+            args.append(file)
+        if status is not None:
+            where.append("status = ?")
+            args.append(status)
+        if kind is not None:
+            where.append("kind = ?")
+            args.append(kind)
+        q = "SELECT id, kind, status, created, updated, NULL, result FROM entries"
+        if where:
+            q += " WHERE " + " AND ".join(where)
+        with self._lock:
+            rows = self._conn().execute(q + " ORDER BY created, id", args).fetchall()
+        return [self._meta(row) for row in rows]
+
+    def set_status(self, entry_id: str, status: str, result: dict | None = None) -> bool:
+        """Move an entry to `status` (recording `result` if given); False if it is gone."""
+        if status not in STATUSES:
+            raise ValueError(f"unknown status {status!r}; expected one of {STATUSES}")
+        text = json.dumps(result, default=str) if result is not None else None
+        with self._write() as db:
+            cur = db.execute(
+                "UPDATE entries SET status = ?, updated = ?, result = coalesce(?, result)"
+                " WHERE id = ?",
+                (status, time.time(), text, entry_id),
+            )
+        return cur.rowcount == 1
+
+    def claim_pending(self, kind: str | None = None) -> list[dict[str, Any]]:
+        """
+        Atomically move every pending entry (of `kind`) to "checking" and return them
+        with their bodies, oldest first; concurrent claimers never get the same entry.
+        """
+        q = "SELECT id, kind, status, created, updated, body, result FROM entries"
+        q += " WHERE status = 'pending'" + (" AND kind = ?" if kind else "")
+        with self._write() as db:
+            rows = db.execute(q + " ORDER BY created, id", (kind,) if kind else ()).fetchall()
+            now = time.time()
+            db.executemany(
+                "UPDATE entries SET status = 'checking', updated = ? WHERE id = ?",
+                [(now, row[0]) for row in rows],
+            )
+        out = []
+        for row in rows:
+            entry = self._meta(row)
+            entry.update(status="checking", updated=now, **json.loads(row[5]))
+            out.append(entry)
+        return out
+
+    def delete(self, entry_id: str) -> bool:
+        with self._write() as db:
+            cur = db.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+        return cur.rowcount == 1
+
+    def gc(self, ttl: float | None = None) -> int:
+        """Delete entries not updated for `ttl` (default self.ttl) seconds. Returns count."""
+        cutoff = time.time() - (self.ttl if ttl is None else ttl)
+        with self._write() as db:
+            cur = db.execute("DELETE FROM entries WHERE updated < ?", (cutoff,))
+        if cur.rowcount:
+            METRICS.count("store.gc_removed", cur.rowcount)
+        return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_STORES: dict[str, PatchStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def default_store() -> PatchStore:
+    """The store under SETTINGS.tmp_dir (one per directory per process), collected on open."""
+    path = (Path(SETTINGS.tmp_dir) / "store.sqlite").absolute()
+    with _STORES_LOCK:
+        store = _STORES.get(str(path))
+        if store is None:
+            store = _STORES[str(path)] = PatchStore(path)
+            store.gc()
+    return store
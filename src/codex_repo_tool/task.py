@@ -1,13 +1,25 @@
 from __future__ import annotations
 
+import hashlib
+import os
 import re
+from concurrent.futures import Future, wait
 from dataclasses import dataclass
+from functools import partial
 from typing import Callable, Dict, Any
 
-from .github_api import open_pull_request
-from .model_adapter import get_diff
-from .patch import apply_bundle, propose_bundle
+import requests
+
+from .candidates import default_candidates, run_candidates
+from .diffsplit import diff_items
+from .github_api import open_pull_request, repo_metadata
+from .model_adapter import DiffRejected, get_diff
+from .patch import apply_bundle, propose_bundle, publish_items, validate_items
+from .pipeline import Pipeline
 from .playbooks import select_playbook
+from .qa import detect_toolchain
+from .sandbox import WorktreePool
+from .tracing import span
 
 
 @dataclass
@@ -17,20 +29,118 @@ class TaskParams:
     model: str | None = None
 
 
-_DIFF_NEW_FILE_RE = re.compile(r"^\+\+\+ b/(.+)$")
+def _items_from_diff(diff: str, goal: str) -> list[dict]:
+    """
+    One bundle item per file section of the diff. Text with no file header at all
+    becomes a single README.md item, which fails the dry run like any bad diff.
+    """
+    return diff_items(diff, goal) or [{"file": "README.md", "diff": diff, "description": goal}]
+
+
+def _head_branch(goal: str, diff: str) -> str:
+    """
+    Default PR head: a slug of the goal plus a digest of the diff. A rerun of the same
+    change pushes to the same branch again (see _open_pr) and so updates its PR.
+    """
+    slug = re.sub(r"[^a-z0-9]+", "-", goal.lower()).strip("-")[:40].strip("-") or "task"
+    return f"codexrt/auto/{slug}-{hashlib.sha1(diff.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _prefetch_pr(pipe: Pipeline) -> Future | None:
+    # without credentials there is no PR to open; nothing worth fetching
+    if os.getenv("GITHUB_TOKEN") and os.getenv("GITHUB_REPO"):
+        return pipe.start("pr.prepare", repo_metadata)
+    return None
 
 
-def _targets_from_diff(diff: str) -> list[str]:
+def _open_pr(
+    goal: str,
+    diff: str,
+    items: list[dict],
+    head: str | None,
+    branch: str,
+    pool: WorktreePool,
+    pipe: Pipeline,
+    prefetched: Future | None,
+) -> Dict[str, Any]:
     """
-    Extract target file paths from unified diff headers ('+++ b/<path>').
-    If none found, default to README.md (keeps tests happy for simple flows).
+    Push the validated items as branch `head` and open a PR from it. The generated
+    default head is ours to overwrite, and a PR already open from it is reused; a
+    caller-named branch is only created or fast-forwarded. Failures are reported, not
+    raised: the validated change must still reach the caller.
     """
-    targets: list[str] = []
-    for line in diff.splitlines():
-        m = _DIFF_NEW_FILE_RE.match(line.strip())
-        if m:
-            targets.append(m.group(1))
-    return targets or ["README.md"]
+    generated = head is None
+    head = head or _head_branch(goal, diff)
+    if prefetched is None:
+        error = "GITHUB_TOKEN and GITHUB_REPO must be set"
+        return {"ok": False, "stage": "pr", "error": error, "branch": head}
+    try:
+        # joined before pushing: a failed lookup must not leave a branch without its PR
+        meta = prefetched.result()
+    except (requests.RequestException, ValueError, RuntimeError) as e:
+        # RuntimeError: GraphQL errors (see github_api._graphql)
+        return {"ok": False, "stage": "pr", "error": f"{type(e).__name__}: {e}", "branch": head}
+    base = None if "DEFAULT_BRANCH" in os.environ else meta.get("default_branch")
+    with pipe.stage("pr.publish", head=head):
+        pushed = publish_items(items, head, goal, branch, pool, replace=generated)
+    if not pushed["ok"]:
+        return {**pushed, "branch": head}
+    try:
+        with pipe.stage("pr"):
+            pr = open_pull_request(head, goal, goal, base=base, existing_ok=True)
+    except (requests.RequestException, ValueError) as e:
+        # the branch is pushed: a rerun replaces it and opens (or reuses) the PR
+        return {"ok": False, "stage": "pr", "error": f"{type(e).__name__}: {e}", "branch": head}
+    return {"ok": True, **pr}
+
+
+def _run_candidates(
+    goal: str,
+    context: Dict[str, str],
+    branch: str,
+    auto_pr: bool,
+    head: str | None,
+    ask_model_for_diff: Callable[[str, Dict[str, str]], str] | None,
+    model: str | None,
+    n: int,
+    cache: bool | None,
+    pool: WorktreePool,
+    pipe: Pipeline,
+) -> Dict[str, Any]:
+    if ask_model_for_diff:
+
+        def generate(g: str, ctx: Dict[str, str], _model: str | None, _temp: float) -> str:
+            return ask_model_for_diff(g, ctx)
+    else:
+        generate = partial(get_diff, cache=cache)
+
+    prefetched = _prefetch_pr(pipe) if auto_pr else None
+    with pipe.stage("candidates", n=n):
+        found = run_candidates(
+            goal,
+            context,
+            default_candidates(n, model),
+            lambda diff: validate_items(_items_from_diff(diff, goal), branch, pool),
+            generate,
+        )
+    out: Dict[str, Any] = {
+        "ok": found["ok"],
+        "branch": branch,
+        **found["result"],
+        "candidates": found["attempts"],
+    }
+    if not found["ok"]:
+        out.setdefault("stage", found["stage"])
+        if not found["result"]:
+            out["reason"] = "no-diff"
+        return out
+    out["candidate"] = found["candidate"]
+    if auto_pr:
+        diff = found["diff"]
+        out["pr"] = _open_pr(
+            goal, diff, _items_from_diff(diff, goal), head, branch, pool, pipe, prefetched
+        )
+    return out
 
 
 def run(
@@ -38,38 +148,156 @@ def run(
     auto_pr: bool = False,
     ask_model_for_diff: Callable[[str, Dict[str, str]], str] | None = None,
     model: str | None = None,
+    candidates: int = 1,
+    cache: bool | None = None,
+    context: Dict[str, str] | None = None,
+    pool: WorktreePool | None = None,
+    branch: str | None = None,
 ) -> Dict[str, Any]:
     """
     Orchestrate a single task:
     - choose playbook (hook)
     - obtain diff (via injected callable or model_adapter.get_diff)
     - wrap into a bundle and apply it
-    - optionally open a PR
+    - optionally push it as `branch` and open a PR from it
+
+    With candidates > 1, that many diffs are requested concurrently (spread over
+    temperatures) and the first one that validates in its sandbox wins. `cache` is passed
+    to get_diff (None: CODEXRT_MODEL_CACHE decides, False: bypass). `context` is the
+    {filename: content} map handed to the model and `pool` an optional shared
+    WorktreePool (both supplied by the batch runner). With `auto_pr`, the validated
+    change is committed on top of HEAD and pushed to origin as `branch` (default
+    codexrt/auto/<goal slug>-<diff digest>); the PR targets the repository's default
+    branch, or DEFAULT_BRANCH if set. Without GITHUB_TOKEN/GITHUB_REPO nothing is
+    pushed and "pr" reports the error.
+
+    Independent work is pipelined: the sandbox worktree is prepared and the QA
+    toolchain probed while the model call is in flight, and with `auto_pr` the
+    repository metadata for the PR is fetched while the bundle is validated.
 
-    Returns a dict including an "ok" boolean (required by tests).
+    Returns a dict including an "ok" boolean (required by tests), "timings", the
+    milliseconds spent per stage (see tracing.span), and "pipeline", how long each
+    pipelined stage ran and how much of that overlapped other stages (see
+    pipeline.Pipeline.report). "ok" says whether the change validated; with `auto_pr`
+    the PR outcome is reported separately as "pr", with its own "ok" (and "stage",
+    "error" and "branch" when pushing or opening the PR failed), so a failed PR never
+    hides a validated change.
     """
-    _ = select_playbook(goal)  # retained hook
+    with span("task.run", goal=goal, candidates=candidates) as s:
+        out = _run(
+            goal, auto_pr, branch, ask_model_for_diff, model, candidates, cache, context, pool
+        )
+    out["timings"] = s.timings()
+    return out
+
+
+def _run(
+    goal: str,
+    auto_pr: bool,
+    head: str | None,
+    ask_model_for_diff: Callable[[str, Dict[str, str]], str] | None,
+    model: str | None,
+    candidates: int,
+    cache: bool | None,
+    context: Dict[str, str] | None,
+    pool: WorktreePool | None,
+) -> Dict[str, Any]:
+    with span("playbook"):
+        _ = select_playbook(goal)  # retained hook
 
     # In this implementation we always apply against the current HEAD via worktree.
     branch = "HEAD"
 
-    context: Dict[str, str] = {}
-    diff = ask_model_for_diff(goal, context) if ask_model_for_diff else get_diff(goal, context, model)
+    context = context if context is not None else {}
+    sandbox = pool if pool is not None else WorktreePool(size=1)
+    pipe = Pipeline()
+    try:
+        prepared = pipe.start("sandbox.prepare", sandbox.prepare, branch)
+        pipe.start("toolchain.detect", detect_toolchain)
+        if candidates > 1:
+            out = _run_candidates(
+                goal,
+                context,
+                branch,
+                auto_pr,
+                head,
+                ask_model_for_diff,
+                model,
+                candidates,
+                cache,
+                sandbox,
+                pipe,
+            )
+        else:
+            out = _run_one(
+                goal,
+                context,
+                branch,
+                auto_pr,
+                head,
+                ask_model_for_diff,
+                model,
+                cache,
+                sandbox,
+                pipe,
+                prepared,
+            )
+    finally:
+        pipe.close()
+        if pool is None:
+            sandbox.close()
+    out["pipeline"] = pipe.report()
+    return out
+
+
+def _run_one(
+    goal: str,
+    context: Dict[str, str],
+    branch: str,
+    auto_pr: bool,
+    head: str | None,
+    ask_model_for_diff: Callable[[str, Dict[str, str]], str] | None,
+    model: str | None,
+    cache: bool | None,
+    pool: WorktreePool,
+    pipe: Pipeline,
+    prepared: Future,
+) -> Dict[str, Any]:
+    try:
+        with pipe.stage("model", model=model):
+            if ask_model_for_diff:
+                diff = ask_model_for_diff(goal, context)
+            elif cache is None:
+                diff = get_diff(goal, context, model)
+            else:
+                diff = get_diff(goal, context, model, cache=cache)
+    except DiffRejected as e:
+        # streaming mode: a file section failed `git apply --check` mid-generation
+        return {
+            "ok": False,
+            "stage": "dry-run",
+            "branch": branch,
+            "file": e.file,
+            "stderr": e.stderr,
+        }
     if not isinstance(diff, str) or not diff.strip():
         # Tests expect "stage" to be "plan" when there's nothing to do.
         return {"ok": False, "stage": "plan", "branch": branch, "reason": "no-diff"}
 
-    targets = _targets_from_diff(diff)
-    items = [{"file": t, "diff": diff, "description": goal} for t in targets]
-
-    bid = propose_bundle(items)
-    res = apply_bundle(bid, branch=branch)
+    prefetched = _prefetch_pr(pipe) if auto_pr else None
+    items = _items_from_diff(diff, goal)
+    with pipe.stage("bundle.propose"):
+        bid = propose_bundle(items)
+    # the lease must find the prepared worktree, not race it and create another
+    wait([prepared])
+    with pipe.stage("validate"):
+        res = apply_bundle(bid, branch=branch, pool=pool)
+    res.pop("timings", None)  # reported for the whole task below
 
     ok = bool(res.get("applied"))
     out: Dict[str, Any] = {"ok": ok, "branch": branch, **res}
 
     if ok and auto_pr:
-        pr = open_pull_request(title=goal)
-        out["pr"] = pr
+        out["pr"] = _open_pr(goal, diff, items, head, branch, pool, pipe, prefetched)
 
     return out
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Trace:
+    """Finished spans of one operation. Thread-safe: candidates add spans concurrently."""
+
+    def __init__(self) -> None:
+        self.trace_id = os.urandom(16).hex()
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+    )
+
+    def __init__(self, name: str, trace: Trace, parent_id: str | None, attrs: dict) -> None:
+        self.name = name
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attrs
+        self.error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set(self, **attrs: Any) -> None:
+        self.attributes.update(attrs)
+
+    def timings(self) -> dict[str, float]:
+        """Milliseconds per span name for this span and everything under it (summed)."""
+        with self.trace._lock:
+            spans = list(self.trace.spans)
+        children: dict[str | None, list[Span]] = {}
+        for s in spans:
+            children.setdefault(s.parent_id, []).append(s)
+        out: dict[str, float] = {}
+        stack = [self]
+        while stack:
+            s = stack.pop()
+            if s.end_ns:
+                out[s.name] = round(out.get(s.name, 0.0) + s.duration_ms, 3)
+            stack += children.get(s.span_id, [])
+        return out
+
+
+_CURRENT: ContextVar[Span | None] = ContextVar("codexrt_span", default=None)
+
+
+def current_span() -> Span | None:
+    return _CURRENT.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    """
+    Time a stage. Nests under the current span (per thread/task context); without one
+    it starts a new trace, so any instrumented entry point can report its own timings.
+    """
+    parent = _CURRENT.get()
+    trace = parent.trace if parent else Trace()
+    s = Span(name, trace, parent.span_id if parent else None, attrs)
+    t0 = time.perf_counter_ns()
+    token = _CURRENT.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _CURRENT.reset(token)
+        s.end_ns = s.start_ns + (time.perf_counter_ns() - t0)
+        trace.add(s)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator form of `span`."""
+
+    def deco(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return deco
+
+
+def _attr(key: str, value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        v: dict[str, Any] = {"boolValue": value}
+    elif isinstance(value, int):
+        v = {"intValue": str(value)}  # OTLP/JSON encodes 64-bit ints as strings
+    elif isinstance(value, float):
+        v = {"doubleValue": value}
+    else:
+        v = {"stringValue": str(value)}
+    return {"key": key, "value": v}
+
+
+def to_otlp(trace: Trace, service: str = "codexrt") -> dict[str, Any]:
+    """The trace in the OTLP/JSON layout (ExportTraceServiceRequest)."""
+    spans = []
+    with trace._lock:
+        finished = list(trace.spans)
+    for s in sorted(finished, key=lambda s: s.start_ns):
+        item: dict[str, Any] = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [_attr(k, v) for k, v in s.attributes.items() if v is not None],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        spans.append(item)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [_attr("service.name", service)]},
+                "scopeSpans": [{"scope": {"name": "codex_repo_tool"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def write_otlp(trace: Trace, path: str | Path) -> str:
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_text(json.dumps(to_otlp(trace)), encoding="utf-8")
+    return str(p)
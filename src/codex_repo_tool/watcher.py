@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Directories whose contents never feed an index. .codexrt matters most: the daemon
+# writes the repo map there, which would otherwise trigger itself.
+IGNORED_DIRS = frozenset({".git", ".codexrt", "__pycache__"})
+
+# inotify(7)
+_IN_MODIFY = 0x2
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ONLYDIR = 0x1000000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+    | _IN_ONLYDIR
+)
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; followed by `len` bytes of name
+
+
+@dataclass
+class Changes:
+    """One coalesced batch of filesystem changes under a watched root."""
+
+    paths: set[Path] = field(default_factory=set)  # files created, modified or deleted
+    dirs: set[Path] = field(default_factory=set)  # directories deleted or moved away
+    overflow: bool = False  # events were lost; consumers should rescan everything
+
+    def __bool__(self) -> bool:
+        return bool(self.paths or self.dirs or self.overflow)
+
+
+def _load_libc() -> ctypes.CDLL | None:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def _walk(root: Path):
+    """Yield (dir, files) for `root` and its subdirectories, skipping IGNORED_DIRS."""
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        files: list[Path] = []
+        try:
+            with os.scandir(d) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        if e.name not in IGNORED_DIRS:
+                            stack.append(d / e.name)
+                    else:
+                        files.append(d / e.name)
+        except OSError:
+            continue
+        yield d, files
+
+
+def _snapshot(root: Path) -> dict[Path, tuple[int, int]]:
+    snap: dict[Path, tuple[int, int]] = {}
+    for _, files in _walk(root):
+        for f in files:
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            snap[f] = (st.st_mtime_ns, st.st_size)
+    return snap
+
+
+class Watcher:
+    """
+    Watch `root` in a background thread and deliver coalesced `Changes` to `on_change`.
+
+    Uses inotify on Linux and falls back to polling (every `poll_interval` seconds)
+    elsewhere or when inotify watches run out. Events are held until the tree has been
+    quiet for `debounce` seconds (at most `max_delay`), so a `git checkout` touching
+    thousands of files arrives as one batch. `fresh_as_of` is a wall-clock watermark:
+    every change made before it has been delivered. `sync()` advances it on demand.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        on_change: Callable[[Changes], None],
+        *,
+        debounce: float = 0.05,
+        max_delay: float = 1.0,
+        poll_interval: float = 1.0,
+        backend: str | None = None,
+    ) -> None:
+        self.root = Path(root)
+        self.on_change = on_change
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.backend = backend or os.environ.get("CODEXRT_WATCH_BACKEND") or "auto"
+        self.fresh_as_of = 0.0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._fd = -1
+        self._wake_r = self._wake_w = -1
+        self._wds: dict[int, Path] = {}
+        self._sync_requested = False
+
+    # lifecycle -------------------------------------------------------------------
+    def start(self) -> Watcher:
+        started = time.time()
+        if self.backend in ("auto", "inotify") and self._start_inotify():
+            self.backend = "inotify"
+            target = self._run_inotify
+        else:
+            self.backend = "poll"
+            self._snap = _snapshot(self.root)
+            target = self._run_poll
+        self._publish(started)
+        self._thread = threading.Thread(target=target, name="codexrt-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake()
+        if self._thread:
+            self._thread.join()
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            if fd >= 0:
+                os.close(fd)
+        self._fd = self._wake_r = self._wake_w = -1
+
+    @property
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def sync(self, timeout: float = 1.0) -> bool:
+        """
+        Deliver everything that changed before now. With inotify this is a wakeup and
+        a read of the event queue, never a tree scan; with polling it returns at once
+        and staleness is bounded by `poll_interval`. Returns True if fresh.
+        """
+        target = time.time()
+        if self.backend != "inotify":
+            return self.fresh_as_of >= target
+        with self._cond:
+            self._sync_requested = True
+        self._wake()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.fresh_as_of < target and self.alive:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(left)
+        return self.fresh_as_of >= target
+
+    # shared ------------------------------------------------------------------------
+    def _wake(self) -> None:
+        if self._wake_w >= 0:
+            try:
+                os.write(self._wake_w, b"x")
+            except OSError:
+                pass
+
+    def _publish(self, as_of: float) -> None:
+        with self._cond:
+            self.fresh_as_of = max(self.fresh_as_of, as_of)
+            self._cond.notify_all()
+
+    def _deliver(self, changes: Changes) -> None:
+        try:
+            self.on_change(changes)
+        except Exception as e:  # a failing consumer must not kill the watcher
+            print(f"codexrt watcher: on_change failed: {e!r}", file=sys.stderr)
+
+    # inotify -----------------------------------------------------------------------
+    def _start_inotify(self) -> bool:
+        libc = _load_libc()
+        if libc is None:
+            return False
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return False
+        self._libc, self._fd = libc, fd
+        for d, _ in _walk(self.root):
+            if not self._add_watch(d):
+                os.close(fd)
+                self._fd = -1
+                self._wds.clear()
+                return False  # ENOSPC: out of watches, poll instead
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        return True
+
+    def _add_watch(self, d: Path) -> bool:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(d), _WATCH_MASK)
+        if wd < 0:
+            # the directory may already be gone again; only exhaustion is fatal
+            return ctypes.get_errno() not in (errno.ENOSPC, errno.EMFILE)
+        self._wds[wd] = d
+        return True
+
+    def _read_events(self, changes: Changes) -> int:
+        count = 0
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return count
+            off = 0
+            while off + _EVENT.size <= len(buf):
+                wd, mask, _cookie, n = _EVENT.unpack_from(buf, off)
+                name = buf[off + _EVENT.size : off + _EVENT.size + n].rstrip(b"\0")
+                off += _EVENT.size + n
+                count += 1
+                self._on_event(wd, mask, os.fsdecode(name), changes)
+
+    def _on_event(self, wd: int, mask: int, name: str, changes: Changes) -> None:
+        if mask & _IN_Q_OVERFLOW:
+            changes.overflow = True
+            return
+        if mask & _IN_IGNORED:
+            self._wds.pop(wd, None)
+            return
+        base = self._wds.get(wd)
+        if base is None or not name:
+            return  # *_SELF events; the parent reports the removal
+        path = base / name
+        if not mask & _IN_ISDIR:
+            changes.paths.add(path)
+        elif name in IGNORED_DIRS:
+            return
+        elif mask & (_IN_CREATE | _IN_MOVED_TO):
+            # a directory appeared (mkdir -p, git checkout, mv): watch it and report
+            # what is already inside, since those files raised no events of their own
+            for d, files in _walk(path):
+                self._add_watch(d)
+                changes.paths.update(files)
+        elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+            changes.dirs.add(path)
+
+    def _run_inotify(self) -> None:
+        pending = Changes()
+        first = last = 0.0
+        while not self._stop.is_set():
+            timeout = None
+            if pending:
+                now = time.monotonic()
+                timeout = max(0.0, min(last + self.debounce, first + self.max_delay) - now)
+            try:
+                ready, _, _ = select.select([self._fd, self._wake_r], [], [], timeout)
+            except OSError:
+                break
+            if self._stop.is_set():
+                break
+            if self._wake_r in ready:
+                try:
+                    os.read(self._wake_r, 4096)
+                except BlockingIOError:
+                    pass
+            with self._cond:
+                forced, self._sync_requested = self._sync_requested, False
+            # Everything changed before `drained_at` is in the kernel queue by now, so
+            # after this read it is either pending or delivered.
+            drained_at = time.time()
+            had = bool(pending)
+            got = self._read_events(pending)
+            now = time.monotonic()
+            if pending and not had:
+                first = now
+            if got:
+                last = now
+            if pending and (forced or now >= min(last + self.debounce, first + self.max_delay)):
+                batch, pending = pending, Changes()
+                self._deliver(batch)
+            if not pending:
+                self._publish(drained_at)
+
+    # polling -----------------------------------------------------------------------
+    def _run_poll(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            scanned_at = time.time()
+            snap = _snapshot(self.root)
+            changed = {p for p, sig in snap.items() if self._snap.get(p) != sig}
+            changed.update(p for p in self._snap if p not in snap)
+            self._snap = snap
+            if changed:
+                self._deliver(Changes(paths=changed))
+            self._publish(scanned_at)
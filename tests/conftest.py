@@ -1,5 +1,86 @@
+import json
+import os
 import pathlib
 import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT / "src"))
+# the shared parse cache defaults to ./.codexrt: keep the suite out of the checkout
+os.environ.setdefault(
+    "CODEXRT_PARSE_CACHE", os.path.join(tempfile.mkdtemp(prefix="codexrt-test-"), "parse.sqlite")
+)
+
+
+class StubServer:
+    """
+    Local stand-in HTTP server. Queue responses with `add(status, body, headers)`;
+    each request pops the next one (the last is repeated). Requests are recorded.
+    """
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+        self.handler = None  # optional callable(method, path, headers, body) -> response tuple
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                stub.requests.append(
+                    {
+                        "method": self.command,
+                        "path": self.path,
+                        "headers": dict(self.headers),
+                        "body": raw,
+                        "client": self.client_address,
+                    }
+                )
+                if stub.handler is not None:
+                    status, body, headers = stub.handler(self.command, self.path, self.headers, raw)
+                elif len(stub.responses) > 1:
+                    status, body, headers = stub.responses.pop(0)
+                else:
+                    status, body, headers = stub.responses[0]
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = do_PUT = _serve
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    def add(self, status=200, body=None, headers=None):
+        self.responses.append((status, {} if body is None else body, headers or {}))
+        return self
+
+
+@pytest.fixture
+def http_stub():
+    from codex_repo_tool import http_client
+
+    stub = StubServer()
+    stub.thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+    http_client.close_sessions()
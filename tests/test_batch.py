@@ -0,0 +1,124 @@
+import io
+import json
+import subprocess
+import threading
+import time
+from functools import partial
+
+from codex_repo_tool.batch import goal_context, load_goals, run_batch
+from codex_repo_tool.sandbox import WorktreePool
+from codex_repo_tool.task import run as run_task
+
+
+def _git_repo(path):
+    path.mkdir(exist_ok=True)
+    subprocess.run(["git", "init", "-q"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.email", "t@example.com"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.name", "T"], cwd=path, check=True)
+    (path / "a.txt").write_text("a\n", encoding="utf-8")
+    subprocess.run(["git", "add", "a.txt"], cwd=path, check=True)
+    subprocess.run(["git", "commit", "-qm", "init"], cwd=path, check=True)
+
+
+def _goals(path, n):
+    lines = [json.dumps({"id": f"g{i}", "goal": f"goal {i}"}) for i in range(n)]
+    lines.append(json.dumps("plain string goal"))
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def test_load_goals(tmp_path):
+    _goals(tmp_path / "g.jsonl", 2)
+    goals = load_goals(tmp_path / "g.jsonl")
+    assert [g["id"] for g in goals] == ["g0", "g1", "goal-3"]
+
+
+def test_invalid_lines_fail_without_stopping_the_batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    lines = ['{"id": "x", "model": "m"}', "42", "[1]", "{oops", '"fine"', '{"goal": 7}']
+    (tmp_path / "g.jsonl").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    goals = load_goals(tmp_path / "g.jsonl")
+    assert [g["id"] for g in goals] == ["x", "goal-2", "goal-3", "goal-4", "goal-5", "goal-6"]
+    assert goals[1]["error"] == "line 2: expected a string or an object"
+
+    buf = io.StringIO()
+    summary = run_batch(tmp_path / "g.jsonl", workers=2, out=buf, runner=lambda **kw: {"ok": True})
+    assert summary == {"total": 6, "skipped": 0, "ok": 1, "failed": 5}
+    results = {r["id"]: r for r in map(json.loads, buf.getvalue().splitlines())}
+    assert results["goal-5"] == {"id": "goal-5", "goal": "fine", "ok": True}
+    assert results["x"]["stage"] == "input" and results["x"]["goal"] is None
+    assert results["goal-4"]["error"].startswith("line 4: invalid JSON")
+
+
+def test_run_batch_bounded_streaming_and_resume(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _goals(tmp_path / "g.jsonl", 5)
+    lock = threading.Lock()
+    active = {"now": 0, "max": 0}
+
+    def runner(goal, **kw):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.02)
+        with lock:
+            active["now"] -= 1
+        assert kw["pool"] is not None
+        return {"ok": goal != "goal 3", "stage": "done"}
+
+    out = io.StringIO()
+    ckpt = tmp_path / "ckpt.jsonl"
+    summary = run_batch(tmp_path / "g.jsonl", 2, out, ckpt, runner=runner)
+    assert summary == {"total": 6, "skipped": 0, "ok": 5, "failed": 1}
+    assert active["max"] <= 2
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert sorted(r["id"] for r in rows) == ["g0", "g1", "g2", "g3", "g4", "goal-6"]
+
+    # simulate a crash that lost the tail of the run: only two goals checkpointed
+    ckpt.write_text("\n".join(ckpt.read_text().splitlines()[:2]) + "\n{torn", encoding="utf-8")
+    out2 = io.StringIO()
+    summary = run_batch(tmp_path / "g.jsonl", 2, out2, ckpt, runner=runner)
+    assert summary["skipped"] == 2
+    assert len(out2.getvalue().splitlines()) == 4
+
+
+def test_goal_context_uses_shared_index(tmp_path):
+    (tmp_path / "helpers.py").write_text("def slugify(x):\n    return x\n", encoding="utf-8")
+    (tmp_path / "other.py").write_text("def unrelated():\n    pass\n", encoding="utf-8")
+    from codex_repo_tool.semantic import build_index
+
+    ctx = goal_context("Make slugify handle unicode", build_index(str(tmp_path)))
+    assert list(ctx) == [str(tmp_path / "helpers.py")]
+
+
+def test_worktree_pool_reuses_and_cleans(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    _git_repo(repo)
+    monkeypatch.chdir(repo)
+    pool = WorktreePool(size=1)
+    with pool.lease("HEAD") as (first, err):
+        assert err is None
+        (first / "junk.txt").write_text("x", encoding="utf-8")
+        (first / "a.txt").write_text("dirty\n", encoding="utf-8")
+    with pool.lease("HEAD") as (second, err):
+        assert second == first
+        assert not (second / "junk.txt").exists()
+        assert (second / "a.txt").read_text(encoding="utf-8") == "a\n"
+    pool.close()
+    assert not first.exists()
+
+
+def test_run_batch_with_real_tasks(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    _git_repo(repo)
+    monkeypatch.chdir(repo)
+    ok = {"ok": True, "stdout": "", "stderr": "", "code": 0}
+    monkeypatch.setattr("codex_repo_tool.patch.lint_code", lambda **kw: ok)
+    monkeypatch.setattr("codex_repo_tool.patch.run_tests", lambda **kw: ok)
+    diff = "--- a/a.txt\n+++ b/a.txt\n@@ -1 +1 @@\n-a\n+b\n"
+    _goals(tmp_path / "g.jsonl", 3)
+    out = io.StringIO()
+    runner = partial(run_task, ask_model_for_diff=lambda g, c: diff)
+    summary = run_batch(tmp_path / "g.jsonl", 2, out, runner=runner)
+    assert summary["ok"] == 4
+    worktrees = subprocess.run(["git", "worktree", "list"], capture_output=True, text=True)
+    assert len(worktrees.stdout.splitlines()) == 1  # pool cleaned up
@@ -0,0 +1,86 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.run import BENCHES, compare, main, save_baseline  # noqa: E402
+from benchmarks.synth import SynthConfig, generate  # noqa: E402
+
+SMALL = SynthConfig(files=60, commits=2, per_dir=10, fanout=3)
+
+
+def _tree(root):
+    return {
+        str(p.relative_to(root)): p.read_text(encoding="utf-8")
+        for p in sorted(root.rglob("*"))
+        if p.is_file() and ".git" not in p.parts
+    }
+
+
+def _head(root):
+    out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True)
+    return out.stdout.strip()
+
+
+def test_generator_is_deterministic(tmp_path):
+    a = generate(tmp_path / "a", SMALL)
+    b = generate(tmp_path / "b", SMALL)
+    assert _tree(tmp_path / "a") == _tree(tmp_path / "b")
+    assert _head(tmp_path / "a") == _head(tmp_path / "b") != ""
+    assert sum(a.by_lang.values()) == 60 and a.symbols == b.symbols
+    assert len(list((tmp_path / "a" / "src").rglob("*.py"))) == a.by_lang["py"]
+    generate(tmp_path / "c", SynthConfig(files=60, commits=0, seed=1))
+    assert _tree(tmp_path / "c") != _tree(tmp_path / "a")
+    assert not (tmp_path / "c" / ".git").exists()
+
+
+def test_compare_flags_regressions():
+    report = {
+        "meta": {"config": "cfg"},
+        "results": {"a": {"min": 2.0}, "b": {"min": 1.0}, "c": {"min": 0.5}, "d": {"min": 1.0}},
+    }
+    baseline = {
+        "configs": {"cfg": {"results": {"a": {"min": 1.0}, "b": {"min": 1.1}, "c": {"min": 1.0}}}}
+    }
+    status = {r["name"]: r["status"] for r in compare(report, baseline, 0.25)}
+    assert status == {"a": "regression", "b": "ok", "c": "improvement", "d": "new"}
+
+
+def test_cli_end_to_end(tmp_path, capsys):
+    out, base = tmp_path / "r.json", tmp_path / "base.json"
+    argv = ["--files", "40", "--commits", "2", "--repeat", "1", "--workdir", str(tmp_path / "w")]
+    argv += ["--out", str(out), "--baseline", str(base)]
+    assert main(argv + ["--save-baseline"]) == 0
+    report = json.loads(out.read_text())
+    assert set(report["results"]) == {
+        "build_index",
+        "build_index_cached",
+        "find_symbol",
+        "parse_js",
+        "search_code",
+        "list_files",
+        "read_file",
+        "apply_bundle",
+    }
+    # a baseline that is 1000x faster than reality must be flagged
+    data = json.loads(base.read_text())
+    for r in data["configs"][report["meta"]["config"]]["results"].values():
+        r["min"] /= 1000
+    base.write_text(json.dumps(data))
+    assert main(argv + ["--only", "list_files"]) == 1
+    save_baseline(report, base)
+    assert json.loads(base.read_text())["configs"][report["meta"]["config"]] == report
+    # a partial run (--only) updates its own entries and keeps the others
+    partial = {**report, "results": {"list_files": {"min": 1.0}}}
+    save_baseline(partial, base)
+    saved = json.loads(base.read_text())["configs"][report["meta"]["config"]]["results"]
+    assert saved == {**report["results"], "list_files": {"min": 1.0}}
+
+
+def test_checked_in_baseline_covers_every_benchmark():
+    data = json.loads((ROOT / "benchmarks" / "baseline.json").read_text(encoding="utf-8"))
+    for config, entry in data["configs"].items():
+        assert set(entry["results"]) == set(BENCHES), config
@@ -2,6 +2,7 @@ import subprocess
 from unittest import mock
 
 from codex_repo_tool.patch import apply_bundle, propose_bundle
+from codex_repo_tool.store import default_store
 
 
 @mock.patch("codex_repo_tool.patch.with_worktree")
@@ -52,14 +53,44 @@ def test_bundle_qa_failure_returns_details(tmp_path, monkeypatch):
     bid = propose_bundle([{"file": "a.txt", "diff": diff, "description": ""}])
     monkeypatch.setattr(
         "codex_repo_tool.patch.lint_code",
-        lambda: {"ok": False, "stdout": "", "stderr": "lint fail", "code": 1},
+        lambda **kw: {"ok": False, "stdout": "", "stderr": "lint fail", "code": 1},
     )
     monkeypatch.setattr(
         "codex_repo_tool.patch.run_tests",
-        lambda: {"ok": False, "stdout": "", "stderr": "test fail", "code": 1},
+        lambda **kw: {"ok": False, "stdout": "", "stderr": "test fail", "code": 1},
     )
     res = apply_bundle(bid, branch="HEAD")
     assert res["applied"] is False
     assert res["stage"] == "qa"
     assert res["lint"]["stderr"] == "lint fail"
     assert res["tests"]["stderr"] == "test fail"
+
+
+@mock.patch("codex_repo_tool.patch.with_worktree")
+def test_policy_refuses_before_worktree(mock_wt, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "policy.yaml").write_text("allowed: ['src/**']\n", encoding="utf-8")
+    diff = (
+        "diff --git a/src/a.py b/lib/a.py\nrename from src/a.py\nrename to lib/a.py\n"
+        "--- a/.git/hooks/pre-commit\n+++ b/.git/hooks/pre-commit\n@@ -1 +1 @@\n-x\n+y\n"
+    )
+    bid = propose_bundle([{"file": "src/a.py", "diff": diff, "description": ""}])
+    res = apply_bundle(bid, branch="HEAD")
+    assert res["stage"] == "policy"
+    assert res["error"] == "Protected path: .git/hooks/pre-commit"
+    assert "Path not allowed: lib/a.py" in res["violations"]
+    mock_wt.assert_not_called()
+
+
+@mock.patch("codex_repo_tool.patch.with_worktree")
+def test_bundles_are_distinct_and_track_status(mock_wt, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    mock_wt.return_value = (True, {"applied": True, "stage": "done"})
+    items = [{"file": "a.txt", "diff": "--- a/a.txt\n+++ b/a.txt\n", "description": ""}]
+    first, second = propose_bundle(items), propose_bundle(items)
+    assert first != second
+    apply_bundle(first, branch="HEAD")
+    store = default_store()
+    assert store.get(first)["status"] == "applied"
+    assert store.get(first)["result"]["stage"] == "done"
+    assert [e["id"] for e in store.find(file="a.txt", status="pending")] == [second]
@@ -0,0 +1,111 @@
+import threading
+import time
+
+from codex_repo_tool.candidates import Candidate, default_candidates, run_candidates
+from codex_repo_tool.task import run
+
+GOOD = "--- a/a.txt\n+++ b/a.txt\n@@ -1 +1 @@\n-a\n+b\n"
+BAD = "--- a/a.txt\n+++ b/a.txt\n@@ -1 +1 @@\n-zzz\n+b\n"
+
+
+def test_default_candidates_spread():
+    cands = default_candidates(3, "m")
+    assert [c.temperature for c in cands] == [0.0, 0.5, 1.0]
+    assert all(c.model == "m" for c in cands)
+    assert default_candidates(1) == [Candidate(None, 0.0)]
+
+
+def test_first_valid_wins_and_rest_cancelled():
+    validated = []
+    lock = threading.Lock()
+
+    def generate(goal, ctx, model, temperature):
+        # the "bad" candidate arrives first, the slow one last
+        time.sleep({0.0: 0.01, 0.5: 0.05, 1.0: 0.5}[temperature])
+        return BAD if temperature == 0.0 else GOOD
+
+    def validate(diff):
+        with lock:
+            validated.append(diff)
+        return {"applied": diff == GOOD, "stage": "done" if diff == GOOD else "dry-run"}
+
+    start = time.monotonic()
+    out = run_candidates("g", {}, default_candidates(3), validate, generate)
+    elapsed = time.monotonic() - start
+    assert out["ok"] is True
+    assert out["candidate"]["temperature"] == 0.5
+    assert out["diff"] == GOOD
+    assert elapsed < 0.4  # did not wait for the slowest candidate
+    time.sleep(0.6)
+    assert len(validated) == 2  # slowest never reached the sandbox
+
+
+def test_all_candidates_fail():
+    out = run_candidates(
+        "g",
+        {},
+        default_candidates(2),
+        lambda d: {"applied": False, "stage": "qa"},
+        lambda g, c, m, t: BAD,
+    )
+    assert out["ok"] is False
+    assert out["stage"] == "qa"
+    assert len(out["attempts"]) == 2
+
+
+def test_task_run_with_candidates(monkeypatch):
+    seen = []
+
+    def fake_validate(items, branch="HEAD", pool=None):
+        seen.append(items[0]["diff"])
+        return {"applied": items[0]["diff"] == GOOD, "stage": "done"}
+
+    monkeypatch.setattr("codex_repo_tool.task.validate_items", fake_validate)
+    answers = iter([GOOD, BAD, BAD])
+    res = run(goal="x", ask_model_for_diff=lambda g, c: next(answers), candidates=3)
+    assert res["ok"] is True
+    assert res["stage"] == "done"
+    assert len(res["candidates"]) >= 1
+
+
+def test_task_run_candidates_no_diff():
+    res = run(goal="x", ask_model_for_diff=lambda g, c: "", candidates=2)
+    assert res["ok"] is False
+    assert res["stage"] == "plan"
+    assert res["reason"] == "no-diff"
+
+
+def test_candidate_that_breaks_lint_is_rejected(tmp_path, monkeypatch):
+    import subprocess
+
+    from codex_repo_tool.patch import validate_items
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    for args in (["init", "-q"], ["config", "user.email", "t@e.com"], ["config", "user.name", "T"]):
+        subprocess.run(["git", *args], cwd=repo, check=True)
+    (repo / "ruff.toml").write_text("", encoding="utf-8")
+    (repo / "m.py").write_text("x = 1\n", encoding="utf-8")
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    subprocess.run(["git", "commit", "-qm", "init"], cwd=repo, check=True)
+    monkeypatch.chdir(repo)
+    monkeypatch.setattr("codex_repo_tool.qa._docker_enabled", lambda: False)
+    broken = "--- a/m.py\n+++ b/m.py\n@@ -1 +1 @@\n-x = 1\n+x = undefined_name\n"
+    fixed = "--- a/m.py\n+++ b/m.py\n@@ -1 +1 @@\n-x = 1\n+x = 2\n"
+
+    def generate(goal, ctx, model, temperature):
+        # the broken candidate arrives first; lint has to run on its worktree to catch it
+        time.sleep(0.0 if temperature == 0.0 else 0.3)
+        return broken if temperature == 0.0 else fixed
+
+    results = {}
+
+    def validate(diff):
+        results[diff] = validate_items([{"file": "m.py", "diff": diff}], "HEAD")
+        return results[diff]
+
+    out = run_candidates("g", {}, default_candidates(2), validate, generate)
+    assert out["ok"] is True and out["diff"] == fixed
+    assert results[broken]["stage"] == "qa"
+    assert "undefined_name" in results[broken]["lint"]["stdout"]
+    assert (repo / "m.py").read_text() == "x = 1\n"  # the main checkout is untouched
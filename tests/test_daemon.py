@@ -0,0 +1,165 @@
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from codex_repo_tool.cli import main
+from codex_repo_tool.daemon import DaemonError, make_server, try_call
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "d.sock"
+    server = make_server(path, workers=1)
+    t = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05})
+    t.start()
+    monkeypatch.setenv("CODEXRT_SOCKET", str(path))
+    yield server
+    server.shutdown()
+    t.join()
+    server.server_close()
+
+
+def test_daemon_serves_and_keeps_index_warm(daemon, tmp_path):
+    (tmp_path / "m.py").write_text("def foo():\n    pass\n", encoding="utf-8")
+    found, res = try_call("symbol", {"name": "foo", "root": "."})
+    assert found is True
+    assert res[0]["name"] == "foo"
+    assert len(daemon.warm._trees) == 1
+
+    (tmp_path / "m.py").write_text("def bar():\n    pass\n", encoding="utf-8")
+    found, res = try_call("symbol", {"name": "bar", "root": "."})
+    assert res and res[0]["name"] == "bar"
+    found, res = try_call("symbol-source", {"name": "bar", "root": ".", "file": None})
+    assert found and res[0]["source"] == "def bar():\n    pass\n"
+
+
+def test_cli_uses_daemon_when_present(daemon, tmp_path, monkeypatch, capsys):
+    (tmp_path / "notes.md").write_text("needle here\n", encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["codexrt", "search", "needle"])
+    main()
+    hits = json.loads(capsys.readouterr().out)
+    assert hits[0]["line"] == 1
+    assert daemon.warm.tree(".").searched
+
+    monkeypatch.setattr(sys, "argv", ["codexrt", "cat", "notes.md"])
+    main()
+    assert capsys.readouterr().out == "needle here\n\n"
+
+
+def test_watched_queries_skip_the_tree_scan(daemon, tmp_path, monkeypatch):
+    from codex_repo_tool.semantic import IncrementalIndex
+
+    (tmp_path / "m.py").write_text("def foo():\n    pass\n", encoding="utf-8")
+    try_call("index", {"root": "."})
+    tree = daemon.warm.tree(".")
+    if tree.watcher.backend != "inotify":
+        pytest.skip("inotify not available")
+
+    def no_scan(self):
+        raise AssertionError("full refresh while the watcher is live")
+
+    monkeypatch.setattr(IncrementalIndex, "refresh", no_scan)
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "n.py").write_text("class Bar:\n    pass\n", encoding="utf-8")
+    (tmp_path / "m.py").unlink()
+    found, res = try_call("symbol", {"name": "Bar", "root": "."})
+    assert res[0]["file"] == str(Path("pkg") / "n.py")
+    assert try_call("symbol", {"name": "foo", "root": "."}) == (True, [])
+    found, status = try_call("ping", {})
+    assert status["trees"][str(tmp_path)]["backend"] == "inotify"
+
+
+def test_fallbacks(daemon, tmp_path, monkeypatch):
+    other = tmp_path / "elsewhere"
+    other.mkdir()
+    monkeypatch.chdir(other)
+    assert try_call("ls", {"path": ".", "pattern": None}) == (False, None)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CODEXRT_NO_DAEMON", "1")
+    assert try_call("ls", {"path": ".", "pattern": None}) == (False, None)
+
+    # the daemon would run with its own credentials and model settings
+    monkeypatch.delenv("CODEXRT_NO_DAEMON")
+    assert try_call("ls", {"path": ".", "pattern": None})[0] is True
+    for name in ("GITHUB_TOKEN", "MODEL_PROVIDER", "CODEXRT_MODEL_CACHE", "MODEL_STREAM"):
+        with monkeypatch.context() as m:
+            m.setenv(name, "client-only")
+            assert try_call("ls", {"path": ".", "pattern": None}) == (False, None), name
+
+
+def test_errors_are_reported(daemon):
+    with pytest.raises(DaemonError):
+        try_call("cat", {"path": "missing.txt", "start": None, "end": None})
+
+
+def test_failing_command_is_not_rerun_in_process(daemon, monkeypatch):
+    calls = []
+
+    def bad_json(**kw):
+        calls.append(kw)
+        raise json.JSONDecodeError("Expecting value", "<html>", 0)  # a ValueError
+
+    monkeypatch.setattr("codex_repo_tool.task.run", bad_json)
+    monkeypatch.setattr(sys, "argv", ["codexrt", "run", "goal"])
+    with pytest.raises(DaemonError, match="JSONDecodeError"):
+        main()
+    assert len(calls) == 1
+    # only a command the daemon does not know falls back
+    assert try_call("no-such-command", {}) == (False, None)
+
+
+def test_daemon_forwards_every_run_option(daemon, monkeypatch, capsys):
+    from codex_repo_tool.cli import build_parser
+
+    sub = next(a for a in build_parser()._actions if a.dest == "cmd")
+    options = {a.dest for a in sub.choices["run"]._actions if a.dest != "help"}
+    seen = []
+    monkeypatch.setattr("codex_repo_tool.task.run", lambda **kw: seen.append(kw) or {"ok": True})
+    argv = ["run", "goal", "--auto-pr", "--branch", "feature/x", "--model", "m"]
+    monkeypatch.setattr(sys, "argv", ["codexrt", *argv, "--candidates", "3", "--no-cache"])
+    main()
+    assert json.loads(capsys.readouterr().out) == {"ok": True}
+    assert seen[0]["pool"] is daemon.warm.pool  # served by the daemon
+    assert {k: seen[0][k] for k in options} == {
+        "goal": "goal",
+        "auto_pr": True,
+        "branch": "feature/x",
+        "model": "m",
+        "candidates": 3,
+        "cache": False,
+    }
+
+
+def test_no_socket_and_stale_socket(tmp_path):
+    assert try_call("ls", {}, path=tmp_path / "none.sock") == (False, None)
+    stale = tmp_path / "stale.sock"
+    server = make_server(stale)
+    server.socket.close()  # bound but nobody listening, file left behind
+    assert stale.exists()
+    assert try_call("ls", {}, path=stale) == (False, None)
+    make_server(stale).server_close()  # replaces the stale socket
+
+
+def test_daemon_indexes_other_revisions(daemon, tmp_path):
+    import subprocess
+
+    def git(*args):
+        subprocess.run(["git", *args], cwd=tmp_path, check=True, capture_output=True)
+
+    git("init", "-q")
+    (tmp_path / "m.py").write_text("def at_head():\n    pass\n", encoding="utf-8")
+    git("add", "m.py")
+    git("-c", "user.name=T", "-c", "user.email=t@e", "commit", "-qm", "init")
+    (tmp_path / "m.py").write_text("def in_worktree():\n    pass\n", encoding="utf-8")
+
+    found, res = try_call("symbol", {"name": "at_head", "root": ".", "rev": "HEAD"})
+    assert found and res[0]["name"] == "at_head"
+    assert try_call("symbol", {"name": "at_head", "root": "."}) == (True, [])
+    assert list(daemon.warm.tree(".").revs) == ["HEAD"]
+    found, res = try_call("search", {"pattern": "at_head", "path": ".", "max": 5, "rev": "HEAD"})
+    assert found and res[0]["line"] == 1
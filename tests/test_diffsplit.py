@@ -0,0 +1,140 @@
+import time
+
+from codex_repo_tool.diffsplit import (
+    DiffSplitter,
+    diff_items,
+    iter_items,
+    section_path,
+    split_diff,
+)
+
+TWO_FILES = (
+    "--- a/a.py\n"
+    "+++ b/a.py\n"
+    "@@ -1,2 +1,2 @@\n"
+    "--- not a header, a removed line\n"
+    "+x = 1\n"
+    " y = 2\n"
+    "--- a/b.py\n"
+    "+++ b/b.py\n"
+    "@@ -1 +1 @@\n"
+    "-old\n"
+    "+new\n"
+)
+
+
+def test_split_two_files_with_tricky_removed_line():
+    sections = split_diff(TWO_FILES)
+    assert len(sections) == 2
+    assert "--- not a header" in sections[0]
+    assert [section_path(s) for s in sections] == ["a.py", "b.py"]
+    assert "".join(sections) == TWO_FILES
+
+
+def test_git_style_headers_and_preamble():
+    diff = (
+        "Here is the patch:\n"
+        "diff --git a/a.py b/a.py\n"
+        "index 111..222 100644\n"
+        "--- a/a.py\n"
+        "+++ b/a.py\n"
+        "@@ -1 +1 @@\n"
+        "-a\n"
+        "+b\n"
+        "diff --git a/c.py b/c.py\n"
+        "deleted file mode 100644\n"
+        "--- a/c.py\n"
+        "+++ /dev/null\n"
+        "@@ -1 +0,0 @@\n"
+        "-gone\n"
+    )
+    sections = split_diff(diff)
+    assert len(sections) == 2
+    assert sections[0].startswith("diff --git a/a.py")
+    assert section_path(sections[1]) == "c.py"
+
+
+def test_incremental_feed_emits_completed_sections_early():
+    s = DiffSplitter()
+    emitted = []
+    for i in range(0, len(TWO_FILES), 7):
+        emitted.extend(s.feed(TWO_FILES[i : i + 7]))
+        if "+++ b/b.py" in TWO_FILES[: i + 7] and not emitted:
+            raise AssertionError("first section not emitted once the second started")
+    assert len(emitted) == 1
+    emitted.extend(s.close())
+    assert "".join(emitted) == TWO_FILES
+
+
+MIXED = (
+    "Sure, here you go:\n"
+    "diff --git a/src/a.py b/src/a.py\n"
+    "index 111..222 100644\n"
+    "--- a/src/a.py\n"
+    "+++ b/src/a.py\n"
+    "@@ -1 +1 @@\n"
+    "-a\n"
+    "+b\n"
+    "diff --git a/old.py b/new.py\n"
+    "similarity index 100%\n"
+    "rename from old.py\n"
+    "rename to new.py\n"
+    "diff --git a/logo.png b/logo.png\n"
+    "new file mode 100644\n"
+    "index 0000000..1111111\n"
+    "GIT binary patch\n"
+    "literal 4\n"
+    "LcmZQzWMT#Y01f~L\n"
+    "\n"
+    "diff --git a/gone.py b/gone.py\n"
+    "deleted file mode 100644\n"
+    "--- a/gone.py\n"
+    "+++ /dev/null\n"
+    "@@ -1 +0,0 @@\n"
+    "-x\n"
+    "diff --git a/run.sh b/run.sh\n"
+    "old mode 100644\n"
+    "new mode 100755\n"
+    "--- /dev/null\n"
+    "+++ b/fresh.py\n"
+    "@@ -0,0 +1 @@\n"
+    "+y\n"
+)
+
+
+def test_diff_items_one_per_file():
+    items = diff_items(MIXED, "goal")
+    assert [it["file"] for it in items] == [
+        "src/a.py",
+        "new.py",
+        "logo.png",
+        "gone.py",
+        "run.sh",
+        "fresh.py",
+    ]
+    assert all(it["description"] == "goal" for it in items)
+    assert "".join(it["diff"] for it in items) == MIXED[MIXED.index("diff --git") :]
+    assert items[2]["diff"].endswith("LcmZQzWMT#Y01f~L\n\n")
+    # a plain diff right after a git section without hunks starts a new item
+    assert items[4]["diff"] == "diff --git a/run.sh b/run.sh\nold mode 100644\nnew mode 100755\n"
+
+
+def test_long_lines_in_small_chunks_stay_linear():
+    body = "+" + "x" * (1 << 20) + "\n"
+    diff = f"--- a/big.txt\n+++ b/big.txt\n@@ -0,0 +1 @@\n{body}--- a/b.py\n+++ b/b.py\n"
+    start = time.perf_counter()
+    items = list(iter_items(diff[i : i + 64] for i in range(0, len(diff), 64)))
+    assert time.perf_counter() - start < 2  # re-joining the partial line per chunk: ~5 s
+    assert [it["file"] for it in items] == ["big.txt", "b.py"]
+    assert items[0]["diff"].endswith(body)
+
+
+def test_multi_megabyte_diff_splits_into_every_file():
+    diff = "".join(
+        f"diff --git a/f{i}.py b/f{i}.py\n--- a/f{i}.py\n+++ b/f{i}.py\n"
+        f"@@ -1,3 +1,3 @@\n a\n--- b\n+{'z' * 200}\n c\n"
+        for i in range(20000)
+    )
+    items = diff_items(diff)
+    assert len(items) == 20000 and items[-1]["file"] == "f19999.py"
+    assert sum(len(it["diff"]) for it in items) == len(diff)
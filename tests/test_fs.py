@@ -12,3 +12,30 @@ def test_list_and_read(tmp_path: Path):
     assert any("x.txt" in x["path"] for x in files)
     assert read_file(str(f)) == "hello\nworld\n"
     assert read_file(str(f), (2, 2)) == "world"
+
+
+def test_list_and_read_at_revision(tmp_path: Path):
+    import subprocess
+
+    import pytest
+
+    def git(*args):
+        subprocess.run(["git", *args], cwd=tmp_path, check=True, capture_output=True)
+
+    git("init", "-q")
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "x.txt").write_text("old\r\nline\n", encoding="utf-8")
+    git("add", ".")
+    git("-c", "user.name=T", "-c", "user.email=t@e", "commit", "-qm", "init")
+    (tmp_path / "pkg" / "x.txt").write_text("new\n", encoding="utf-8")
+    (tmp_path / "pkg" / "y.txt").write_text("untracked\n", encoding="utf-8")
+
+    paths = [f["path"] for f in list_files(str(tmp_path), rev="HEAD")]
+    assert paths == [str(tmp_path / "pkg" / "x.txt")]
+    assert [f["path"] for f in list_files(tmp_path / "pkg", "*.txt", rev="HEAD")] == paths
+    assert read_file(tmp_path / "pkg" / "x.txt", rev="HEAD") == "old\nline\n"
+    assert read_file(tmp_path / "pkg" / "x.txt", (2, 2), rev="HEAD") == "line"
+    with pytest.raises(FileNotFoundError):
+        read_file(tmp_path / "pkg" / "y.txt", rev="HEAD")
+    with pytest.raises(ValueError):
+        list_files(str(tmp_path), rev="no-such-branch")
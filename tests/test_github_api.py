@@ -1,9 +1,11 @@
 from unittest import mock
 
+import pytest
+
 from codex_repo_tool.github_api import open_pull_request
 
 
-@mock.patch("codex_repo_tool.github_api.requests.post")
+@mock.patch("codex_repo_tool.github_api.request")
 def test_open_pr(mock_post, monkeypatch):
     monkeypatch.setenv("GITHUB_TOKEN", "x")
     monkeypatch.setenv("GITHUB_REPO", "owner/name")
@@ -12,3 +14,232 @@ def test_open_pr(mock_post, monkeypatch):
     mock_post.return_value.raise_for_status.return_value = None
     out = open_pull_request("feature/x", "t", "b")
     assert out["number"] == 1
+
+
+def test_list_issues_against_stub(http_stub, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GITHUB_TOKEN", "x")
+    monkeypatch.setenv("GITHUB_REPO", "owner/name")
+    monkeypatch.setattr("codex_repo_tool.github_api.API", http_stub.url)
+    http_stub.add(502).add(200, [{"number": 7}])
+    from codex_repo_tool.github_api import list_issues
+
+    out = list_issues(labels=["bug"])
+    assert out == [{"number": 7}]
+    assert (
+        http_stub.requests[-1]["path"]
+        == "/repos/owner/name/issues?state=open&per_page=100&labels=bug"
+    )
+    assert http_stub.requests[-1]["headers"]["Authorization"] == "Bearer x"
+
+
+def _env(monkeypatch, tmp_path, http_stub):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GITHUB_TOKEN", "x")
+    monkeypatch.setenv("GITHUB_REPO", "o/n")
+    monkeypatch.setattr("codex_repo_tool.github_api.API", http_stub.url)
+
+
+def test_list_issues_paginates_with_etags(http_stub, tmp_path, monkeypatch):
+    from codex_repo_tool.github_api import list_issues
+
+    _env(monkeypatch, tmp_path, http_stub)
+    pages = {"1": [{"number": 1}, {"number": 2}], "2": [{"number": 3}]}
+
+    def handler(method, path, headers, body):
+        page = "2" if "page=2" in path else "1"
+        etag = f'"p{page}"'
+        if headers.get("If-None-Match") == etag:
+            return 304, b"", {"ETag": etag}
+        extra = {"ETag": etag}
+        if page == "1":
+            extra["Link"] = f'<{http_stub.url}/repos/o/n/issues?state=open&page=2>; rel="next"'
+        return 200, pages[page], extra
+
+    http_stub.handler = handler
+    first = list_issues()
+    assert [i["number"] for i in first] == [1, 2, 3]
+    assert len(http_stub.requests) == 2
+
+    second = list_issues()
+    assert second == first
+    assert len(http_stub.requests) == 4
+    assert all("If-None-Match" in r["headers"] for r in http_stub.requests[2:])
+
+
+def test_rate_limiter_paces_near_exhaustion():
+    from codex_repo_tool.github_api import RateLimiter
+
+    sleeps = []
+    rl = RateLimiter(low_water=10, sleep=sleeps.append, clock=lambda: 1000.0)
+    rl.update({"X-RateLimit-Remaining": "500", "X-RateLimit-Reset": "1060"})
+    rl.wait()
+    assert sleeps == []
+    rl.update({"X-RateLimit-Remaining": "4", "X-RateLimit-Reset": "1060"})
+    assert rl.delay() == 15.0
+    rl.update({"X-RateLimit-Remaining": "0"})
+    rl.wait()
+    assert sleeps == [60.0]
+
+
+def test_sync_issues_is_incremental(http_stub, tmp_path, monkeypatch):
+    from codex_repo_tool.github_api import load_synced_issues, sync_issues
+
+    _env(monkeypatch, tmp_path, http_stub)
+    issues = [
+        {"number": 1, "updated_at": "2026-01-01T00:00:00Z"},
+        {"number": 2, "updated_at": "2026-01-02T00:00:00Z"},
+    ]
+
+    def handler(method, path, headers, body):
+        if "since=" in path:
+            since = path.split("since=")[1].split("&")[0].replace("%3A", ":")
+            return 200, [i for i in issues if i["updated_at"] >= since], {}
+        return 200, issues, {}
+
+    http_stub.handler = handler
+    assert len(sync_issues()) == 2
+    assert sync_issues() == []
+    assert "since=2026-01-02" in http_stub.requests[-1]["path"]
+
+    issues.append({"number": 1, "updated_at": "2026-01-03T00:00:00Z", "state": "closed"})
+    changed = sync_issues()
+    assert [i["number"] for i in changed] == [1]
+    assert load_synced_issues()["1"]["state"] == "closed"
+
+
+def test_sync_issues_keeps_a_watermark_per_filter(http_stub, tmp_path, monkeypatch):
+    from codex_repo_tool.github_api import load_synced_issues, sync_issues
+
+    _env(monkeypatch, tmp_path, http_stub)
+    issues = [
+        {"number": 1, "updated_at": "2026-01-01T00:00:00Z", "labels": ["docs"]},
+        {"number": 2, "updated_at": "2026-01-02T00:00:00Z", "labels": ["bug"]},
+    ]
+
+    def handler(method, path, headers, body):
+        found = [i for i in issues if "labels=bug" not in path or "bug" in i["labels"]]
+        if "since=" in path:
+            since = path.split("since=")[1].split("&")[0].replace("%3A", ":")
+            found = [i for i in found if i["updated_at"] >= since]
+        return 200, found, {}
+
+    http_stub.handler = handler
+    assert [i["number"] for i in sync_issues(labels=["bug"])] == [2]
+    # the "bug" watermark (January 2nd) must not hide issue 1 from an unfiltered sync
+    assert [i["number"] for i in sync_issues()] == [1, 2]
+    assert "since=" not in http_stub.requests[-1]["path"]
+    assert set(load_synced_issues(labels=["bug"])) == {"2"}
+    monkeypatch.setenv("GITHUB_REPO", "o/other")
+    assert len(sync_issues(labels=["bug"])) == 1
+
+
+def test_batch_pull_requests_graphql(http_stub, tmp_path, monkeypatch):
+    import json
+    import threading
+
+    from codex_repo_tool.github_api import PROperation, batch_pull_requests
+
+    _env(monkeypatch, tmp_path, http_stub)
+    lock = threading.Lock()
+    numbers = iter(range(10, 100))
+    mutations = []
+
+    def handler(method, path, headers, body):
+        assert path == "/graphql"
+        req = json.loads(body)
+        q, v = req["query"], req["variables"]
+        if "repository(" in q:
+            assert v["l0"] == "auto"
+            return (
+                200,
+                {
+                    "data": {
+                        "repository": {
+                            "id": "R1",
+                            "defaultBranchRef": {"name": "main"},
+                            "l0": {"id": "L1"},
+                        }
+                    }
+                },
+                {},
+            )
+        if "createPullRequest" in q:
+            with lock:
+                n = next(numbers)
+            if v["input"]["headRefName"] == "broken":
+                return 200, {"errors": [{"message": "no such branch"}]}, {}
+            return (
+                200,
+                {
+                    "data": {
+                        "createPullRequest": {
+                            "pullRequest": {"id": f"PR{n}", "number": n, "url": f"u/{n}"}
+                        }
+                    }
+                },
+                {},
+            )
+        with lock:
+            mutations.append(v)
+        return 200, {"data": {}}, {}
+
+    http_stub.handler = handler
+    ops = [
+        PROperation("b1", "t1", "body", labels=["auto"], comments=["summary"], issues=[5]),
+        PROperation("b2", "t2", comments=["a", "b"], issues=[6], close_issues=True),
+        PROperation("broken", "t3"),
+    ]
+    res = batch_pull_requests(ops, max_workers=2)
+    assert [r["ok"] for r in res] == [True, True, False]
+    assert "no such branch" in res[2]["error"]
+    # 1 metadata query + 3 creates + 2 combined label/comment mutations
+    assert len(http_stub.requests) == 6
+    create = [
+        json.loads(r["body"]) for r in http_stub.requests if b"createPullRequest" in r["body"]
+    ]
+    b1 = next(c for c in create if c["variables"]["input"]["headRefName"] == "b1")
+    assert b1["variables"]["input"]["body"] == "body\n\nRefs #5"
+    b2 = next(c for c in create if c["variables"]["input"]["headRefName"] == "b2")
+    assert b2["variables"]["input"]["body"] == "Closes #6"
+    assert b1["variables"]["input"]["baseRefName"] == "main"
+    assert any(m.get("labels") == ["L1"] and m["c0"] == "summary" for m in mutations)
+
+
+@mock.patch("codex_repo_tool.github_api.request")
+@mock.patch("codex_repo_tool.github_api._repo_meta")
+def test_pr_base_is_explicit(mock_meta, mock_post, monkeypatch):
+    from codex_repo_tool import github_api
+
+    monkeypatch.setenv("GITHUB_TOKEN", "x")
+    monkeypatch.setenv("GITHUB_REPO", "owner/prefetch")
+    monkeypatch.delenv("DEFAULT_BRANCH", raising=False)
+    monkeypatch.setattr(github_api, "_REPO_META", {})
+    mock_meta.return_value = {"id": "R1", "default_branch": "trunk", "labels": {}}
+    assert github_api.repo_metadata()["default_branch"] == "trunk"
+    assert github_api.repo_metadata() is github_api.repo_metadata()
+    assert mock_meta.call_count == 1
+    # cached metadata does not change the base behind the caller's back
+    open_pull_request("feature/x", "t", "b")
+    assert mock_post.call_args.kwargs["json"]["base"] == "main"
+    open_pull_request("feature/x", "t", "b", base="trunk")
+    assert mock_post.call_args.kwargs["json"]["base"] == "trunk"
+    monkeypatch.setenv("DEFAULT_BRANCH", "release")
+    open_pull_request("feature/x", "t", "b")
+    assert mock_post.call_args.kwargs["json"]["base"] == "release"
+
+
+@mock.patch("codex_repo_tool.github_api.request")
+def test_open_pr_reuses_an_open_pr_from_the_branch(mock_request, monkeypatch):
+    monkeypatch.setenv("GITHUB_TOKEN", "x")
+    monkeypatch.setenv("GITHUB_REPO", "owner/name")
+    taken = mock.Mock(status_code=422)
+    taken.raise_for_status.side_effect = RuntimeError("422")
+    listed = mock.Mock(status_code=200)
+    listed.json.return_value = [{"number": 9}]
+    mock_request.side_effect = [taken, listed]
+    assert open_pull_request("feature/x", "t", "b", existing_ok=True) == {"number": 9}
+    assert mock_request.call_args.kwargs["params"] == {"head": "owner:feature/x", "state": "open"}
+    mock_request.side_effect = [taken]
+    with pytest.raises(RuntimeError):
+        open_pull_request("feature/x", "t", "b")
@@ -0,0 +1,58 @@
+import subprocess
+
+from codex_repo_tool import metrics
+from codex_repo_tool.gitobj import CatFile, blob_sha, worktree_blobs
+
+
+def _git(repo, *args):
+    return subprocess.run(
+        ["git", *args], cwd=repo, check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def _repo(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-q")
+    _git(repo, "config", "user.email", "t@example.com")
+    _git(repo, "config", "user.name", "T")
+    for name in ("a.py", "b.py", "c.py"):
+        (repo / name).write_text(f"# {name}\n", encoding="utf-8")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-qm", "init")
+    return repo
+
+
+def test_blob_sha_matches_git(tmp_path):
+    p = tmp_path / "x.bin"
+    p.write_bytes(b"hello\0world\n")
+    assert blob_sha(p.read_bytes()) == _git(tmp_path, "hash-object", str(p))
+
+
+def test_worktree_blobs_marks_what_must_be_read_from_disk(tmp_path):
+    repo = _repo(tmp_path)
+    (repo / "b.py").write_text("changed\n", encoding="utf-8")
+    (repo / "c.py").unlink()
+    (repo / "new.py").write_text("new\n", encoding="utf-8")
+    listing = worktree_blobs(repo)
+    assert listing["a.py"] == _git(repo, "rev-parse", "HEAD:a.py")
+    assert listing["b.py"] is None and listing["c.py"] is None and listing["new.py"] is None
+    plain = tmp_path / "plain"
+    plain.mkdir()
+    assert worktree_blobs(plain) is None
+
+
+def test_cat_file_serves_many_reads_from_one_process(tmp_path):
+    metrics.METRICS.take()
+    repo = _repo(tmp_path)
+    cat = CatFile(repo)
+    assert cat.read("HEAD:a.py") == ("blob", b"# a.py\n")
+    pid = cat._p.pid
+    specs = [f"HEAD:{n}" for n in ("a.py", "b.py", "nope.py")] * 500  # > one pipe write
+    got = cat.read_many(specs)
+    assert got[1] == ("blob", b"# b.py\n") and got[2] is None and len(got) == 1500
+    assert cat._p.pid == pid
+    cat.close()
+    snap = metrics.METRICS.take()
+    assert snap["commands"]["git cat-file"]["count"] == 1
+    assert snap["counters"]["git.objects_read"] == 1501
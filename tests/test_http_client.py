@@ -0,0 +1,68 @@
+import pytest
+import requests
+
+from codex_repo_tool import http_client
+from codex_repo_tool.http_client import RetryPolicy, backoff_delay, endpoint_timeout, request
+
+
+def test_retries_5xx_then_succeeds(http_stub):
+    http_stub.add(503).add(502).add(200, {"ok": True})
+    sleeps = []
+    r = request("GET", http_stub.url + "/x", sleep=sleeps.append)
+    assert r.status_code == 200
+    assert r.json() == {"ok": True}
+    assert len(http_stub.requests) == 3
+    assert len(sleeps) == 2
+
+
+def test_honors_retry_after(http_stub):
+    http_stub.add(429, {}, {"Retry-After": "7"}).add(200, {})
+    sleeps = []
+    policy = RetryPolicy(max_retries=2, backoff_base=0.01, backoff_max=30)
+    r = request("GET", http_stub.url, retry=policy, sleep=sleeps.append)
+    assert r.status_code == 200
+    assert sleeps == [7.0]
+
+
+def test_gives_up_after_max_retries(http_stub):
+    http_stub.add(500)
+    policy = RetryPolicy(max_retries=2, backoff_base=0.0)
+    r = request("PUT", http_stub.url, retry=policy, sleep=lambda s: None, json={"a": 1})
+    assert r.status_code == 500
+    assert len(http_stub.requests) == 3
+    with pytest.raises(requests.HTTPError):
+        r.raise_for_status()
+
+
+def test_posts_are_retried_only_when_safe(http_stub):
+    policy = RetryPolicy(max_retries=2, backoff_base=0.0)
+    http_stub.add(502).add(502).add(200, {})
+    assert request("POST", http_stub.url, retry=policy, sleep=lambda s: None).status_code == 502
+    assert len(http_stub.requests) == 1  # the server may have created something
+    r = request("POST", http_stub.url, retry=policy, sleep=lambda s: None, idempotent=True)
+    assert r.status_code == 200 and len(http_stub.requests) == 3
+    http_stub.responses[:] = []
+    http_stub.add(429).add(201, {})
+    assert request("POST", http_stub.url, retry=policy, sleep=lambda s: None).status_code == 201
+
+
+def test_connections_are_reused(http_stub):
+    http_stub.add(200, {})
+    for _ in range(3):
+        request("GET", http_stub.url, endpoint="github")
+    ports = {req["client"][1] for req in http_stub.requests}
+    assert len(ports) == 1
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(backoff_base=1.0, backoff_max=5.0)
+    assert backoff_delay(0, policy, rand=lambda: 1.0) == 1.0
+    assert backoff_delay(10, policy, rand=lambda: 1.0) == 5.0
+    assert backoff_delay(2, policy, rand=lambda: 0.5) == 2.0
+
+
+def test_endpoint_timeouts(monkeypatch):
+    assert endpoint_timeout("openai")[1] == 60.0
+    monkeypatch.setenv("CODEXRT_TIMEOUT_MODEL_HTTP", "5")
+    assert endpoint_timeout("model-http")[1] == 5.0
+    assert http_client.get_session("github") is http_client.get_session("github")
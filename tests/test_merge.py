@@ -0,0 +1,142 @@
+import subprocess
+
+from codex_repo_tool.merge import (
+    WHOLE,
+    ConflictIndex,
+    touched_ranges,
+    validate_entries,
+    validate_pending,
+)
+from codex_repo_tool.store import PatchStore
+
+
+def _edit(path: str, line: int, old: str = "x", new: str = "y") -> str:
+    return f"--- a/{path}\n+++ b/{path}\n@@ -{line} +{line} @@\n-{old}\n+{new}\n"
+
+
+def _line_edit(n: int, old: str, new: str) -> str:
+    return (
+        f"--- a/a.txt\n+++ b/a.txt\n@@ -{n - 1},3 +{n - 1},3 @@\n"
+        f" line{n - 1}\n-{old}\n+{new}\n line{n + 1}\n"
+    )
+
+
+def test_touched_ranges():
+    diff = (
+        "--- a/a.py\n+++ b/a.py\n@@ -3,3 +3,4 @@\n a\n-b\n+c\n+d\n e\n@@ -20,0 +22 @@\n+z\n"
+        "diff --git a/b.py b/c.py\nrename from b.py\nrename to c.py\n"
+        "diff --git a/new.py b/new.py\nnew file mode 100644\n--- /dev/null\n+++ b/new.py\n@@ -0,0 +1 @@\n+n\n"
+    )
+    assert touched_ranges(diff) == {
+        "a.py": [(3, 5), (20, 21)],
+        "b.py": [WHOLE],
+        "c.py": [WHOLE],
+        "new.py": [WHOLE],
+    }
+    assert touched_ranges("--- a/a.py\n+++ b/a.py\n@@ -1,3 +1,3 @@\n-x\n") is None
+
+
+def test_conflict_index_batches_disjoint_hunks():
+    index = ConflictIndex()
+    for i in range(10):
+        index.add(f"p{i}", _edit("a.py", 10 * i + 1))
+    index.add("clash", _edit("a.py", 31))
+    index.add("broken", "--- a/b.py\n+++ b/b.py\n@@ -1,2 +1,2 @@\n-x\n")
+    assert index.conflicts("clash") == {"p3", "broken"}
+    assert "p3" in index.conflicts("broken") and len(index) == 12
+    pids = ["p0", "clash", *(f"p{i}" for i in range(1, 10)), "broken"]
+    assert index.batches(pids, max_batch=8) == [
+        ["p0", "clash", "p1", "p2", "p4", "p5", "p6", "p7"],
+        ["p3", "p8", "p9"],
+        ["broken"],
+    ]
+    index.remove("broken")
+    assert index.conflicts("p3") == {"clash"} and "broken" not in index
+
+
+def test_failing_batch_is_bisected_to_the_culprit():
+    entries = [
+        {"id": f"p{i}", "kind": "patch", "file": "a.py", "diff": _edit("a.py", 10 * i + 1)}
+        for i in range(8)
+    ]
+    entries[5]["description"] = "bad"
+    seen = []
+
+    def validate(items):
+        seen.append(len(items))
+        return {"applied": all(it.get("description") != "bad" for it in items), "stage": "qa"}
+
+    report = validate_entries(entries, validate=validate)
+    assert report["failed"] == ["p5"] and len(report["applied"]) == 7
+    assert report["batches"] == 1 and report["sandbox_runs"] == 7  # 8 -> 4+4 -> 2+2 -> 1+1
+    assert seen == [8, 4, 4, 2, 1, 1, 2]
+
+
+def test_patches_that_only_fail_together():
+    entries = [
+        {"id": p, "kind": "patch", "file": "a.py", "diff": _edit("a.py", n)}
+        for p, n in (("p0", 1), ("p1", 9))
+    ]
+    report = validate_entries(entries, validate=lambda items: {"applied": len(items) == 1})
+    assert report["applied"] == ["p0"] and report["failed"] == ["p1"]
+    assert report["results"]["p1"]["stage"] == "combined"
+    assert report["results"]["p1"]["with"] == ["p0"]
+
+
+def test_validate_pending_runs_one_sandbox_per_batch(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    subprocess.run(["git", "config", "user.email", "t@example.com"], cwd=repo, check=True)
+    subprocess.run(["git", "config", "user.name", "T"], cwd=repo, check=True)
+    (repo / "a.txt").write_text("".join(f"line{i}\n" for i in range(1, 41)), encoding="utf-8")
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    subprocess.run(["git", "commit", "-qm", "init"], cwd=repo, check=True)
+    monkeypatch.chdir(repo)
+    monkeypatch.setattr("codex_repo_tool.patch.lint_code", lambda **kw: {"ok": True})
+    monkeypatch.setattr("codex_repo_tool.patch.run_tests", lambda **kw: {"ok": True})
+    store = PatchStore(tmp_path / "store.sqlite")
+    ids = [store.add_patch("a.txt", _line_edit(n, f"line{n}", f"new{n}")) for n in (2, 10, 20, 30)]
+    ids.append(store.add_patch("a.txt", _line_edit(20, "line20", "other")))
+    ids.append(store.add_patch("a.txt", _line_edit(35, "nope", "x")))
+    report = validate_pending(store=store)
+    assert report["batches"] == 2 and report["failed"] == [ids[5]]
+    # batch of 5 fails -> 2 + 3 -> 1 + 2 -> 1 + 1, then the conflicting patch alone
+    assert report["sandbox_runs"] == 8
+    assert [e["id"] for e in store.find(status="applied")] == ids[:5]
+    assert store.get(ids[5])["result"]["stage"] == "prescreen"
+    assert store.claim_pending() == []
+
+
+def test_bisection_pins_the_patch_that_breaks_lint(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    subprocess.run(["git", "config", "user.email", "t@example.com"], cwd=repo, check=True)
+    subprocess.run(["git", "config", "user.name", "T"], cwd=repo, check=True)
+    (repo / "ruff.toml").write_text("", encoding="utf-8")
+    (repo / "m.py").write_text("".join(f"v{i} = {i}\n" for i in range(1, 21)), encoding="utf-8")
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    subprocess.run(["git", "commit", "-qm", "init"], cwd=repo, check=True)
+    monkeypatch.chdir(repo)
+    monkeypatch.setattr("codex_repo_tool.qa._docker_enabled", lambda: False)
+
+    def edit(n: int, new: str) -> str:
+        return (
+            f"--- a/m.py\n+++ b/m.py\n@@ -{n - 1},3 +{n - 1},3 @@\n"
+            f" v{n - 1} = {n - 1}\n-v{n} = {n}\n+{new}\n v{n + 1} = {n + 1}\n"
+        )
+
+    store = PatchStore(tmp_path / "store.sqlite")
+    ids = [
+        store.add_patch("m.py", edit(2, "v2 = 22")),
+        store.add_patch("m.py", edit(10, "v10 = undefined_name")),
+        store.add_patch("m.py", edit(18, "v18 = 188")),
+    ]
+    report = validate_pending(store=store)
+    # lint runs on the batch's worktree, so the shared run fails and bisection finds it
+    assert report["batches"] == 1 and report["failed"] == [ids[1]]
+    assert report["applied"] == [ids[0], ids[2]]
+    result = store.get(ids[1])["result"]
+    assert result["stage"] == "qa" and "undefined_name" in result["lint"]["stdout"]
+    assert "undefined_name" not in (repo / "m.py").read_text()
@@ -0,0 +1,98 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from codex_repo_tool import metrics, proc
+from codex_repo_tool.cli import main
+from codex_repo_tool.search import search_code
+from codex_repo_tool.semantic import build_index
+
+
+@pytest.fixture(autouse=True)
+def fresh(tmp_path, monkeypatch):
+    monkeypatch.setenv("CODEXRT_METRICS_FILE", str(tmp_path / "metrics.json"))
+    monkeypatch.setenv("CODEXRT_METRICS", "1")
+    metrics.METRICS.take()
+    yield
+    metrics.METRICS.take()
+
+
+def test_command_key():
+    assert proc.command_key(["git", "-C", "x", "apply", "--check", "p"]) == "git apply"
+    assert proc.command_key(["/usr/bin/ruff", "check", "."]) == "ruff"
+    assert proc.command_key(["npm", "run", "lint"]) == "npm run"
+    assert proc.command_key("pytest -q") == "pytest"
+
+
+def test_run_records_counts_codes_and_sizes():
+    proc.run([sys.executable, "-c", "print('x' * 99)"], capture_output=True, text=True)
+    proc.run([sys.executable, "-c", "import sys; sys.exit(3)"], capture_output=True)
+    with pytest.raises(FileNotFoundError):
+        proc.run(["codexrt-no-such-program"])
+    with pytest.raises(subprocess.TimeoutExpired):
+        proc.run([sys.executable, "-c", "import time; time.sleep(5)"], timeout=0.2)
+    py = metrics.METRICS.snapshot()["commands"][proc.command_key([sys.executable])]
+    assert py["count"] == 3
+    assert py["exit_codes"] == {"0": 1, "3": 1, "timeout": 1}
+    assert py["stdout_bytes"] == 100
+    assert py["wall_s"] >= 0.2 and py["max_wall_s"] >= 0.2
+    assert py["cpu_s"] >= 0
+    assert metrics.METRICS.snapshot()["commands"]["codexrt-no-such-program"]["exit_codes"] == {
+        "error": 1
+    }
+
+
+def test_flush_aggregates_across_processes(tmp_path):
+    metrics.METRICS.record("git apply", 0.5, 0.1, 0, 10, 0)
+    metrics.count("search.queries")
+    assert metrics.flush() is True
+    assert metrics.flush() is False  # nothing new
+    metrics.METRICS.record("git apply", 1.5, 0.2, 1, 0, 5)
+    metrics.count("search.queries", 2)
+    assert metrics.flush() is True
+
+    on_disk = json.loads((tmp_path / "metrics.json").read_text())
+    assert on_disk["flushes"] == 2
+    data = metrics.load()
+    cmd = data["commands"]["git apply"]
+    assert cmd["count"] == 2 and cmd["exit_codes"] == {"0": 1, "1": 1}
+    assert cmd["wall_s"] == 2.0 and cmd["mean_wall_s"] == 1.0 and cmd["max_wall_s"] == 1.5
+    assert cmd["failures"] == 1
+    assert (cmd["stdout_bytes"], cmd["stderr_bytes"]) == (10, 5)
+    assert data["counters"]["search.queries"] == 3
+
+    metrics.reset()
+    assert metrics.load()["commands"] == {}
+
+
+def test_search_and_index_count_bytes(tmp_path):
+    (tmp_path / "a.py").write_text("def f():\n    return 1\n", encoding="utf-8")
+    (tmp_path / "b.md").write_text("needle\n", encoding="utf-8")
+    search_code("needle", tmp_path)
+    build_index(str(tmp_path))
+    counters = metrics.METRICS.snapshot()["counters"]
+    assert counters["search.files_read"] == 2
+    assert counters["search.bytes_scanned"] == 22 + 7
+    assert counters["index.files_read"] == 1
+    assert counters["index.bytes_scanned"] == 22
+
+
+def test_cli_flushes_and_stats_reports(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CODEXRT_NO_DAEMON", "1")
+    (tmp_path / "x.txt").write_text("hello\n", encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["codexrt", "cat", "x.txt"])
+    main()
+    monkeypatch.setattr(sys, "argv", ["codexrt", "stats"])
+    main()
+    out = capsys.readouterr().out
+    stats = json.loads(out[out.index("{") :])
+    assert stats["counters"]["fs.files_read"] == 1
+    assert stats["flushes"] == 1
+
+    monkeypatch.delenv("CODEXRT_METRICS")  # off by default
+    monkeypatch.setattr(sys, "argv", ["codexrt", "cat", "x.txt"])
+    main()
+    assert json.loads((tmp_path / "metrics.json").read_text())["counters"]["fs.files_read"] == 1
@@ -1,9 +1,14 @@
+import json
+import subprocess
 from unittest import mock
 
-from codex_repo_tool.model_adapter import get_diff
+import pytest
 
+from codex_repo_tool.model_adapter import DiffRejected, get_diff
+from codex_repo_tool.patch import check_section
 
-@mock.patch("codex_repo_tool.model_adapter.requests.post")
+
+@mock.patch("codex_repo_tool.model_adapter.request")
 def test_adapter_openai_path(mock_post, monkeypatch):
     monkeypatch.setenv("MODEL_PROVIDER", "openai")
     monkeypatch.setenv("MODEL_NAME", "gpt-4o-mini")
@@ -16,7 +21,7 @@ def test_adapter_openai_path(mock_post, monkeypatch):
     assert out.startswith("--- a/")
 
 
-@mock.patch("codex_repo_tool.model_adapter.requests.post")
+@mock.patch("codex_repo_tool.model_adapter.request")
 def test_adapter_http_path(mock_post, monkeypatch):
     monkeypatch.setenv("MODEL_PROVIDER", "http")
     monkeypatch.setenv("MODEL_ENDPOINT", "https://example.com/diff")
@@ -24,3 +29,55 @@ def test_adapter_http_path(mock_post, monkeypatch):
     mock_post.return_value.raise_for_status.return_value = None
     out = get_diff("goal", {"y.py": "code"})
     assert out.startswith("--- a/")
+
+
+def _sse(*deltas):
+    events = [
+        "data: " + json.dumps({"choices": [{"delta": {"content": d}}]}) + "\n\n" for d in deltas
+    ]
+    return ("".join(events) + "data: [DONE]\n\n").encode()
+
+
+def test_stream_openai_sse(http_stub, monkeypatch):
+    monkeypatch.setenv("MODEL_PROVIDER", "openai")
+    monkeypatch.setenv("OPENAI_ENDPOINT", http_stub.url + "/v1/chat/completions")
+    diff = "--- a/x\n+++ b/x\n@@ -1 +1 @@\n-a\n+b\n"
+    http_stub.add(200, _sse(diff[:10], diff[10:]), {"Content-Type": "text/event-stream"})
+    checked = []
+
+    def check(section):
+        checked.append(section)
+        return {"ok": True}
+
+    monkeypatch.setattr("codex_repo_tool.patch.check_section", check)
+    out = get_diff("goal", {}, stream=True)
+    assert out == diff
+    assert checked == [diff]
+    assert json.loads(http_stub.requests[0]["body"])["stream"] is True
+
+
+def test_stream_aborts_on_unapplicable_section(http_stub, monkeypatch):
+    monkeypatch.setenv("MODEL_PROVIDER", "http")
+    monkeypatch.setenv("MODEL_ENDPOINT", http_stub.url + "/diff")
+    body = (
+        "--- a/bad\n+++ b/bad\n@@ -1 +1 @@\n-a\n+b\n--- a/good\n+++ b/good\n@@ -1 +1 @@\n-a\n+b\n"
+    )
+    http_stub.add(200, body.encode(), {"Content-Type": "text/plain"})
+
+    def check(section):
+        return {"ok": "bad" not in section, "stderr": "patch does not apply"}
+
+    monkeypatch.setattr("codex_repo_tool.patch.check_section", check)
+    with pytest.raises(DiffRejected) as exc:
+        get_diff("goal", {}, stream=True)
+    assert exc.value.file == "bad"
+    assert "does not apply" in exc.value.stderr
+
+
+def test_check_section_against_repo(tmp_path, monkeypatch):
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    (tmp_path / "a.txt").write_text("a\n", encoding="utf-8")
+    ok = check_section("--- a/a.txt\n+++ b/a.txt\n@@ -1 +1 @@\n-a\n+b\n", cwd=str(tmp_path))
+    bad = check_section("--- a/a.txt\n+++ b/a.txt\n@@ -1 +1 @@\n-zz\n+b\n", cwd=str(tmp_path))
+    assert ok["ok"] is True
+    assert bad["ok"] is False
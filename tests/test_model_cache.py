@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from codex_repo_tool.model_adapter import get_diff
+from codex_repo_tool.model_cache import ResponseCache, cache_key, repo_tree_hash
+
+
+def _git_repo(path):
+    subprocess.run(["git", "init", "-q"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.email", "t@example.com"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.name", "T"], cwd=path, check=True)
+    (path / "a.txt").write_text("a\n", encoding="utf-8")
+    subprocess.run(["git", "add", "a.txt"], cwd=path, check=True)
+    subprocess.run(["git", "commit", "-qm", "init"], cwd=path, check=True)
+
+
+def test_get_diff_cache_hit_and_bypass(http_stub, tmp_path, monkeypatch):
+    _git_repo(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MODEL_PROVIDER", "http")
+    monkeypatch.setenv("MODEL_ENDPOINT", http_stub.url + "/diff")
+    monkeypatch.setenv("CODEXRT_MODEL_CACHE", "1")
+    http_stub.add(200, {"diff": "--- a/a.txt\n+++ b/a.txt\n"})
+
+    first = get_diff("goal", {})
+    second = get_diff("goal", {})
+    assert first == second
+    assert len(http_stub.requests) == 1
+
+    get_diff("goal", {}, cache=False)
+    assert len(http_stub.requests) == 2
+
+    stats = ResponseCache().stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["bytes_saved"] == len(first)
+    assert stats["hit_rate"] == 0.5
+
+    # a different repo state is a different key
+    (tmp_path / "a.txt").write_text("changed\n", encoding="utf-8")
+    get_diff("goal", {})
+    assert len(http_stub.requests) == 3
+
+
+def test_ttl_and_size_eviction(tmp_path):
+    cache = ResponseCache(tmp_path / "c", max_bytes=10_000, ttl=60)
+    keys = [cache_key("p", "m", {"i": i}, "t") for i in range(3)]
+    for k in keys:
+        cache.put(k, "x" * 100)
+    assert cache.get(keys[0]) == "x" * 100
+
+    # expire the second entry
+    old = time.time() - 120
+    path = cache._path(keys[1])
+    os.utime(path, (old, old))
+    assert cache.evict() == 1
+
+    # shrink budget: least recently used (keys[2], not touched by a hit) goes first
+    os.utime(cache._path(keys[2]), (time.time() - 30, time.time() - 30))
+    cache.max_bytes = cache._path(keys[0]).stat().st_size
+    cache.evict()
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is None
+
+
+def test_stats_survive_concurrent_processes(tmp_path):
+    src = str(Path(__file__).resolve().parents[1] / "src")
+    code = (
+        "import sys\n"
+        "from codex_repo_tool.model_cache import ResponseCache\n"
+        "cache = ResponseCache(sys.argv[1])\n"
+        "for _ in range(50):\n"
+        "    cache.get('0' * 64)\n"
+    )
+    env = {**os.environ, "PYTHONPATH": src}
+    procs = [
+        subprocess.Popen([sys.executable, "-c", code, str(tmp_path / "c")], env=env)
+        for _ in range(4)
+    ]
+    assert [p.wait() for p in procs] == [0] * 4
+    assert ResponseCache(tmp_path / "c").stats()["misses"] == 200
+
+
+def test_tree_hash_outside_git(tmp_path):
+    assert repo_tree_hash(tmp_path) == ""
@@ -0,0 +1,231 @@
+import json
+import subprocess
+import time
+
+import pytest
+import requests
+
+from codex_repo_tool import docker_sandbox
+from codex_repo_tool.pipeline import Pipeline
+from codex_repo_tool.sandbox import WorktreePool
+from codex_repo_tool.task import run
+from codex_repo_tool.tracing import span
+
+
+def test_report_measures_overlap():
+    with span("root") as root:
+        with Pipeline() as pipe:
+            bg = pipe.start("prepare", time.sleep, 0.2)
+            with pipe.stage("model"):
+                time.sleep(0.1)
+            bg.result()
+            with pipe.stage("apply"):
+                pass
+            failed = pipe.start("boom", lambda: 1 / 0)
+            with pytest.raises(ZeroDivisionError):
+                failed.result()
+    report = pipe.report()
+    stages = report["stages"]
+    assert stages["model"]["overlap_ms"] == pytest.approx(stages["model"]["ms"], abs=5)
+    assert 90 <= stages["prepare"]["overlap_ms"] <= 130 and stages["prepare"]["ms"] >= 200
+    assert stages["apply"]["overlap_ms"] == 0
+    assert stages["boom"]["error"].startswith("ZeroDivisionError")
+    assert report["saved_ms"] == pytest.approx(stages["model"]["ms"], abs=10)
+    assert report["wall_ms"] >= 200
+    # background stages are traced under the caller's span
+    assert {"prepare", "model", "apply"} <= set(root.timings())
+
+
+def _repo(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    for args in (["init", "-q"], ["config", "user.email", "t@e.com"], ["config", "user.name", "T"]):
+        subprocess.run(["git", *args], cwd=repo, check=True)
+    (repo / "a.txt").write_text("a\n", encoding="utf-8")
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    subprocess.run(["git", "commit", "-qm", "init"], cwd=repo, check=True)
+    return repo
+
+
+def test_prepared_worktree_is_leased_without_a_reset(tmp_path, monkeypatch):
+    repo = _repo(tmp_path)
+    pool = WorktreePool(size=2, root=repo)
+    resets = []
+    real_reset = pool._reset
+    monkeypatch.setattr(pool, "_reset", lambda p, b: resets.append(b) or real_reset(p, b))
+    try:
+        assert pool.prepare("HEAD") is True and pool.prepare("HEAD") is True
+        assert len(pool._all) == 1 and resets == []
+        with pool.lease("HEAD") as (path, err):
+            assert err is None and (path / "a.txt").read_text() == "a\n"
+            (path / "a.txt").write_text("dirty\n", encoding="utf-8")
+        assert resets == []
+        # a used worktree is reset by prepare; a moved branch is reset by the lease
+        assert pool.prepare("HEAD") is True and len(resets) == 1
+        subprocess.run(["git", "commit", "-qm", "x", "--allow-empty"], cwd=repo, check=True)
+        with pool.lease("HEAD") as (path, err):
+            assert (path / "a.txt").read_text() == "a\n"
+        assert len(resets) == 2 and len(pool._all) == 1
+    finally:
+        pool.close()
+
+
+def test_reused_worktree_follows_the_main_repo(tmp_path):
+    repo = _repo(tmp_path)
+    pool = WorktreePool(size=1, root=repo)
+    try:
+        with pool.lease("HEAD") as (path, err):
+            assert (path / "a.txt").read_text() == "a\n"
+        (repo / "a.txt").write_text("b\n", encoding="utf-8")
+        subprocess.run(["git", "commit", "-qam", "b"], cwd=repo, check=True)
+        with pool.lease("HEAD") as (again, err):
+            assert again == path and (again / "a.txt").read_text() == "b\n"
+    finally:
+        pool.close()
+
+
+def test_docker_probe_is_reused(monkeypatch):
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 1, "", "")
+
+    monkeypatch.setattr(docker_sandbox.proc, "run", fake_run)
+    monkeypatch.setattr(docker_sandbox, "_checked", [float("-inf"), False])
+    assert docker_sandbox.docker_available() is False
+    assert docker_sandbox.docker_available() is False
+    assert len(calls) == 1
+    docker_sandbox.docker_available(max_age=0)
+    assert len(calls) == 2
+
+
+def test_task_prepares_the_sandbox_while_the_model_runs(tmp_path, monkeypatch):
+    repo = _repo(tmp_path)
+    monkeypatch.chdir(repo)
+    monkeypatch.setattr("codex_repo_tool.patch.lint_code", lambda **kw: {"ok": True})
+    monkeypatch.setattr("codex_repo_tool.patch.run_tests", lambda **kw: {"ok": True})
+
+    def ask(goal, ctx):
+        time.sleep(0.3)
+        return "--- a/a.txt\n+++ b/a.txt\n@@ -1 +1 @@\n-a\n+b\n"
+
+    res = run(goal="edit", ask_model_for_diff=ask)
+    assert res["ok"] is True
+    stages = res["pipeline"]["stages"]
+    assert set(stages) >= {"sandbox.prepare", "toolchain.detect", "model", "validate"}
+    prep = stages["sandbox.prepare"]
+    assert prep["ms"] - prep["overlap_ms"] < 20  # all but its first moments under the model
+    assert stages["validate"]["overlap_ms"] == 0
+    assert res["pipeline"]["saved_ms"] > 0
+    assert "worktree.reset" not in res["timings"]
+    listed = subprocess.run(["git", "worktree", "list"], cwd=repo, capture_output=True, text=True)
+    assert len(listed.stdout.splitlines()) == 1  # the task's own worktree was removed
+
+
+EDIT_A = "--- a/a.txt\n+++ b/a.txt\n@@ -1 +1 @@\n-a\n+b\n"
+
+
+def _publishing_repo(tmp_path, monkeypatch):
+    """A repo with a bare `origin`, GitHub credentials set and QA stubbed out."""
+    repo = _repo(tmp_path)
+    origin = tmp_path / "origin.git"
+    subprocess.run(["git", "init", "-q", "--bare", str(origin)], check=True)
+    subprocess.run(["git", "remote", "add", "origin", str(origin)], cwd=repo, check=True)
+    monkeypatch.chdir(repo)
+    monkeypatch.setenv("GITHUB_TOKEN", "x")
+    monkeypatch.setenv("GITHUB_REPO", "owner/name")
+    monkeypatch.delenv("DEFAULT_BRANCH", raising=False)
+    monkeypatch.setattr("codex_repo_tool.patch.lint_code", lambda **kw: {"ok": True})
+    monkeypatch.setattr("codex_repo_tool.patch.run_tests", lambda **kw: {"ok": True})
+    return repo, origin
+
+
+def test_task_pushes_a_branch_and_opens_the_pr_against_the_prefetched_base(tmp_path, monkeypatch):
+    repo, origin = _publishing_repo(tmp_path, monkeypatch)
+
+    def slow_meta():
+        time.sleep(0.2)  # still in flight when validation is done
+        return {"id": "R1", "default_branch": "trunk", "labels": {}}
+
+    calls = []
+    monkeypatch.setattr("codex_repo_tool.task.repo_metadata", slow_meta)
+    monkeypatch.setattr(
+        "codex_repo_tool.task.open_pull_request",
+        lambda *a, **kw: calls.append((a, kw)) or {"number": 1},
+    )
+    diff = EDIT_A
+    for var in ("GIT_AUTHOR_DATE", "GIT_COMMITTER_DATE"):
+        monkeypatch.setenv(var, "2026-01-01T00:00:00")
+
+    res = run(goal="Edit a", auto_pr=True, ask_model_for_diff=lambda g, c: diff)
+    assert res["ok"] is True and res["pr"] == {"ok": True, "number": 1}
+    (head, title, _body), kw = calls[0]
+    assert head.startswith("codexrt/auto/edit-a-") and title == "Edit a"
+    assert kw == {"base": "trunk", "existing_ok": True}
+    first = res["pr"]
+    pushed = subprocess.run(
+        ["git", "show", f"{head}:a.txt"], cwd=origin, capture_output=True, text=True
+    )
+    assert pushed.stdout == "b\n"
+    assert (repo / "a.txt").read_text() == "a\n"  # the checkout itself is untouched
+
+    # a rerun makes a new commit; it replaces the generated branch and reuses the PR
+    for var in ("GIT_AUTHOR_DATE", "GIT_COMMITTER_DATE"):
+        monkeypatch.setenv(var, "2026-01-02T00:00:00")
+    res = run(goal="Edit a", auto_pr=True, ask_model_for_diff=lambda g, c: diff)
+    assert res["pr"] == first and calls[1][0][0] == head
+    log = subprocess.run(
+        ["git", "log", "--format=%cs", head], cwd=origin, capture_output=True, text=True
+    )
+    assert log.stdout.split()[0] == "2026-01-02"
+    del calls[1]
+
+    res = run(
+        goal="Edit a",
+        auto_pr=True,
+        ask_model_for_diff=lambda g, c: diff,
+        candidates=2,
+        branch="feature/edit",
+    )
+    assert res["ok"] is True and calls[1][0][0] == "feature/edit"
+    # a caller-named branch is never overwritten
+    for var in ("GIT_AUTHOR_DATE", "GIT_COMMITTER_DATE"):
+        monkeypatch.setenv(var, "2026-01-03T00:00:00")
+    res = run(
+        goal="Edit a", auto_pr=True, ask_model_for_diff=lambda g, c: diff, branch="feature/edit"
+    )
+    assert res["pr"]["stage"] == "push" and "rejected" in res["pr"]["stderr"]
+    assert len(calls) == 2
+
+    # without credentials nothing is pushed and no PR is attempted
+    monkeypatch.delenv("GITHUB_TOKEN")
+    res = run(goal="Edit a", auto_pr=True, ask_model_for_diff=lambda g, c: diff, branch="other")
+    assert res["ok"] is True and res["pr"]["ok"] is False and len(calls) == 2
+    refs = subprocess.run(["git", "branch"], cwd=origin, capture_output=True, text=True)
+    assert "other" not in refs.stdout
+
+
+def test_pr_failures_are_reported_with_the_validated_result(tmp_path, monkeypatch):
+    _, origin = _publishing_repo(tmp_path, monkeypatch)
+
+    def no_meta():
+        raise requests.ConnectionError("github is down")
+
+    monkeypatch.setattr("codex_repo_tool.task.repo_metadata", no_meta)
+    res = run(goal="Edit a", auto_pr=True, ask_model_for_diff=lambda g, c: EDIT_A)
+    assert res["ok"] is True and res["applied"] is True
+    assert res["pr"]["ok"] is False and "github is down" in res["pr"]["error"]
+    refs = subprocess.run(["git", "branch"], cwd=origin, capture_output=True, text=True)
+    assert refs.stdout == ""  # nothing pushed
+
+    def not_json(*a, **kw):
+        raise json.JSONDecodeError("Expecting value", "<html>", 0)
+
+    monkeypatch.setattr("codex_repo_tool.task.repo_metadata", lambda: {"default_branch": "main"})
+    monkeypatch.setattr("codex_repo_tool.task.open_pull_request", not_json)
+    res = run(goal="Edit a", auto_pr=True, ask_model_for_diff=lambda g, c: EDIT_A)
+    assert res["ok"] is True and res["pr"]["stage"] == "pr"
+    # the pushed branch is named, so the caller can retry or clean up
+    refs = subprocess.run(["git", "branch"], cwd=origin, capture_output=True, text=True)
+    assert res["pr"]["branch"] in refs.stdout
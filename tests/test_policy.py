@@ -8,3 +8,50 @@ def test_policy_defaults(tmp_path: Path):
     assert isinstance(p, Policy)
     assert p.require_checks["lint"] is True
     assert p.is_path_protected(".git/hooks/pre-commit") is True
+
+
+def test_globs_compile_to_one_matcher():
+    p = Policy(protected=["secrets/", "*.pem", "/deploy/**/prod.yaml"], allowed=["src/**", "*.md"])
+    assert p.is_path_protected("sub/.git/hooks/post-checkout")
+    assert p.is_path_protected("secrets/a/b.txt")
+    assert p.is_path_protected("a/secrets/key")
+    assert not p.is_path_protected("a/secrets.txt")
+    assert p.is_path_protected("./x/y/key.pem")
+    assert p.is_path_protected("deploy/eu/west/prod.yaml")
+    assert not p.is_path_protected("other/deploy/prod.yaml")
+    assert p.is_path_allowed("src/pkg/mod.py")
+    assert p.is_path_allowed("docs/README.md")
+    assert not p.is_path_allowed("setup.py")
+    assert not p.is_path_allowed("src/key.pem")
+
+
+def test_violations_cover_paths_and_limits():
+    p = Policy(allowed=["src/**"], max_files=1, max_diff_bytes=10)
+    problems = p.violations(["src/a.py", "src/b.py", ".git/config", "README"], diff_bytes=11)
+    assert problems == [
+        "Protected path: .git/config",
+        "Path not allowed: README",
+        "Too many files: 4 > 1",
+        "Diff too large: 11 bytes > 10",
+    ]
+    assert Policy().violations(["a.py"], 10**9) == []
+
+
+def test_load_policy_is_cached_by_mtime(tmp_path: Path, monkeypatch):
+    import yaml
+
+    f = tmp_path / "policy.yaml"
+    f.write_text("protected: ['*.lock']\nmax_files: 3\n", encoding="utf-8")
+    calls = []
+    real = yaml.safe_load
+    monkeypatch.setattr(yaml, "safe_load", lambda s: calls.append(s) or real(s))
+    first = load_policy(str(tmp_path))
+    assert load_policy(str(tmp_path)) is first
+    assert len(calls) == 1
+    assert first.max_files == 3 and first.is_path_protected("poetry.lock")
+
+    f.write_text("allowed: ['src/**']\nrequire_checks: {tests: false}\n", encoding="utf-8")
+    second = load_policy(str(tmp_path))
+    assert len(calls) == 2
+    assert second.max_files is None and second.require_checks["tests"] is False
+    assert not second.is_path_allowed("poetry.lock")
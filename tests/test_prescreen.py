@@ -0,0 +1,91 @@
+import subprocess
+from unittest import mock
+
+import pytest
+
+from codex_repo_tool.patch import validate_items
+from codex_repo_tool.prescreen import apply_hunks, parse_patch, prescreen
+
+MOD = "def f():\n    return 1\n\n\ndef g():\n    return 2\n"
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "config", "user.email", "t@example.com"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "config", "user.name", "T"], cwd=tmp_path, check=True)
+    (tmp_path / "mod.py").write_text(MOD, encoding="utf-8")
+    (tmp_path / "broken.py").write_text("def (:\n", encoding="utf-8")
+    subprocess.run(["git", "add", "."], cwd=tmp_path, check=True)
+    subprocess.run(["git", "commit", "-qm", "init"], cwd=tmp_path, check=True)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _items(diff):
+    return [{"file": "x", "diff": diff, "description": ""}]
+
+
+def test_unanchored_hunks_must_match_at_the_end(repo):
+    # no trailing context: git only applies this at the end of the file
+    diff = "--- a/mod.py\n+++ b/mod.py\n@@ -2 +2 @@\n-    return 1\n+    return 10\n"
+    assert prescreen(_items(diff))["reason"] == "context-mismatch"
+    assert subprocess.run(["git", "apply", "--check", "-"], input=diff, text=True).returncode
+
+
+def test_parse_and_apply_with_offset():
+    diff = "--- a/mod.py\n+++ b/mod.py\n@@ -2,1 +2,1 @@ def g():\n-    return 2\n+    return 3\n"
+    (fp,) = parse_patch(diff)
+    assert (fp.old_path, fp.new_path) == ("mod.py", "mod.py")
+    # header says line 2, but `return 2` is on line 6: applied at the nearest match
+    assert apply_hunks(MOD, fp.hunks) == MOD.replace("return 2", "return 3")
+
+
+@pytest.mark.parametrize(
+    "diff, reason, file, line",
+    [
+        ("--- a/mod.py\n+++ b/mod.py\n@@ -1,2 +1,2 @@\n-def f():\n", "malformed", "mod.py", None),
+        ("--- a/nope.py\n+++ b/nope.py\n@@ -1 +1 @@\n-a\n+b\n", "missing-target", "nope.py", None),
+        ("--- /dev/null\n+++ b/mod.py\n@@ -0,0 +1 @@\n+x = 1\n", "exists", "mod.py", None),
+        (
+            "--- a/mod.py\n+++ b/mod.py\n@@ -1 +1 @@\n-def h():\n+def k():\n",
+            "context-mismatch",
+            "mod.py",
+            1,
+        ),
+        (
+            "--- a/mod.py\n+++ b/mod.py\n@@ -5,2 +5,2 @@\n def g():\n-    return 2\n+    return (2\n",
+            "syntax",
+            "mod.py",
+            6,
+        ),
+        ("--- /dev/null\n+++ b/new.json\n@@ -0,0 +1 @@\n+{'a': 1}\n", "syntax", "new.json", 1),
+    ],
+)
+def test_rejections(repo, diff, reason, file, line):
+    res = prescreen(_items(diff))
+    assert res["stage"] == "prescreen" and res["applied"] is False
+    assert (res["reason"], res["file"], res.get("line")) == (reason, file, line)
+
+
+def test_accepts_valid_bundles(repo):
+    diffs = [
+        "--- a/mod.py\n+++ b/mod.py\n@@ -1,3 +1,3 @@\n def f():\n-    return 1\n+    return 10\n \n",
+        # pre-existing syntax errors are not the diff's fault
+        "--- a/broken.py\n+++ b/broken.py\n@@ -1 +1,2 @@\n def (:\n+# note\n",
+        "diff --git a/mod.py b/pkg/mod.py\nrename from mod.py\nrename to pkg/mod.py\n",
+        "--- a/mod.py\n+++ /dev/null\n@@ -1,6 +0,0 @@\n"
+        + "".join("-" + ln + "\n" for ln in MOD.splitlines()),
+    ]
+    for diff in diffs:
+        assert prescreen(_items(diff)) is None, diff
+        git = subprocess.run(["git", "apply", "--check", "-"], input=diff, text=True)
+        assert git.returncode == 0, diff
+
+
+@mock.patch("codex_repo_tool.patch.with_worktree")
+def test_validate_items_rejects_before_worktree(mock_wt, repo):
+    diff = "--- a/mod.py\n+++ b/mod.py\n@@ -1,2 +1,2 @@\n-def f():\n+def f(:\n     return 1\n"
+    res = validate_items(_items(diff))
+    assert res["stage"] == "prescreen" and res["reason"] == "syntax"
+    mock_wt.assert_not_called()
@@ -0,0 +1,95 @@
+import json
+import sys
+from pathlib import Path
+
+from codex_repo_tool.cli import main
+from codex_repo_tool.repomap import RepoMap, load_repo_map, pagerank
+from codex_repo_tool.semantic import IncrementalIndex
+
+
+def test_pagerank_ranks_the_hub_and_warm_starts():
+    nodes = ["hub", "a", "b", "c", "leaf"]
+    edges = {"a": ["hub"], "b": ["hub"], "c": ["hub", "a"], "hub": ["leaf"]}
+    rank, its = pagerank(nodes, edges)
+    assert abs(sum(rank.values()) - 1) < 1e-9
+    assert max(rank, key=rank.get) == "leaf"  # everything flows through the hub into it
+    assert rank["hub"] > rank["a"] > rank["b"]
+    again, warm = pagerank(nodes, edges, start=rank)
+    assert warm < its and all(abs(again[n] - rank[n]) < 1e-6 for n in nodes)
+
+
+def _write(root: Path, files: dict):
+    for rel, text in files.items():
+        p = root / rel
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(text, encoding="utf-8")
+
+
+def test_resolution_and_incremental_update(tmp_path: Path):
+    _write(
+        tmp_path,
+        {
+            "src/pkg/__init__.py": "",
+            "src/pkg/core.py": "class Core:\n    def run(self):\n        pass\n",
+            "src/pkg/api.py": "from pkg.core import Core\nimport os\n",
+            "src/pkg/cli.py": "from .api import x\nfrom .util import y\n",
+            "web/app.ts": "import { h } from './lib/help'\nimport React from 'react'\n",
+            "web/lib/help.ts": "export function h() {}\n",
+        },
+    )
+    index = IncrementalIndex(tmp_path, cache=False)
+    index.refresh()
+    m = RepoMap(tmp_path)
+    assert m.update(index.deps())["resolved"] == 6
+    edges = {m._rel(f): [m._rel(t) for t in ts] for f, ts in m.edges.items()}
+    assert edges["src/pkg/api.py"] == ["src/pkg/core.py"]
+    assert edges["src/pkg/cli.py"] == ["src/pkg/api.py"]  # util does not exist yet
+    assert edges["web/app.ts"] == ["web/lib/help.ts"]
+    assert m.ranked()[0] == str(tmp_path / "src/pkg/core.py")
+
+    assert m.update(index.deps()) == {"files": 6, "resolved": 0, "iterations": 0}
+    _write(tmp_path, {"src/pkg/util.py": "def y():\n    pass\n"})
+    index.refresh()
+    stats = m.update(index.deps())
+    # the new file itself, and cli.py whose import of "util" can now resolve
+    assert stats["resolved"] == 2 and stats["iterations"] > 0
+    assert str(tmp_path / "src/pkg/util.py") in m.edges[str(tmp_path / "src/pkg/cli.py")]
+
+
+def test_summary_fits_the_budget_in_tiers(tmp_path: Path):
+    files = {
+        "core.py": "".join(f"class C{i}:\n    def m(self):\n        pass\n" for i in range(30))
+    }
+    for i in range(60):
+        files[f"mod{i}.py"] = f"import core\n\ndef f{i}():\n    pass\n"
+    _write(tmp_path, files)
+    index = IncrementalIndex(tmp_path, cache=False)
+    index.refresh()
+    m = RepoMap(tmp_path)
+    m.update(index.deps())
+    for budget in (200, 600, 1500):
+        text = m.summary(index.files(), max_bytes=budget)
+        assert len(text.encode()) <= budget
+        assert text.splitlines()[1] == "core.py"
+        assert "more files)" in text
+    text = m.summary(index.files(), max_tokens=150)
+    assert "  class C0:1" in text and "## Other files" in text
+    assert len(text.encode()) <= 600
+    everything = m.summary(index.files())
+    assert "method m:2" in everything and "more files" not in everything
+
+
+def test_cli_summarize_keeps_state_between_runs(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CODEXRT_NO_DAEMON", "1")
+    _write(tmp_path, {"a.py": "import b\n\ndef fa():\n    pass\n", "b.py": "def fb():\n    pass\n"})
+    monkeypatch.setattr(sys, "argv", ["codexrt", "summarize", "--tokens", "100"])
+    main()
+    out = capsys.readouterr().out
+    assert out.splitlines()[1] == "b.py" and "function fb:1" in out
+    assert (tmp_path / ".codexrt" / "summary.md").read_text() + "\n" == out
+    assert json.loads((tmp_path / ".codexrt" / "map.json").read_text())["files"]
+    state = load_repo_map(".")
+    assert len(state.rank) == 2 and state.edges[state.ranked()[1]] == [state.ranked()[0]]
+    main()
+    assert load_repo_map(".").rank == state.rank
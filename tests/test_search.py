@@ -8,3 +8,25 @@ def test_search(tmp_path: Path):
     f.write_text("def add(a,b):\n    return a+b\n", encoding="utf-8")
     res = search_code("add", root=str(tmp_path))
     assert any(r["line"] == 1 for r in res)
+
+
+def test_search_at_revision(tmp_path: Path):
+    import subprocess
+
+    def git(*args):
+        subprocess.run(["git", *args], cwd=tmp_path, check=True, capture_output=True)
+
+    git("init", "-q")
+    for i in range(300):  # more than one cat-file batch
+        (tmp_path / f"m{i}.py").write_text(f"x = {i}\n# needle {i}\n", encoding="utf-8")
+    git("add", ".")
+    git("-c", "user.name=T", "-c", "user.email=t@e", "commit", "-qm", "init")
+    (tmp_path / "m7.py").write_text("gone\n", encoding="utf-8")
+
+    hits = search_code("needle 7", tmp_path, rev="HEAD")
+    assert sorted(h["path"] for h in hits) == sorted(
+        str(tmp_path / f"m{i}.py") for i in (7, 70, 71, 72, 73, 74, 75, 76, 77, 78, 79)
+    )
+    assert {h["line"] for h in hits} == {2}
+    assert len(search_code("needle", tmp_path, max_results=5, rev="HEAD")) == 5
+    assert not any(h["path"].endswith("m7.py") for h in search_code("needle 7", tmp_path))
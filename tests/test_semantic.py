@@ -1,6 +1,19 @@
+import gc
+import subprocess
+import tracemalloc
 from pathlib import Path
 
-from codex_repo_tool.semantic import build_index, dependency_graph
+from codex_repo_tool import metrics
+from codex_repo_tool.semantic import (
+    FileIndex,
+    IncrementalIndex,
+    ParseCache,
+    Symbol,
+    build_index,
+    dependency_graph,
+    find_symbol,
+    symbol_source,
+)
 
 
 def test_python_index(tmp_path: Path):
@@ -22,3 +35,267 @@ def test_js_index(tmp_path: Path):
     idx = build_index(str(tmp_path))
     files = idx["files"]
     assert any("bar" == s["name"] for s in files[str(p)]["symbols"])
+
+
+SCOPED = '''import os
+
+
+class Repo:
+    """Doc."""
+
+    @property
+    def name(self):
+        import json
+
+        def helper():
+            return json
+
+        return helper
+
+    async def fetch(self):
+        return "é"
+
+
+async def main():
+    return Repo()
+'''
+
+
+def test_python_scopes_kinds_and_offsets(tmp_path: Path):
+    p = tmp_path / "m.py"
+    p.write_text(SCOPED, encoding="utf-8")
+    syms = {s["qualname"]: s for s in build_index(str(tmp_path))["files"][str(p)]["symbols"]}
+    assert {q: s["kind"] for q, s in syms.items()} == {
+        "Repo": "class",
+        "Repo.name": "method",
+        "Repo.name.helper": "function",
+        "Repo.fetch": "async_method",
+        "main": "async_function",
+    }
+    fetch = syms["Repo.fetch"]
+    assert (fetch["name"], fetch["line"], fetch["end_line"]) == ("fetch", 16, 17)
+    raw = p.read_bytes()
+    assert raw[fetch["start"] : fetch["end"]].decode() == (
+        '    async def fetch(self):\n        return "é"\n'
+    )
+    # decorators belong to the span; `line` stays on the def
+    name = syms["Repo.name"]
+    assert raw[name["start"] :].startswith(b"    @property\n") and name["line"] == 8
+    assert raw[syms["main"]["start"] : syms["main"]["end"]].endswith(b"return Repo()\n")
+
+
+def test_symbol_source_by_qualified_name(tmp_path: Path):
+    p = tmp_path / "m.py"
+    p.write_text(SCOPED, encoding="utf-8")
+    idx = build_index(str(tmp_path))
+    [hit] = symbol_source("Repo.name.helper", idx)
+    assert hit["source"] == "        def helper():\n            return json\n"
+    assert [h["qualname"] for h in find_symbol("name", idx)] == ["Repo.name"]
+    [only] = symbol_source("main", file=str(p))
+    assert only["source"].startswith("async def main():")
+
+    # offsets from a stale index are not trusted
+    p.write_text("# moved\n" + SCOPED, encoding="utf-8")
+    [hit] = symbol_source("main", idx)
+    assert hit["line"] == 21 and hit["source"].startswith("async def main():")
+
+
+JS = """import React, { useState } from 'react';
+import type { Props } from "./types";
+import './side-effect.css';
+export * from './reexport';
+export { a, b as c } from "./named";
+const fs = require("fs");
+const lazy = () => import('./lazy');
+// function commented() {}
+/* export function alsoNot() {} */
+export function exported(a: number): number {
+  if (a) { return 1; }
+  return 2;
+}
+export default async function* gen() {
+  yield 1;
+}
+export const arrow = (x: number): number => x * 2;
+const block = async (y) => {
+  return { y };
+};
+export class Widget extends Base {
+  render() { return 1; }
+}
+export interface Shape { a: string }
+export type Alias<T> = T | null;
+"""
+
+
+def test_js_forms_spans_and_imports(tmp_path: Path):
+    p = tmp_path / "m.ts"
+    p.write_text(JS, encoding="utf-8")
+    entry = build_index(str(tmp_path))["files"][str(p)]
+    syms = {s["name"]: s for s in entry["symbols"]}
+    assert {n: (s["kind"], s["line"], s["end_line"]) for n, s in syms.items()} == {
+        "lazy": ("function", 7, 7),
+        "exported": ("function", 10, 13),
+        "gen": ("function", 14, 16),
+        "arrow": ("function", 17, 17),
+        "block": ("function", 18, 20),
+        "Widget": ("class", 21, 23),
+        "Shape": ("interface", 24, 24),
+        "Alias": ("type", 25, 25),
+    }
+    assert sorted(entry["imports"]) == [
+        "./lazy",
+        "./named",
+        "./reexport",
+        "./side-effect.css",
+        "./types",
+        "fs",
+        "react",
+    ]
+    [hit] = symbol_source("block", file=str(p))
+    assert hit["source"] == "const block = async (y) => {\n  return { y };\n};\n"
+
+
+def test_js_ignores_code_in_comments_and_strings(tmp_path: Path):
+    p = tmp_path / "m.js"
+    p.write_text(
+        "// const old = require('./old');\n"
+        "/* import x from './gone' */\n"
+        "const tpl = `\n"
+        "function fake(a) {\n"
+        "  return require('./not-a-dep');\n"
+        "}\n"
+        "`;\n"
+        "const s = \"import('./nope')\";\n"
+        "export function real() {\n"
+        "  return '}' + require(\"./dep\");\n"
+        "}\n",
+        encoding="utf-8",
+    )
+    entry = build_index(str(tmp_path))["files"][str(p)]
+    assert entry["imports"] == ["./dep"]
+    assert [(s["name"], s["line"], s["end_line"]) for s in entry["symbols"]] == [("real", 9, 11)]
+
+
+def test_js_skips_minified_and_bundled_files(tmp_path: Path):
+    line = "function f(){return 1}" * 2000  # one 44 KB line
+    (tmp_path / "app.js").write_text(line + "\n", encoding="utf-8")
+    (tmp_path / "lib.min.js").write_text("function g() {}\n", encoding="utf-8")
+    files = build_index(str(tmp_path))["files"]
+    assert files[str(tmp_path / "app.js")]["symbols"] == []
+    assert files[str(tmp_path / "lib.min.js")]["symbols"] == []
+
+
+def test_columnar_store_round_trips_and_stays_small(tmp_path: Path):
+    syms = [
+        Symbol("Repo", "class", 1, end_line=9, start=0, end=80),
+        Symbol("load", "method", 2, "Repo.load", 3, 10, 40),
+        Symbol("helper", "function", 4, "Repo.load.<locals>.helper"),
+        Symbol("Box", "interface", 10),
+    ]
+    fi = FileIndex(symbols=syms, imports=["os"])
+    assert fi.symbols == syms
+    assert [fi.qualname(i) for i in fi.find("load")] == ["Repo.load"]
+    assert list(fi.find("Repo.load")) == [1]
+
+    body = "".join(f"    def m{i}(self):\n        return {i}\n" for i in range(2000))
+    (tmp_path / "big.py").write_text("class Big:\n" + body, encoding="utf-8")
+    (tmp_path / "use.py").write_text("import big\n\ndef m7():\n    pass\n", encoding="utf-8")
+    IncrementalIndex(tmp_path).refresh()  # warm-up: grows the interned-strings table
+    index = IncrementalIndex(tmp_path)
+    tracemalloc.start()
+    try:
+        index.refresh()
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert held / 2002 < 120  # bytes per symbol; the dict form takes several hundred
+
+    as_dict = index.to_dict()
+    assert find_symbol("m7", index) == find_symbol("m7", as_dict)
+    assert len(find_symbol("m7", index)) == 2
+    assert find_symbol("Big.m7", index)[0]["line"] == 16
+    assert dependency_graph(index) == dependency_graph(as_dict)
+    assert symbol_source("Big.m3", index)[0]["source"].startswith("    def m3(self):")
+
+
+def _git(repo, *args):
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+
+def test_git_enumeration_and_shared_parse_cache(tmp_path: Path):
+    repo = tmp_path / "repo"
+    (repo / "pkg").mkdir(parents=True)
+    _git(repo, "init", "-q")
+    (repo / "pkg" / "a.py").write_text("import os\n\nclass A:\n    def f(self): pass\n")
+    (repo / "pkg" / "b.py").write_text("def b():\n    return 1\n")
+    (repo / "ui.ts").write_text("export interface Props {\n  x: number\n}\n")
+    (repo / ".gitignore").write_text("build/\n")
+    _git(repo, "add", ".")
+    _git(repo, "-c", "user.name=T", "-c", "user.email=t@e", "commit", "-qm", "init")
+    _git(repo, "clone", "-q", str(repo), str(tmp_path / "clone"))
+    (repo / "pkg" / "b.py").write_text("def b2():\n    return 2\n")  # modified
+    (repo / "new.py").write_text("def fresh(): pass\n")  # untracked
+    (repo / "build").mkdir()
+    (repo / "build" / "gen.py").write_text("def ignored(): pass\n")
+
+    cache = ParseCache(tmp_path / "parse.sqlite")
+    by_git = IncrementalIndex(repo, source="git", cache=cache)
+    assert by_git.refresh() == 4
+    by_fs = IncrementalIndex(repo, source="fs", cache=False)
+    by_fs.refresh()
+    files = by_git.to_dict()["files"]
+    assert str(repo / "build" / "gen.py") not in files  # git skips ignored files
+    expected = {f: e for f, e in by_fs.to_dict()["files"].items() if "build" not in f}
+    assert files == expected
+    assert find_symbol("b2", by_git) and not find_symbol("b", by_git)
+    assert by_git.refresh() == 0
+    by_git.close()
+
+    metrics.METRICS.take()
+    clone = IncrementalIndex(tmp_path / "clone", source="git", cache=cache)
+    assert clone.refresh() == 3
+    clone.close()
+    counters = metrics.METRICS.take()["counters"]
+    assert counters["index.cache_hits"] == 2  # a.py and ui.ts; b.py differs
+    assert counters["index.parsed"] == 1
+    assert find_symbol("A.f", clone)[0]["file"] == str(tmp_path / "clone" / "pkg" / "a.py")
+
+
+def test_index_a_revision_without_checkout(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-q", "-b", "main")
+    _git(repo, "config", "user.email", "t@example.com")
+    _git(repo, "config", "user.name", "T")
+    for i in range(5):
+        (repo / f"m{i}.py").write_text(f"def f{i}():\n    pass\n")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-qm", "init")
+    _git(repo, "checkout", "-q", "-b", "feature")
+    (repo / "m0.py").write_text("def changed():\n    pass\n")
+    _git(repo, "commit", "-qam", "change")
+    _git(repo, "checkout", "-q", "main")
+    (repo / "m1.py").write_text("def dirty():\n    pass\n")  # not committed anywhere
+
+    cache = ParseCache(tmp_path / "parse.sqlite")
+    main = IncrementalIndex(repo, cache=cache, rev="main")
+    assert main.refresh() == 5
+    assert find_symbol("f1", main) and not find_symbol("dirty", main)
+    assert main.stamp(str(repo / "m1.py")) == (None, None)
+
+    metrics.METRICS.take()
+    feature = IncrementalIndex(repo, cache=cache, rev="feature")
+    feature.refresh()
+    counters = metrics.METRICS.take()["counters"]
+    assert counters["index.parsed"] == 1 and counters["index.cache_hits"] == 4
+    assert find_symbol("changed", feature)[0]["file"] == str(repo / "m0.py")
+    assert not find_symbol("f0", feature)
+
+    assert feature.refresh() == 0  # nothing moved
+    _git(repo, "branch", "-f", "feature", "main")
+    assert feature.refresh() == 1 and find_symbol("f0", feature)
+    main.close()
+    feature.close()
+    assert build_index(str(repo), rev="main")["files"] == main.to_dict()["files"]
@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = str(Path(__file__).resolve().parents[1] / "src")
+HEAVY = ("requests", "urllib3", "yaml", "codex_repo_tool.semantic", "codex_repo_tool.task")
+
+# Generous ceiling for the CLI's own import cost (microseconds, from -X importtime);
+# it is a few milliseconds when subcommands import lazily.
+IMPORT_BUDGET_US = 100_000
+
+
+def _run(code, *args, cwd=None):
+    env = {**os.environ, "PYTHONPATH": SRC}
+    return subprocess.run(
+        [sys.executable, *args, "-c", code], capture_output=True, text=True, env=env, cwd=cwd
+    )
+
+
+def _loaded_after(argv, cwd):
+    code = (
+        "import json, sys\n"
+        f"sys.argv = {argv!r}\n"
+        "from codex_repo_tool.cli import main\n"
+        "try:\n    main()\nexcept SystemExit:\n    pass\n"
+        "print(json.dumps(sorted(sys.modules)), file=sys.stderr)\n"
+    )
+    p = _run(code, cwd=cwd)
+    return set(json.loads(p.stderr.strip().splitlines()[-1]))
+
+
+def test_help_and_cat_do_not_import_heavy_modules(tmp_path):
+    f = tmp_path / "x.txt"
+    f.write_text("hi\n", encoding="utf-8")
+    for argv in (["codexrt", "--help"], ["codexrt", "cat", str(f)]):
+        loaded = _loaded_after(argv, tmp_path)
+        assert not [m for m in HEAVY if m in loaded], argv
+
+
+def test_package_api_is_lazy():
+    p = _run(
+        "import sys, codex_repo_tool\n"
+        "assert 'codex_repo_tool.github_api' not in sys.modules\n"
+        "assert 'run_task' in dir(codex_repo_tool)\n"
+        "from codex_repo_tool import read_file\n"
+        "assert 'requests' not in sys.modules\n"
+    )
+    assert p.returncode == 0, p.stderr
+
+
+def test_cli_import_time_budget():
+    p = _run("import codex_repo_tool.cli", "-X", "importtime")
+    cumulative = 0
+    for line in p.stderr.splitlines():
+        parts = [x.strip() for x in line.split("|")]
+        if len(parts) == 3 and parts[2] == "codex_repo_tool.cli":
+            cumulative = int(parts[1])
+    assert 0 < cumulative < IMPORT_BUDGET_US
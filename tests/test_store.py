@@ -0,0 +1,67 @@
+import threading
+
+from codex_repo_tool.store import PatchStore
+
+DIFF = (
+    "diff --git a/src/a.py b/src/b.py\nrename from src/a.py\nrename to src/b.py\n"
+    "--- a/lib/c.py\n+++ b/lib/c.py\n@@ -1 +1 @@\n-x\n+y\n"
+)
+
+
+def test_entries_are_indexed_by_file_and_status(tmp_path):
+    store = PatchStore(tmp_path / "store.sqlite")
+    pid = store.add_patch("lib/c.py", "--- a/lib/c.py\n+++ b/lib/c.py\n", "desc")
+    bid = store.add_bundle([{"file": "src/a.py", "diff": DIFF, "description": ""}])
+    assert pid.startswith("patch_") and bid.startswith("bundle_")
+
+    bundle = store.get(bid)
+    assert bundle["status"] == "pending" and bundle["items"][0]["diff"] == DIFF
+    assert bundle["files"] == ["lib/c.py", "src/a.py", "src/b.py"]
+    assert store.get(pid)["description"] == "desc"
+    assert [e["id"] for e in store.find(file="lib/c.py")] == [pid, bid]
+    assert [e["id"] for e in store.find(file="src/b.py")] == [bid]
+
+    assert store.set_status(bid, "failed", {"stage": "qa"}) is True
+    assert [e["id"] for e in store.find(status="pending")] == [pid]
+    assert store.find(status="failed")[0]["result"] == {"stage": "qa"}
+    assert store.find(file="lib/c.py", kind="bundle")[0]["status"] == "failed"
+
+    assert store.delete(pid) is True and store.delete(pid) is False
+    assert store.get(pid) is None and store.find(file="lib/c.py", kind="patch") == []
+    store.close()
+
+
+def test_concurrent_writers_get_distinct_entries(tmp_path):
+    path = tmp_path / "store.sqlite"
+    stores = [PatchStore(path) for _ in range(4)]  # separate connections, as in processes
+    ids: list[str] = []
+    lock = threading.Lock()
+
+    def work(store: PatchStore, n: int) -> None:
+        for i in range(25):
+            bid = store.add_bundle([{"file": f"f{n}_{i}.py", "diff": ""}])
+            store.set_status(bid, "checking")
+            with lock:
+                ids.append(bid)
+
+    threads = [threading.Thread(target=work, args=(stores[n % 4], n)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(ids)) == 200
+    assert len(stores[0].find(status="checking")) == 200
+    assert stores[3].find(file="f7_24.py")[0]["id"] in ids
+    for store in stores:
+        store.close()
+
+
+def test_gc_drops_idle_entries_and_their_targets(tmp_path):
+    store = PatchStore(tmp_path / "store.sqlite", ttl=3600)
+    old = store.add_patch("a.py", "")
+    store._conn().execute("UPDATE entries SET updated = updated - 7200 WHERE id = ?", (old,))
+    new = store.add_patch("a.py", "")
+    assert store.gc() == 1
+    assert [e["id"] for e in store.find(file="a.py")] == [new]
+    assert store._conn().execute("SELECT count(*) FROM targets").fetchone() == (1,)
+    assert store.gc(0) == 1 and store.find() == []
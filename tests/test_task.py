@@ -1,6 +1,7 @@
 import subprocess
 from unittest import mock
 
+from codex_repo_tool.store import default_store
 from codex_repo_tool.task import run
 
 SAMPLE_DIFF = """--- a/README.md
@@ -78,11 +79,11 @@ def test_task_qa_failure_details(tmp_path, monkeypatch):
     monkeypatch.chdir(repo)
     monkeypatch.setattr(
         "codex_repo_tool.patch.lint_code",
-        lambda: {"ok": False, "stdout": "", "stderr": "lint fail", "code": 1},
+        lambda **kw: {"ok": False, "stdout": "", "stderr": "lint fail", "code": 1},
     )
     monkeypatch.setattr(
         "codex_repo_tool.patch.run_tests",
-        lambda: {"ok": False, "stdout": "", "stderr": "test fail", "code": 1},
+        lambda **kw: {"ok": False, "stdout": "", "stderr": "test fail", "code": 1},
     )
     res = run(
         goal="Append line to README",
@@ -93,3 +94,32 @@ def test_task_qa_failure_details(tmp_path, monkeypatch):
     assert res["stage"] == "qa"
     assert res["lint"]["stderr"] == "lint fail"
     assert res["tests"]["stderr"] == "test fail"
+
+
+def test_task_applies_each_file_of_a_multi_file_diff_once(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    subprocess.run(["git", "config", "user.email", "test@example.com"], cwd=repo, check=True)
+    subprocess.run(["git", "config", "user.name", "Test User"], cwd=repo, check=True)
+    for name in ("a.txt", "b.txt", "old.txt"):
+        (repo / name).write_text(f"{name}\n", encoding="utf-8")
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    subprocess.run(["git", "commit", "-qm", "init"], cwd=repo, check=True)
+    monkeypatch.chdir(repo)
+    monkeypatch.setattr("codex_repo_tool.patch.lint_code", lambda **kw: {"ok": True})
+    monkeypatch.setattr("codex_repo_tool.patch.run_tests", lambda **kw: {"ok": True})
+    diff = (
+        "--- a/a.txt\n+++ b/a.txt\n@@ -1 +1 @@\n-a.txt\n+A\n"
+        "--- a/b.txt\n+++ b/b.txt\n@@ -1 +1 @@\n-b.txt\n+B\n"
+        "diff --git a/old.txt b/new.txt\nsimilarity index 100%\n"
+        "rename from old.txt\nrename to new.txt\n"
+        "diff --git a/c.txt b/c.txt\nnew file mode 100644\n--- /dev/null\n+++ b/c.txt\n"
+        "@@ -0,0 +1 @@\n+C\n"
+    )
+    res = run(goal="Edit files", ask_model_for_diff=lambda g, c: diff)
+    assert res["ok"] is True and res["stage"] == "done"
+    (entry,) = default_store().find(kind="bundle")
+    items = default_store().get(entry["id"])["items"]
+    assert [it["file"] for it in items] == ["a.txt", "b.txt", "new.txt", "c.txt"]
+    assert "".join(it["diff"] for it in items) == diff
@@ -0,0 +1,134 @@
+import json
+import pstats
+import subprocess
+import sys
+import threading
+
+from codex_repo_tool.candidates import default_candidates, run_candidates
+from codex_repo_tool.cli import main
+from codex_repo_tool.task import run
+from codex_repo_tool.tracing import current_span, span, to_otlp, traced
+
+SAMPLE_DIFF = """--- a/README.md
++++ b/README.md
+@@ -1,2 +1,3 @@
+ # Demo
+
++Added by tracing test.
+"""
+
+
+def _repo(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    subprocess.run(["git", "config", "user.email", "t@example.com"], cwd=repo, check=True)
+    subprocess.run(["git", "config", "user.name", "T"], cwd=repo, check=True)
+    (repo / "README.md").write_text("# Demo\n\n", encoding="utf-8")
+    subprocess.run(["git", "add", "README.md"], cwd=repo, check=True)
+    subprocess.run(["git", "commit", "-qm", "init"], cwd=repo, check=True)
+    monkeypatch.chdir(repo)
+    monkeypatch.setattr("codex_repo_tool.patch.lint_code", lambda **kw: {"ok": True})
+    monkeypatch.setattr("codex_repo_tool.patch.run_tests", lambda **kw: {"ok": True})
+    return repo
+
+
+def test_spans_nest_and_sum_timings():
+    @traced("leaf")
+    def leaf():
+        return current_span().name
+
+    with span("root", kind="test") as root:
+        assert leaf() == "leaf"
+        assert leaf() == "leaf"
+        with span("inner"):
+            pass
+    assert current_span() is None
+    names = {s.name: s for s in root.trace.spans}
+    assert names["inner"].parent_id == root.span_id
+    assert names["leaf"].parent_id == root.span_id
+    assert set(root.timings()) == {"root", "leaf", "inner"}
+    assert len([s for s in root.trace.spans if s.name == "leaf"]) == 2
+
+
+def test_span_records_errors():
+    try:
+        with span("boom") as s:
+            raise ValueError("bad")
+    except ValueError:
+        pass
+    assert s.error == "ValueError: bad"
+    otlp = to_otlp(s.trace)
+    status = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["status"]
+    assert status == {"code": 2, "message": "ValueError: bad"}
+
+
+def test_otlp_layout():
+    with span("root", n=3, ok=True, ratio=0.5, label="x") as root:
+        with span("child"):
+            pass
+    doc = to_otlp(root.trace)
+    rs = doc["resourceSpans"][0]
+    assert rs["resource"]["attributes"][0] == {
+        "key": "service.name",
+        "value": {"stringValue": "codexrt"},
+    }
+    spans = rs["scopeSpans"][0]["spans"]
+    assert [s["name"] for s in spans] == ["root", "child"]
+    r, c = spans
+    assert len(r["traceId"]) == 32 and len(r["spanId"]) == 16
+    assert "parentSpanId" not in r and c["parentSpanId"] == r["spanId"]
+    assert int(r["endTimeUnixNano"]) >= int(c["endTimeUnixNano"]) >= int(c["startTimeUnixNano"])
+    attrs = {a["key"]: a["value"] for a in r["attributes"]}
+    assert attrs == {
+        "n": {"intValue": "3"},
+        "ok": {"boolValue": True},
+        "ratio": {"doubleValue": 0.5},
+        "label": {"stringValue": "x"},
+    }
+
+
+def test_task_and_bundle_results_carry_timings(tmp_path, monkeypatch):
+    _repo(tmp_path, monkeypatch)
+    res = run(goal="Append", ask_model_for_diff=lambda g, c: SAMPLE_DIFF)
+    assert res["ok"] is True
+    t = res["timings"]
+    for stage in ("task.run", "model", "apply_bundle", "prescreen", "with_worktree", "qa"):
+        assert stage in t, stage
+    assert t["task.run"] >= t["apply_bundle"] >= t["with_worktree"]
+
+
+def test_candidate_threads_inherit_the_trace():
+    threads = set()
+
+    def generate(goal, ctx, model, temperature):
+        threads.add(threading.get_ident())
+        return "diff"
+
+    def validate(diff):
+        with span("validate"):
+            return {"applied": False, "stage": "qa"}
+
+    with span("root") as root:
+        run_candidates("g", {}, default_candidates(3), validate, generate)
+    by_id = {s.span_id: s for s in root.trace.spans}
+    cands = [s for s in root.trace.spans if s.name == "candidate"]
+    assert len(cands) == 3
+    assert all(c.parent_id == root.span_id for c in cands)
+    for v in (s for s in root.trace.spans if s.name == "validate"):
+        assert by_id[v.parent_id].name == "candidate"
+
+
+def test_cli_trace_and_profile(tmp_path, monkeypatch, capsys):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("def f():\n    return 1\n", encoding="utf-8")
+    monkeypatch.chdir(repo)
+    trace, prof = tmp_path / "trace.json", tmp_path / "out.prof"
+    argv = ["codexrt", "--trace", str(trace), "--profile", str(prof), "index"]
+    monkeypatch.setattr(sys, "argv", argv)
+    main()
+    assert "a.py" in json.loads(capsys.readouterr().out)["files"]
+    spans = json.loads(trace.read_text())["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert spans[0]["name"] == "codexrt.index"
+    assert pstats.Stats(str(prof)).total_calls > 0
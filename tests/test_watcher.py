@@ -0,0 +1,110 @@
+import os
+import shutil
+import threading
+
+import pytest
+
+from codex_repo_tool.search import SearchIndex
+from codex_repo_tool.semantic import IncrementalIndex
+from codex_repo_tool.watcher import Changes, Watcher, _load_libc
+
+BACKENDS = [
+    "poll",
+    pytest.param(
+        "inotify", marks=pytest.mark.skipif(_load_libc() is None, reason="inotify not available")
+    ),
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+        self.event = threading.Event()
+
+    def __call__(self, changes):
+        self.batches.append(changes)
+        self.event.set()
+
+    def wait(self, watcher):
+        if watcher.backend == "inotify":
+            assert watcher.sync()
+        else:
+            assert self.event.wait(5)
+        self.event.clear()
+
+    def paths(self):
+        return set().union(*(b.paths for b in self.batches))
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_reports_created_modified_and_deleted_files(tmp_path, backend):
+    (tmp_path / "a.py").write_text("x = 1\n", encoding="utf-8")
+    (tmp_path / ".git").mkdir()
+    rec = Recorder()
+    w = Watcher(tmp_path, rec, poll_interval=0.05, backend=backend).start()
+    try:
+        assert w.backend == backend
+        before = w.fresh_as_of
+        (tmp_path / "a.py").write_text("x = 22\n", encoding="utf-8")
+        (tmp_path / "b.py").write_text("y = 1\n", encoding="utf-8")
+        (tmp_path / ".git" / "index").write_text("ignored", encoding="utf-8")
+        rec.wait(w)
+        assert rec.paths() == {tmp_path / "a.py", tmp_path / "b.py"}
+        assert w.fresh_as_of > before
+
+        rec.batches.clear()
+        (tmp_path / "b.py").unlink()
+        rec.wait(w)
+        assert rec.paths() == {tmp_path / "b.py"}
+    finally:
+        w.stop()
+    assert not w.alive
+
+
+@pytest.mark.skipif(_load_libc() is None, reason="inotify not available")
+def test_inotify_coalesces_bursts_and_tracks_directories(tmp_path):
+    rec = Recorder()
+    w = Watcher(tmp_path, rec, debounce=0.5, backend="inotify").start()
+    try:
+        # like a checkout: a new tree appears in one go, many files change
+        src = tmp_path.parent / (tmp_path.name + "-src")
+        (src / "deep").mkdir(parents=True)
+        for i in range(50):
+            (src / "deep" / f"m{i}.py").write_text(f"v = {i}\n", encoding="utf-8")
+        os.rename(src, tmp_path / "pkg")
+        for i in range(50):
+            (tmp_path / f"top{i}.py").write_text("", encoding="utf-8")
+        rec.wait(w)
+        assert len(rec.batches) == 1
+        assert len(rec.paths()) == 100
+
+        # files created inside the moved-in tree are watched too
+        rec.batches.clear()
+        (tmp_path / "pkg" / "deep" / "new.py").write_text("", encoding="utf-8")
+        rec.wait(w)
+        assert rec.paths() == {tmp_path / "pkg" / "deep" / "new.py"}
+
+        rec.batches.clear()
+        shutil.rmtree(tmp_path / "pkg")
+        rec.wait(w)
+        assert tmp_path / "pkg" in set().union(*(b.dirs for b in rec.batches))
+    finally:
+        w.stop()
+
+
+def test_indexes_apply_watcher_changes(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "m.py").write_text("def foo():\n    pass\n", encoding="utf-8")
+    (tmp_path / "notes.md").write_text("needle\n", encoding="utf-8")
+    idx, sidx = IncrementalIndex(tmp_path), SearchIndex(tmp_path)
+    idx.refresh()
+    sidx.refresh()
+
+    (tmp_path / "notes.md").write_text("other\n", encoding="utf-8")
+    shutil.rmtree(tmp_path / "pkg")
+    changes = Changes(paths={tmp_path / "notes.md"}, dirs={tmp_path / "pkg"})
+    assert idx.update(changes.paths, changes.dirs) == 0
+    sidx.update(changes.paths, changes.dirs)
+    assert idx.to_dict()["files"] == {}
+    assert sidx.search("needle") == []
+    assert sidx.search("other")[0]["path"] == str(tmp_path / "notes.md")